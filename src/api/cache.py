@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of encoded responses, emptied whenever a new batch is committed.
+
+    Readers take `generation` before querying the database and pass it to `put`; a response computed
+    while an invalidation happened is dropped instead of caching stale data.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key) if self.enabled else None
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes, generation: int) -> None:
+        with self._lock:
+            if not self.enabled or generation != self.generation or self.max_entries <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def set_enabled(self, enabled: bool) -> None:
+        """Bypass the cache (e.g. while the invalidation listener is disconnected)."""
+        with self._lock:
+            self.enabled = enabled
+            self._entries.clear()
+            self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
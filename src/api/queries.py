@@ -0,0 +1,156 @@
+import base64
+from datetime import date, datetime
+from typing import Optional
+
+from psycopg2.extensions import connection
+
+from src.config import API_MAX_PAGE_SIZE, API_PAGE_SIZE
+from src.db.rollups import ROLLUP_DIMENSIONS, rollup_counts
+from src.enrich.geography import DIRECTIONS
+
+# Columns returned per incident (incidents_enriched); the API covering indexes include those stored on incidents
+INCIDENT_FIELDS = (
+    "incident_num", "incident_ts", "nature", "location", "side_of_town",
+    "weather", "incident_rank", "location_rank", "emsstat",
+)
+
+# One /incidents page, newest first: {where} holds the filters and the keyset cursor, the last parameter is the limit
+INCIDENT_PAGE_SQL = """SELECT {columns}, location.latitude, location.longitude
+                FROM incidents_enriched incidents LEFT JOIN location ON location.loc = incidents.location
+                {where}
+                ORDER BY incidents.incident_ts DESC, incidents.incident_num DESC
+                LIMIT %s"""
+INCIDENT_COLUMNS_SQL = ", ".join(f"incidents.{c}" for c in INCIDENT_FIELDS)
+
+# Query-string parameters accepted by /incidents
+INCIDENT_PARAMS = ("start", "end", "nature", "side_of_town", "max_incident_rank", "max_location_rank", "after", "limit")
+
+# Rollup columns holding integers (query-string values arrive as text)
+_INT_DIMENSIONS = ("time_of_day", "day_of_week", "weather")
+
+
+def encode_cursor(incident_ts: datetime, incident_num: str) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = f"{incident_ts.isoformat()}|{incident_num}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime, str]:
+    """Inverse of encode_cursor; ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        ts, num = raw.split("|", 1)
+        return datetime.fromisoformat(ts), num
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+
+def _parse_int(name: str, value: str) -> int:
+    try:
+        return int(value)
+    except ValueError as e:
+        raise ValueError(f"{name} must be an integer") from e
+
+
+def _parse_time(name: str, value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as e:
+        raise ValueError(f"{name} must be an ISO date or datetime") from e
+
+
+def parse_incident_params(params: dict[str, str]) -> dict:
+    """Validate /incidents query parameters into list_incidents keyword arguments (ValueError if invalid)."""
+    unknown = [p for p in params if p not in INCIDENT_PARAMS]
+    if unknown:
+        raise ValueError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+    kwargs: dict = {}
+    if "start" in params:
+        kwargs["start"] = _parse_time("start", params["start"])
+    if "end" in params:
+        kwargs["end"] = _parse_time("end", params["end"])
+    if "nature" in params:
+        kwargs["nature"] = params["nature"]
+    if "side_of_town" in params:
+        if params["side_of_town"] not in DIRECTIONS:
+            raise ValueError(f"side_of_town must be one of {', '.join(DIRECTIONS)}")
+        kwargs["side_of_town"] = params["side_of_town"]
+    for name in ("max_incident_rank", "max_location_rank"):
+        if name in params:
+            kwargs[name] = _parse_int(name, params[name])
+    if "after" in params:
+        kwargs["after"] = decode_cursor(params["after"])
+    limit = _parse_int("limit", params["limit"]) if "limit" in params else API_PAGE_SIZE
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {API_MAX_PAGE_SIZE}")
+    kwargs["limit"] = limit
+    return kwargs
+
+
+def list_incidents(
+    db: connection,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    nature: Optional[str] = None,
+    side_of_town: Optional[str] = None,
+    max_incident_rank: Optional[int] = None,
+    max_location_rank: Optional[int] = None,
+    after: Optional[tuple[datetime, str]] = None,
+    limit: int = API_PAGE_SIZE,
+) -> tuple[list[dict], Optional[str]]:
+    """One page of incidents, newest first, and the cursor of the next page (None on the last page).
+
+    Keyset pagination on (incident_ts, incident_num): each page is an index range scan starting right
+    after the previous page's last row, so deep pages cost the same as the first.
+    """
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("incidents.incident_ts >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("incidents.incident_ts < %s")
+        params.append(end)
+    if nature is not None:
+        clauses.append("incidents.nature = %s")
+        params.append(nature)
+    if side_of_town is not None:
+        clauses.append("incidents.side_of_town = %s")
+        params.append(side_of_town)
+    if max_incident_rank is not None:
+        clauses.append("incidents.incident_rank <= %s")
+        params.append(max_incident_rank)
+    if max_location_rank is not None:
+        clauses.append("incidents.location_rank <= %s")
+        params.append(max_location_rank)
+    if after is not None:
+        clauses.append("(incidents.incident_ts, incidents.incident_num) < (%s, %s)")
+        params.extend(after)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    with db.cursor() as cur:
+        cur.execute(INCIDENT_PAGE_SQL.format(columns=INCIDENT_COLUMNS_SQL, where=where), params + [limit + 1])
+        rows = cur.fetchall()
+
+    fields = INCIDENT_FIELDS + ("latitude", "longitude")
+    page = [dict(zip(fields, row)) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last["incident_ts"], last["incident_num"])
+    return page, next_cursor
+
+
+def query_rollups(db: connection, params: dict[str, str]) -> list[dict]:
+    """Rollup counts for /rollups?dims=a,b&start=YYYY-MM-DD&end=...&<dimension>=<value>."""
+    dims = [d for d in params.get("dims", "").split(",") if d]
+    start = date.fromisoformat(params["start"]) if "start" in params else None
+    end = date.fromisoformat(params["end"]) if "end" in params else None
+    filters = {}
+    for name, value in params.items():
+        if name in ("dims", "start", "end"):
+            continue
+        if name not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"Unknown parameter: {name}")
+        filters[name] = _parse_int(name, value) if name in _INT_DIMENSIONS else value
+    rows = rollup_counts(db, dims, start, end, filters)
+    return [dict(zip(dims + ["incidents"], row)) for row in rows]
@@ -0,0 +1,192 @@
+"""
+Read-only HTTP query service over `incidents` and `location`.
+
+  GET /incidents?start=&end=&nature=&side_of_town=&max_incident_rank=&max_location_rank=&limit=&after=
+  GET /rollups?dims=side_of_town,time_of_day&start=&end=&nature=
+  GET /health
+
+Responses are cached in an LRU that is emptied whenever the pipeline commits a batch (LISTEN on
+the batch channel), so repeated queries are answered without touching the database.
+
+Run from repo root: python -m src.api.server [--host 0.0.0.0] [--port 8080]
+"""
+import argparse
+import json
+import logging
+import select
+import threading
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Sequence
+from urllib.parse import parse_qsl, urlparse
+
+from psycopg2.extensions import connection
+
+from src.config import API_CACHE_SIZE, API_DB_POOL_SIZE, API_HOST, API_PORT
+from src.logging_config import setup_logging
+from src.api.cache import ResponseCache
+from src.api.queries import list_incidents, parse_incident_params, query_rollups
+from src.db.connection import create_connection, create_connection_pool, terminate_connection
+from src.db.events import BATCH_CHANNEL
+from src.db.schema import create_query_indexes
+
+# Seconds between listener wake-ups (to notice shutdown) and between reconnect attempts
+LISTEN_TIMEOUT = 5
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _incidents_route(db: connection, params: dict[str, str]) -> dict:
+    page, next_cursor = list_incidents(db, **parse_incident_params(params))
+    return {"incidents": page, "next": next_cursor}
+
+
+def _rollups_route(db: connection, params: dict[str, str]) -> dict:
+    return {"rollups": query_rollups(db, params)}
+
+
+ROUTES: dict[str, Callable[[connection, dict[str, str]], dict]] = {
+    "/incidents": _incidents_route,
+    "/rollups": _rollups_route,
+}
+
+
+class QueryServer(ThreadingHTTPServer):
+    """HTTP server holding the read-only connection pool, response cache and invalidation listener."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], pool_size: int = API_DB_POOL_SIZE, cache_size: int = API_CACHE_SIZE):
+        super().__init__(address, QueryHandler)
+        self.pool = create_connection_pool(pool_size)
+        # Nothing is cached until the listener is subscribed, so no batch can slip by unnoticed
+        self.cache = ResponseCache(cache_size)
+        self.cache.set_enabled(False)
+        self._stop = threading.Event()
+        self._listener = threading.Thread(target=self._listen_for_batches, name="batch-listener", daemon=True)
+        self._listener.start()
+
+    def run_query(self, route: Callable[[connection, dict[str, str]], dict], params: dict[str, str]) -> dict:
+        conn = self.pool.getconn()
+        try:
+            conn.set_session(readonly=True, autocommit=True)
+            return route(conn, params)
+        finally:
+            self.pool.putconn(conn)
+
+    def _listen_for_batches(self) -> None:
+        """Empty the cache on every batch notification; bypass it while not subscribed."""
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = create_connection()
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {BATCH_CHANNEL}")
+                self.cache.set_enabled(True)
+                logger.info("Listening for batch notifications on %s", BATCH_CHANNEL)
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        sources = sorted({n.payload for n in conn.notifies})
+                        conn.notifies.clear()
+                        self.cache.invalidate()
+                        logger.debug("Batch committed (%s); response cache cleared", ", ".join(sources))
+            except Exception as e:
+                self.cache.set_enabled(False)
+                logger.warning("Batch listener disconnected, caching disabled: %s", e)
+                self._stop.wait(LISTEN_TIMEOUT)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+    def server_close(self) -> None:
+        self._stop.set()
+        super().server_close()
+        self.pool.closeall()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server: QueryServer
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+
+        if url.path == "/health":
+            cache = self.server.cache
+            self._send(200, {"status": "ok", "cache": {"enabled": cache.enabled, "entries": len(cache), "hits": cache.hits, "misses": cache.misses}})
+            return
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._send(404, {"error": f"Unknown path {url.path}"})
+            return
+
+        key = (url.path, tuple(sorted(params.items())))
+        body = self.server.cache.get(key)
+        if body is not None:
+            self._send_body(200, body, cache_status="HIT")
+            return
+        generation = self.server.cache.generation
+        try:
+            payload = self.server.run_query(route, params)
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logger.exception("Error serving %s: %s", self.path, e)
+            self._send(500, {"error": "internal error"})
+            return
+        body = json.dumps(payload, default=_json_default).encode()
+        self.server.cache.put(key, body, generation)
+        self._send_body(200, body, cache_status="MISS")
+
+    def _send(self, status: int, payload: dict) -> None:
+        self._send_body(status, json.dumps(payload, default=_json_default).encode())
+
+    def _send_body(self, status: int, body: bytes, cache_status: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if cache_status:
+            self.send_header("X-Cache", cache_status)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Read-only Norman PD incident query API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        create_query_indexes(conn)
+    finally:
+        terminate_connection(conn)
+
+    server = QueryServer((args.host, args.port))
+    logger.info("Query API listening on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Query-plan regression suite: EXPLAIN (ANALYZE, BUFFERS) every pipeline query against a (synthetic)
+history and compare plan shapes and latencies with a stored baseline.
+
+Each query is the pipeline's own SQL constant, run with the parameters of the pending daily batch
+(change_seq window above the stage watermarks). Statements that write run inside a transaction that
+is rolled back, so the data set can be re-used.
+
+Run from repo root (after src.bench.synth):
+  python -m src.bench.plans --update-baseline          # record plans + timings
+  python -m src.bench.plans                            # compare; exit status 1 on a regression
+"""
+import argparse
+import json
+import logging
+import statistics
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Sequence
+
+from psycopg2.extensions import connection, cursor
+
+from src.config import API_PAGE_SIZE, TOWN_CENTER
+from src.logging_config import setup_logging
+from src.api.queries import INCIDENT_COLUMNS_SQL, INCIDENT_PAGE_SQL
+from src.bench.synth import DEFAULT_SCHEMA, use_schema
+from src.db.connection import create_connection, terminate_connection
+from src.db.changes import CHANGE_PAGE_SIZE, CHANGE_WEATHER, LOG_CHANGES_SQL, READ_CHANGES_SQL
+from src.db.enrichment import STAGE_FEATURES, STAGE_GEOCODE, STAGE_ROLLUP, STAGE_SIDE_OF_TOWN, STAGE_WEATHER
+from src.db.features import LOCATION_HISTORY_SQL, PENDING_FEATURE_LOCATIONS_SQL
+from src.db.incidents import EMSSTAT_PROPAGATE_SQL, INCIDENT_RANK_SQL, LOCATION_RANK_SQL, STALE_RANKS_SQL, UPSERT_INCIDENTS_SQL
+from src.db.location import PENDING_LOCATIONS_SQL
+from src.db.rollups import PENDING_ROLLUP_DAYS_SQL, ROLLUP_REBUILD_SQL
+from src.db.sketches import SKETCH_DAY_INCIDENTS_SQL, SKETCH_DAYS_SQL, SKETCH_UPSERT_SQL
+from src.db.spatial import HOTSPOTS_SQL, bbox_query, radius_query
+from src.enrich.geography import PENDING_SIDE_OF_TOWN_SQL, SIDE_OF_TOWN_APPLY_SQL
+from src.enrich.weather import PENDING_WEATHER_SQL, WEATHER_APPLY_SQL
+
+DEFAULT_BASELINE = "resources/bench/plan_baseline.json"
+
+# A query regresses when its median is this much slower than baseline (ratio) and by at least MIN_REGRESSION_MS
+DEFAULT_TOLERANCE = 0.5
+MIN_REGRESSION_MS = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class BenchQuery(NamedTuple):
+    """A pipeline statement: SQL, parameters from the batch context, optional per-run setup (temp tables)."""
+
+    name: str
+    sql: str
+    params: Callable[[dict], tuple] = lambda ctx: ()
+    setup: Optional[Callable[[cursor, dict], None]] = None
+
+
+def _window(stage: str) -> Callable[[dict], tuple]:
+    return lambda ctx: (ctx["watermarks"].get(stage, 0), ctx["high"])
+
+
+def _bulk_weather(cur: cursor, ctx: dict) -> None:
+    """bulk_weather as get_weather fills it: one code per pending (time, location) pair."""
+    cur.execute(
+        """CREATE TEMP TABLE bulk_weather ON COMMIT DROP AS
+           SELECT DISTINCT incident_ts, location, 3 AS weather FROM incidents
+           WHERE change_seq > %s AND change_seq <= %s""",
+        (ctx["watermarks"].get(STAGE_WEATHER, 0), ctx["high"]),
+    )
+
+
+def _bulk_side_of_town(cur: cursor, ctx: dict) -> None:
+    """bulk_side_of_town as side_of_town fills it: one direction per pending location."""
+    cur.execute(
+        """CREATE TEMP TABLE bulk_side_of_town ON COMMIT DROP AS
+           SELECT DISTINCT location AS loc, 'N'::text AS side_of_town FROM incidents
+           WHERE change_seq > %s AND change_seq <= %s""",
+        (ctx["watermarks"].get(STAGE_SIDE_OF_TOWN, 0), ctx["high"]),
+    )
+
+
+def _bulk_incidents(cur: cursor, ctx: dict) -> None:
+    """The pending tail as a replay would re-parse it: every tenth row corrected, the rest unchanged."""
+    cur.execute(
+        """CREATE TEMP TABLE bulk_incidents ON COMMIT DROP AS
+           SELECT incident_num, incident_ts, day_of_week, time_of_day, location,
+                  CASE WHEN change_seq %% 10 = 0 THEN nature || ' (Corrected)' ELSE nature END AS nature, emsstat, parser_version
+           FROM incidents WHERE change_seq > %s AND change_seq <= %s""",
+        (ctx["watermarks"].get(STAGE_ROLLUP, 0), ctx["high"]),
+    )
+
+
+def _feature_window(ctx: dict) -> tuple:
+    low = ctx["watermarks"].get(STAGE_FEATURES, 0)
+    return (low, ctx["high"], low, ctx["high"])
+
+
+def _busiest_location_history(ctx: dict) -> tuple:
+    """History the feature refresh reads for the busiest location around the pending tail."""
+    return (ctx["busiest_location"], ctx["last_ts"] - timedelta(days=180), ctx["last_ts"] + timedelta(days=90))
+
+
+def _last_month_hotspots(ctx: dict) -> tuple:
+    """Busiest precision-7 cells of the last 30 days of history."""
+    return (7, ctx["last_ts"] - timedelta(days=30), ctx["last_ts"], 20)
+
+
+def _rollup_days(ctx: dict) -> tuple:
+    days = ctx["pending_days"] or [None]
+    return (days[0], days[-1], days)
+
+
+# Batch writes the pipeline sends through execute_values, fed here from a temp table or a query instead
+UPSERT_BULK_INCIDENTS_SQL = UPSERT_INCIDENTS_SQL.format(rows="SELECT * FROM bulk_incidents")
+# Sketches of the pending days written back as they are (the write a batch's add_to_sketches ends with)
+SKETCH_REWRITE_SQL = SKETCH_UPSERT_SQL.format(
+    rows=f"SELECT * FROM ({SKETCH_DAYS_SQL}) sketches ORDER BY day, dimension",
+)
+# The change-log entries of a weather flush (log_changes_from over the apply's rows)
+LOG_WEATHER_CHANGES_SQL = LOG_CHANGES_SQL.format(
+    rows=f"SELECT '{CHANGE_WEATHER}', incident_num FROM incidents WHERE change_seq > %s AND change_seq <= %s",
+)
+
+# Spatial lookups around the town center: a 500 m radius and a ~2 km box (the statement depends on the cell cover)
+RADIUS_SQL, RADIUS_PARAMS = radius_query(*TOWN_CENTER, 500)
+BBOX_SQL, BBOX_PARAMS = bbox_query(TOWN_CENTER[0] - 0.009, TOWN_CENTER[1] - 0.011, TOWN_CENTER[0] + 0.009, TOWN_CENTER[1] + 0.011)
+
+# Query API pages filtered on side-table columns (side of town on `location`, ranks on `location_ranks`)
+API_SIDE_OF_TOWN_PAGE_SQL = INCIDENT_PAGE_SQL.format(
+    columns=INCIDENT_COLUMNS_SQL, where="WHERE incidents.side_of_town = %s",
+)
+API_SIDE_OF_TOWN_RANK_PAGE_SQL = INCIDENT_PAGE_SQL.format(
+    columns=INCIDENT_COLUMNS_SQL, where="WHERE incidents.side_of_town = %s AND incidents.location_rank <= %s",
+)
+
+
+QUERIES = [
+    BenchQuery("change_seq_high", "SELECT COALESCE(MAX(change_seq), 0) FROM incidents"),
+    BenchQuery("emsstat_propagate", EMSSTAT_PROPAGATE_SQL),
+    BenchQuery("location_rank", LOCATION_RANK_SQL),
+    BenchQuery("incident_rank", INCIDENT_RANK_SQL),
+    BenchQuery("stale_location_ranks", STALE_RANKS_SQL[0]),
+    BenchQuery("stale_nature_ranks", STALE_RANKS_SQL[1]),
+    BenchQuery("upsert_incidents", UPSERT_BULK_INCIDENTS_SQL, setup=_bulk_incidents),
+    BenchQuery("pending_locations", PENDING_LOCATIONS_SQL, _window(STAGE_GEOCODE)),
+    BenchQuery("pending_weather", PENDING_WEATHER_SQL, _window(STAGE_WEATHER)),
+    BenchQuery("weather_apply", WEATHER_APPLY_SQL.format(table="bulk_weather"), setup=_bulk_weather),
+    BenchQuery("pending_side_of_town", PENDING_SIDE_OF_TOWN_SQL, _window(STAGE_SIDE_OF_TOWN)),
+    BenchQuery("side_of_town_apply", SIDE_OF_TOWN_APPLY_SQL.format(table="bulk_side_of_town"), setup=_bulk_side_of_town),
+    BenchQuery("pending_rollup_days", PENDING_ROLLUP_DAYS_SQL, _window(STAGE_ROLLUP)),
+    BenchQuery("rollup_rebuild", ROLLUP_REBUILD_SQL, _rollup_days),
+    BenchQuery("pending_feature_locations", PENDING_FEATURE_LOCATIONS_SQL, _feature_window),
+    BenchQuery("feature_location_history", LOCATION_HISTORY_SQL, _busiest_location_history),
+    BenchQuery("sketch_days", SKETCH_DAYS_SQL, lambda ctx: (ctx["pending_days"],)),
+    BenchQuery("sketch_day_incidents", SKETCH_DAY_INCIDENTS_SQL, _rollup_days),
+    BenchQuery("sketch_upsert", SKETCH_REWRITE_SQL, lambda ctx: (ctx["pending_days"],)),
+    BenchQuery("log_changes", LOG_WEATHER_CHANGES_SQL, _window(STAGE_WEATHER)),
+    BenchQuery("read_changes", READ_CHANGES_SQL, lambda ctx: (ctx["last_change"] - CHANGE_PAGE_SIZE, CHANGE_PAGE_SIZE)),
+    BenchQuery("incidents_within_radius", RADIUS_SQL, lambda ctx: tuple(RADIUS_PARAMS)),
+    BenchQuery("incidents_in_bbox", BBOX_SQL, lambda ctx: tuple(BBOX_PARAMS)),
+    BenchQuery("hotspots_last_month", HOTSPOTS_SQL, _last_month_hotspots),
+    BenchQuery("api_side_of_town_page", API_SIDE_OF_TOWN_PAGE_SQL, lambda ctx: (ctx["busiest_side"], API_PAGE_SIZE + 1)),
+    BenchQuery(
+        "api_side_of_town_rank_page", API_SIDE_OF_TOWN_RANK_PAGE_SQL,
+        lambda ctx: (ctx["busiest_side"], 10, API_PAGE_SIZE + 1),
+    ),
+]
+
+
+def batch_context(db: connection) -> dict:
+    """Watermarks, change_seq high mark and pending days: the parameters a daily run would use."""
+    with db.cursor() as cur:
+        cur.execute("SELECT stage, watermark FROM enrichment_state")
+        watermarks = dict(cur.fetchall())
+        cur.execute("SELECT COALESCE(MAX(change_seq), 0), COUNT(*) FROM incidents")
+        high, rows = cur.fetchone()
+        cur.execute(PENDING_ROLLUP_DAYS_SQL, (watermarks.get(STAGE_ROLLUP, 0), high))
+        pending_days = sorted(row[0] for row in cur.fetchall())
+        cur.execute("SELECT location FROM incidents GROUP BY location ORDER BY COUNT(*) DESC LIMIT 1")
+        busiest = cur.fetchone()
+        cur.execute("SELECT MAX(incident_ts) FROM incidents")
+        last_ts = cur.fetchone()[0]
+        cur.execute("SELECT side_of_town FROM location WHERE side_of_town IS NOT NULL GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1")
+        side = cur.fetchone()
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+        last_change = cur.fetchone()[0]
+    db.rollback()
+    return {
+        "watermarks": watermarks, "high": high, "rows": rows, "pending_days": pending_days,
+        "busiest_location": busiest[0] if busiest else None, "last_ts": last_ts or datetime.now(),
+        "busiest_side": side[0] if side else "N", "last_change": last_change,
+    }
+
+
+def plan_shape(node: dict) -> str:
+    """Cost-free signature of a plan: node types, join types, relations and indexes, nested."""
+    label = node["Node Type"]
+    for key in ("Join Type", "Relation Name", "Index Name", "Strategy"):
+        if key in node:
+            label += f"[{node[key]}]"
+    children = node.get("Plans", [])
+    if children:
+        label += "(" + ", ".join(plan_shape(child) for child in children) + ")"
+    return label
+
+
+def explain(db: connection, query: BenchQuery, ctx: dict) -> dict:
+    """Run EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) for one query in a rolled-back transaction."""
+    try:
+        with db.cursor() as cur:
+            if query.setup:
+                query.setup(cur, ctx)
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.sql, query.params(ctx))
+            return cur.fetchone()[0][0]
+    finally:
+        db.rollback()
+
+
+def run_suite(db: connection, repeat: int = 3, queries: Sequence[BenchQuery] = QUERIES) -> dict:
+    """Measure every query: plan shape, median execution time over `repeat` runs (after one warm-up), buffers."""
+    ctx = batch_context(db)
+    results = {}
+    for query in queries:
+        explain(db, query, ctx)  # warm-up: caches, not timed
+        runs = [explain(db, query, ctx) for _ in range(repeat)]
+        plan = runs[-1]["Plan"]
+        results[query.name] = {
+            "shape": plan_shape(plan),
+            "median_ms": round(statistics.median(r["Execution Time"] for r in runs), 3),
+            "planning_ms": round(statistics.median(r["Planning Time"] for r in runs), 3),
+            "rows": plan.get("Actual Rows"),
+            "shared_hit_blocks": plan.get("Shared Hit Blocks"),
+            "shared_read_blocks": plan.get("Shared Read Blocks"),
+            "plan": runs[-1],
+        }
+        logger.info("%-22s %10.1f ms  %s", query.name, results[query.name]["median_ms"], results[query.name]["shape"][:120])
+    return {"context": {"rows": ctx["rows"], "high": ctx["high"], "pending_days": [str(d) for d in ctx["pending_days"]]}, "queries": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE, min_ms: float = MIN_REGRESSION_MS) -> list[str]:
+    """Regression messages for plans whose shape changed or that got slower than tolerated."""
+    problems = []
+    for name, now in current["queries"].items():
+        before = baseline["queries"].get(name)
+        if before is None:
+            continue
+        if now["shape"] != before["shape"]:
+            problems.append(f"{name}: plan changed\n    baseline: {before['shape']}\n    current:  {now['shape']}")
+        limit = before["median_ms"] * (1 + tolerance)
+        if now["median_ms"] > limit and now["median_ms"] - before["median_ms"] >= min_ms:
+            problems.append(
+                f"{name}: {now['median_ms']:.1f} ms vs baseline {before['median_ms']:.1f} ms "
+                f"(+{(now['median_ms'] / before['median_ms'] - 1) * 100 if before['median_ms'] else float('inf'):.0f}%)"
+            )
+    return problems
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the pipeline queries and flag plan/latency regressions")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="schema holding the benchmark data (see src.bench.synth)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with / write")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query (median is compared)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown ratio, e.g. 0.5 = +50%%")
+    parser.add_argument("--output", help="also write this run's full EXPLAIN output to this JSON file")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        use_schema(conn, args.schema)
+        current = run_suite(conn, repeat=args.repeat)
+    finally:
+        terminate_connection(conn)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(current, indent=2, default=str), encoding="utf-8")
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(current, indent=2, default=str), encoding="utf-8")
+        logger.info("Baseline written to %s (%d queries, %d incidents)", baseline_path, len(current["queries"]), current["context"]["rows"])
+        return 0
+    if not baseline_path.exists():
+        logger.error("No baseline at %s; run with --update-baseline first", baseline_path)
+        return 2
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline["context"]["rows"] != current["context"]["rows"]:
+        logger.warning("Baseline was taken on %d incidents, this run on %d", baseline["context"]["rows"], current["context"]["rows"])
+    problems = compare(current, baseline, args.tolerance)
+    for problem in problems:
+        logger.error("Regression: %s", problem)
+    if not problems:
+        logger.info("No plan or latency regressions against %s", baseline_path)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
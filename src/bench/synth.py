@@ -0,0 +1,307 @@
+"""
+Synthetic incident history for query benchmarking, loaded with COPY into a dedicated schema.
+
+The data mimics the real feed: daily volume with a diurnal curve, Zipf-skewed location and nature
+frequencies, EMSSTAT companion rows at the same time and place, intersections among addresses, and
+a tail of recent days left un-enriched (no weather rows, some locations not geocoded and without a
+side of town, watermarks just below them) so the pipeline's "pending" queries see a realistic daily batch.
+
+Run from repo root:
+  python -m src.bench.synth --incidents 2000000 --days 1825
+  python -m src.bench.plans --update-baseline
+"""
+import argparse
+import bisect
+import itertools
+import logging
+import random
+import re
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.config import TOWN_CENTER
+from src.logging_config import setup_logging
+from src.db.bulk import copy_rows
+from src.db.changes import CHANGE_NEW, LOG_CHANGES_SQL
+from src.db.connection import create_connection, terminate_connection
+from src.db.enrichment import STAGE_FEATURES, STAGE_GEOCODE, STAGE_ROLLUP, STAGE_SIDE_OF_TOWN, STAGE_WEATHER
+from src.db.features import refresh_features
+from src.db.incidents import INCIDENT_RANK_SQL, LOCATION_RANK_SQL
+from src.db.location import GEOHASH_PRECISION
+from src.db.rollups import refresh_rollup_days
+from src.db.sketches import rebuild_sketches
+from src.db.schema import (
+    create_enrichment_state_table,
+    create_enrichment_tables,
+    create_feature_table,
+    create_incident_table,
+    create_location_table,
+    create_query_indexes,
+    create_rollup_table,
+)
+from src.enrich.geography import compass_direction
+from src.pdf.parse_incidents import PARSER_VERSION
+from src.geo.geohash import encode as geohash_encode
+
+DEFAULT_SCHEMA = "bench"
+
+NATURES = [
+    "Traffic Stop", "Larceny", "Alarm", "Check Area", "Suspicious", "Welfare Check", "Disturbance/Domestic",
+    "Motorist Assist", "Animal Complaint", "Sick Person", "Fall Victim", "911 Call Nature Unknown", "Noise Complaint",
+    "Burglary", "Fraud", "Harassment / Threats Report", "Transfer/Interfacility", "Breathing Problems",
+    "Chest Pain", "MVA Non Injury", "MVA With Injuries", "Public Assist", "Parking Problem", "Follow Up",
+    "Trespassing", "Stolen Vehicle", "Shots Heard", "Unconscious Person/Syncope", "Overdose/Poisoning",
+    "Assault", "Drug Violation", "Found Item", "Escort/Transport", "Stroke", "Seizure", "Debris in Roadway",
+    "Vandalism", "Runaway or Lost Child", "Mental Health", "Fire Alarm",
+]
+STREETS = [
+    "MAIN ST", "LINDSEY ST", "ROBINSON ST", "GRAY ST", "BOYD ST", "ALAMEDA ST", "48TH AVE NE", "24TH AVE NW",
+    "12TH AVE NE", "PORTER AVE", "FLOOD AVE", "BERRY RD", "CLASSEN BLVD", "JENKINS AVE", "ELM AVE", "CHAUTAUQUA AVE",
+    "IMHOFF RD", "ROCK CREEK RD", "TECUMSEH RD", "FRANKLIN RD", "HIGHWAY 9", "INTERSTATE DR", "36TH AVE NW",
+    "CONSTITUTION ST", "HALEY ST", "ACRES ST", "COMANCHE ST", "EUFAULA ST", "APACHE ST", "WYLIE RD",
+]
+DIRECTION_PREFIXES = ["", "W ", "E ", "N ", "S "]
+# Open-Meteo WMO weather codes with rough Norman frequencies
+WEATHER_CODES = [0, 1, 2, 3, 51, 53, 61, 63, 65, 71, 95]
+WEATHER_WEIGHTS = [30, 20, 15, 15, 5, 3, 5, 3, 1, 1, 2]
+# Relative incident volume per hour of day (quiet small hours, afternoon peak)
+HOURLY_WEIGHTS = [4, 3, 3, 2, 2, 2, 3, 5, 6, 7, 7, 8, 8, 8, 8, 9, 9, 9, 8, 8, 7, 6, 5, 5]
+
+COPY_CHUNK_ROWS = 100_000
+INCIDENT_COLUMNS = (
+    "incident_num", "incident_ts", "day_of_week", "time_of_day", "location", "nature", "emsstat", "change_seq", "parser_version",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def use_schema(db: connection, schema: str) -> None:
+    """Create `schema` if needed and make it the session's search_path (pipeline SQL is unqualified)."""
+    if not re.fullmatch(r"[a-z_][a-z0-9_]*", schema):
+        raise ValueError(f"Invalid schema name: {schema}")
+    with db.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+        cur.execute(f"SET search_path TO {schema}")
+    db.commit()
+
+
+def zipf_cum_weights(n: int, s: float) -> list[float]:
+    """Cumulative Zipf(s) weights over ranks 1..n (rank 1 most frequent)."""
+    return list(itertools.accumulate(1.0 / k ** s for k in range(1, n + 1)))
+
+
+def _pick(rnd: random.Random, items: Sequence, cum_weights: list[float]):
+    return items[bisect.bisect(cum_weights, rnd.random() * cum_weights[-1])]
+
+
+def synth_addresses(n: int, rnd: random.Random) -> list[str]:
+    """n distinct addresses in the report's style: block addresses and 'A / B' intersections."""
+    addresses: set[str] = set()
+    while len(addresses) < n:
+        if rnd.random() < 0.2:
+            a, b = rnd.sample(STREETS, 2)
+            addresses.add(f"{rnd.choice(DIRECTION_PREFIXES)}{a} / {rnd.choice(DIRECTION_PREFIXES)}{b}")
+        else:
+            addresses.add(f"{rnd.randrange(100, 4800, 100)} {rnd.choice(DIRECTION_PREFIXES)}{rnd.choice(STREETS)}")
+    ordered = sorted(addresses)
+    rnd.shuffle(ordered)  # rank order (popularity) independent of spelling
+    return ordered
+
+
+def synth_incident_rows(
+    incidents: int,
+    days: int,
+    addresses: list[str],
+    coords: dict[str, tuple[float, float]],
+    pending_days: int,
+    rnd: random.Random,
+    location_skew: float,
+    nature_skew: float,
+    end: date,
+) -> Iterator[tuple]:
+    """Yield (incident row, weather) in time order (change_seq follows time); rows in the last pending_days have no weather."""
+    loc_weights = zipf_cum_weights(len(addresses), location_skew)
+    nature_weights = zipf_cum_weights(len(NATURES), nature_skew)
+    hour_weights = list(itertools.accumulate(HOURLY_WEIGHTS))
+    weather_weights = list(itertools.accumulate(WEATHER_WEIGHTS))
+    per_day = incidents / days
+    start = end - timedelta(days=days - 1)
+    seq = 0
+    numbers: dict[int, int] = {}
+    for d in range(days):
+        day = start + timedelta(days=d)
+        pending = d >= days - pending_days
+        # Busier on Fridays/Saturdays, +-20% noise
+        volume = per_day * (1.15 if day.weekday() in (4, 5) else 0.95) * rnd.uniform(0.8, 1.2)
+        times = sorted(
+            datetime(day.year, day.month, day.day, _pick(rnd, range(24), hour_weights), rnd.randrange(60))
+            for _ in range(max(1, round(volume)))
+        )
+        for ts in times:
+            location = _pick(rnd, addresses, loc_weights)
+            nature = _pick(rnd, NATURES, nature_weights)
+            weather = None if pending else _pick(rnd, WEATHER_CODES, weather_weights)
+            day_of_week = (ts.isoweekday() % 7) + 1  # 1=Sunday .. 7=Saturday, as get_day_of_week
+            # ~6% of calls have an EMS companion row at the same time and place
+            companions = 2 if rnd.random() < 0.06 else 1
+            for companion in range(companions):
+                numbers[ts.year] = numbers.get(ts.year, 0) + 1
+                seq += 1
+                if companions == 1:
+                    emsstat = 0
+                elif companion == 0:
+                    emsstat = 1
+                else:
+                    emsstat = 0 if pending else 1  # history was already propagated; pending rows still need it
+                yield (
+                    f"{ts.year}-{numbers[ts.year]:08d}", ts, day_of_week, ts.hour, location, nature, emsstat, seq, PARSER_VERSION,
+                ), weather
+
+
+def _chunks(rows: Iterator[tuple], size: int) -> Iterator[list[tuple]]:
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate(
+    db: connection,
+    incidents: int,
+    days: int,
+    locations: int,
+    pending_days: int = 1,
+    seed: int = 0,
+    location_skew: float = 1.1,
+    nature_skew: float = 1.3,
+    end: Optional[date] = None,
+) -> dict:
+    """Replace the current schema's pipeline tables with a synthetic history; return a summary."""
+    rnd = random.Random(seed)
+    end = end or date.today() - timedelta(days=1)
+    with db.cursor() as cur:
+        cur.execute(
+            "DROP TABLE IF EXISTS incidents, location, incident_weather, location_ranks, nature_ranks, enrichment_state, "
+            "incident_rollup, incident_features, change_log, incident_sketches CASCADE"
+        )
+        cur.execute("DROP SEQUENCE IF EXISTS incidents_change_seq, change_log_seq")
+    db.commit()
+    create_incident_table(db)
+    create_location_table(db)
+    create_enrichment_tables(db)
+    create_enrichment_state_table(db)
+    create_rollup_table(db)
+    create_feature_table(db)
+
+    addresses = synth_addresses(locations, rnd)
+    # ~2% of addresses (the rarest) are new: only geocoded (and given a side of town) once the pending batch is processed
+    known = addresses[: max(1, int(len(addresses) * 0.98))]
+    lat0, lon0 = TOWN_CENTER
+    coords = {a: (lat0 + rnd.uniform(-0.08, 0.08), lon0 + rnd.uniform(-0.1, 0.1)) for a in known}
+    with db.cursor() as cur:
+        copy_rows(
+            cur, "location", ("loc", "latitude", "longitude", "geohash", "side_of_town"),
+            (
+                (a, lat, lon, geohash_encode(lat, lon, GEOHASH_PRECISION), compass_direction(lat, lon))
+                for a, (lat, lon) in coords.items()
+            ),
+        )
+    db.commit()
+    logger.info("Loaded %d synthetic locations (%d left un-geocoded)", len(coords), len(addresses) - len(coords))
+
+    rows = synth_incident_rows(incidents, days, addresses, coords, pending_days, rnd, location_skew, nature_skew, end)
+    pending_from = datetime.combine(end - timedelta(days=pending_days - 1), datetime.min.time())
+    total = 0
+    watermark = 0
+    for chunk in _chunks(rows, COPY_CHUNK_ROWS):
+        with db.cursor() as cur:
+            copy_rows(cur, "incidents", INCIDENT_COLUMNS, [row for row, _ in chunk])
+            copy_rows(
+                cur, "incident_weather", ("incident_num", "weather"),
+                [(row[0], weather) for row, weather in chunk if weather is not None],
+            )
+        db.commit()
+        total += len(chunk)
+        watermark = max([watermark] + [row[7] for row, _ in chunk if row[1] < pending_from])
+        logger.info("Loaded %d synthetic incidents", total)
+
+    with db.cursor() as cur:
+        cur.execute("SELECT setval('incidents_change_seq', (SELECT COALESCE(MAX(change_seq), 1) FROM incidents))")
+        cur.execute(LOCATION_RANK_SQL)
+        cur.execute(INCIDENT_RANK_SQL)
+        # Everything before the pending tail counts as processed by every stage
+        for stage in (STAGE_GEOCODE, STAGE_WEATHER, STAGE_SIDE_OF_TOWN, STAGE_ROLLUP):
+            cur.execute(
+                "INSERT INTO enrichment_state (stage, watermark, updated_at) VALUES (%s, %s, NOW())",
+                (stage, watermark),
+            )
+        cur.execute("SELECT DISTINCT incident_ts::date FROM incidents WHERE change_seq <= %s", (watermark,))
+        history_days = [row[0] for row in cur.fetchall()]
+    refresh_rollup_days(db, history_days)
+    db.commit()
+    # Every load logs its rows to the change feed and adds them to their days' sketches
+    with db.cursor() as cur:
+        cur.execute(LOG_CHANGES_SQL.format(rows="SELECT %s, incident_num FROM incidents ORDER BY change_seq"), (CHANGE_NEW,))
+    db.commit()
+    rebuild_sketches(db)
+    # Features are counted over everything; the watermark then goes back so the tail is still pending
+    refresh_features(db)
+    with db.cursor() as cur:
+        cur.execute("UPDATE enrichment_state SET watermark = %s WHERE stage = %s", (watermark, STAGE_FEATURES))
+    db.commit()
+    create_query_indexes(db)
+    db.autocommit = True
+    with db.cursor() as cur:
+        cur.execute("VACUUM ANALYZE incidents")
+        cur.execute("VACUUM ANALYZE incident_weather")
+        cur.execute("VACUUM ANALYZE location")
+        cur.execute("VACUUM ANALYZE incident_rollup")
+        cur.execute("VACUUM ANALYZE incident_features")
+        cur.execute("VACUUM ANALYZE change_log")
+        cur.execute("VACUUM ANALYZE incident_sketches")
+    db.autocommit = False
+
+    summary = {
+        "incidents": total,
+        "days": days,
+        "locations": len(addresses),
+        "geocoded_locations": len(coords),
+        "pending_days": pending_days,
+        "pending_incidents": total - watermark,
+        "seed": seed,
+    }
+    logger.info("Synthetic history ready: %s", summary)
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fill a Postgres schema with a synthetic incident history")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="schema to (re)create the pipeline tables in")
+    parser.add_argument("--incidents", type=int, default=1_000_000, help="approximate number of incident calls (EMS companions add ~6%%)")
+    parser.add_argument("--days", type=int, default=1825)
+    parser.add_argument("--locations", type=int, default=20_000)
+    parser.add_argument("--pending-days", type=int, default=1, help="trailing days left un-enriched")
+    parser.add_argument("--location-skew", type=float, default=1.1, help="Zipf exponent of location frequencies")
+    parser.add_argument("--nature-skew", type=float, default=1.3, help="Zipf exponent of nature frequencies")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.schema == "public":
+        parser.error("refusing to replace the pipeline tables in the public schema")
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        use_schema(conn, args.schema)
+        generate(
+            conn, args.incidents, args.days, args.locations, args.pending_days, args.seed,
+            args.location_skew, args.nature_skew,
+        )
+    finally:
+        terminate_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,4 +3,72 @@ import os
 DB_PATH = os.environ.get("DATABASE_URL")
 LOG_LEVEL = os.environ.get("LOG_LEVEL")
 LOG_FILE = os.environ.get("LOG_FILE")
-TOWN_CENTER = (35.2226, -97.4395)
\ No newline at end of file
+TOWN_CENTER = (35.2226, -97.4395)
+
+# Patrol beat / neighborhood polygons (src.enrich.beats): GeoJSON file and the feature property naming each polygon
+BEATS_GEOJSON = os.environ.get("BEATS_GEOJSON", "resources/beats.geojson")
+BEATS_NAME_PROPERTY = os.environ.get("BEATS_NAME_PROPERTY", "name")
+
+# Upstream endpoints: the Norman PD activity reports page (report PDF links) and the Open-Meteo archive API.
+# Point them at local stubs to simulate the network stages (src.sim)
+NORMANPD_REPORTS_URL = os.environ.get(
+    "NORMANPD_REPORTS_URL",
+    "https://www.normanok.gov/public-safety/police-department/crime-prevention-data/department-activity-reports",
+)
+OPENMETEO_ARCHIVE_URL = os.environ.get("OPENMETEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+
+# Shared HTTP client (scrape + PDF fetch): (connect, read) timeouts in seconds, retries, pool size
+HTTP_TIMEOUT = (
+    float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5")),
+    float(os.environ.get("HTTP_READ_TIMEOUT", "30")),
+)
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "5"))
+HTTP_BACKOFF_FACTOR = float(os.environ.get("HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "8"))
+HTTP_USER_AGENT = os.environ.get("HTTP_USER_AGENT", "normanpd-incident-pipeline/1.0")
+
+# Postgres work queue (src.jobs): lease length, retry policy, idle poll interval
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "2"))
+# Minimum seconds between jobs of a kind across all workers (Nominatim usage policy: 1 request/second)
+JOB_MIN_INTERVAL = {
+    "geocode": float(os.environ.get("GEOCODE_MIN_INTERVAL", "1")),
+    "weather": float(os.environ.get("WEATHER_MIN_INTERVAL", "0.1")),
+}
+
+# Read-only query API (src.api.server)
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8080"))
+API_CACHE_SIZE = int(os.environ.get("API_CACHE_SIZE", "1024"))
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", "100"))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", "1000"))
+API_DB_POOL_SIZE = int(os.environ.get("API_DB_POOL_SIZE", "8"))
+
+# Content-addressed archive of fetched report PDFs (objects/<sha256>.pdf + refs per URL)
+PDF_ARCHIVE_DIR = os.environ.get("PDF_ARCHIVE_DIR", "resources/pdf_archive")
+
+# Report ingest (src.pipeline.ingest): download threads sharing the HTTP session, and parser processes (0 = CPU count)
+INGEST_FETCH_WORKERS = int(os.environ.get("INGEST_FETCH_WORKERS", "4"))
+INGEST_PARSE_WORKERS = int(os.environ.get("INGEST_PARSE_WORKERS", "0"))
+
+# Rows buffered by enrichment bulk writers (src.db.bulk) before one COPY + set-based apply
+BULK_FLUSH_SIZE = int(os.environ.get("BULK_FLUSH_SIZE", "5000"))
+
+# Enrichment checkpoints (src.db.enrichment): a stage commits and moves its watermark after this many items
+# or this many seconds, whichever comes first, so a crash loses at most one batch
+ENRICH_CHECKPOINT_ITEMS = int(os.environ.get("ENRICH_CHECKPOINT_ITEMS", "500"))
+ENRICH_CHECKPOINT_SECONDS = float(os.environ.get("ENRICH_CHECKPOINT_SECONDS", "60"))
+
+# Geocoder pool (src.enrich.geocoders): "<kind> <base url> <requests/second>" entries, comma separated;
+# kinds: nominatim, photon. Worker threads default to enough to saturate every backend's rate. A query
+# that finds every backend cooling down waits for the first to come back, up to GEOCODE_MAX_WAIT seconds.
+GEOCODER_BACKENDS = os.environ.get("GEOCODER_BACKENDS", "nominatim https://nominatim.openstreetmap.org 1")
+GEOCODER_WORKERS = int(os.environ.get("GEOCODER_WORKERS", "0"))
+GEOCODE_TIMEOUT = float(os.environ.get("GEOCODE_TIMEOUT", "10"))
+GEOCODE_MAX_WAIT = float(os.environ.get("GEOCODE_MAX_WAIT", "60"))
+
+# Profiling mode (src.profiling, `--profile`): run directories root and stack sampling interval in seconds
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.01"))
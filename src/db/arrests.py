@@ -0,0 +1,57 @@
+from psycopg2.extensions import connection
+import logging
+from datetime import date, datetime
+from typing import Optional
+
+from src.db.backend import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Re-loading a report (or replaying it with a fixed parser) rewrites only arrests whose values changed
+ARREST_UPSERT_SQL = """INSERT INTO arrests AS a (case_num, arrest_ts, arrestee, location, offense, arrestee_birthday,
+                                    arrestee_address, status, officer)
+               VALUES %s
+               ON CONFLICT (case_num, arrest_ts, arrestee) DO UPDATE SET
+                   location = EXCLUDED.location,
+                   offense = EXCLUDED.offense,
+                   arrestee_birthday = EXCLUDED.arrestee_birthday,
+                   arrestee_address = EXCLUDED.arrestee_address,
+                   status = EXCLUDED.status,
+                   officer = EXCLUDED.officer
+               WHERE (a.location, a.offense, a.arrestee_birthday, a.arrestee_address, a.status, a.officer)
+                     IS DISTINCT FROM
+                     (EXCLUDED.location, EXCLUDED.offense, EXCLUDED.arrestee_birthday, EXCLUDED.arrestee_address,
+                      EXCLUDED.status, EXCLUDED.officer)
+               RETURNING a.case_num"""
+
+
+def _birthday(value: str) -> Optional[date]:
+    """Arrestee birthday as a date (blank or unreadable -> None)."""
+    try:
+        return datetime.strptime(value, '%m/%d/%Y').date()
+    except ValueError:
+        return None
+
+
+def _arrest_rows(arrests: list[list[str]]) -> list[tuple]:
+    """Convert extract_arrests rows into ARREST_UPSERT_SQL tuples, one per (case, time, arrestee)."""
+    rows = {}
+    for arrest_ts, case_num, location, offense, arrestee, birthday, address, status, officer in arrests:
+        key = (case_num, datetime.strptime(arrest_ts, '%m/%d/%Y %H:%M'), arrestee)
+        rows[key] = key + (location, offense or None, _birthday(birthday), address or None, status or None, officer or None)
+    return list(rows.values())
+
+
+def populate_arrests(db: connection, arrests: list[list[str]]) -> int:
+    """Insert new arrests and rewrite stored ones whose values changed; return the number of rows written."""
+    try:
+        values = _arrest_rows(arrests)
+        if not values:
+            return 0
+        with db.cursor() as cur:
+            written = execute_values(cur, ARREST_UPSERT_SQL, values, page_size=1000, fetch=True)
+        db.commit()
+        return len(written)
+    except Exception as e:
+        logger.exception("Error populating arrests: %s", e)
+        raise Exception(f"Error populating arrests: {e}") from e
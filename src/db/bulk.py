@@ -0,0 +1,110 @@
+"""
+Bulk write-back for enrichment results.
+
+Enrichers add one row per result to a BulkWriter; on flush the buffered rows are bulk-loaded (COPY on Postgres) into a
+temporary table and applied with a single set-based statement (UPDATE ... FROM / INSERT ... SELECT),
+so a run costs a handful of statements instead of one round trip per row. A writer can also log the incidents each
+flush touched to the change feed (src.db.changes) and rebuild the dashboard rollups of their days (src.db.rollups),
+in the same transaction as the apply.
+"""
+import logging
+from typing import Iterable, Optional, Sequence
+
+from psycopg2.extensions import connection, cursor
+
+from src.config import BULK_FLUSH_SIZE
+from src.db.backend import backend_for
+from src.db.changes import log_changes_from
+from src.db.rollups import refresh_rollup_days
+
+logger = logging.getLogger(__name__)
+
+
+def copy_rows(cur: cursor, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> None:
+    """Bulk-load rows into table through the given cursor (COPY text format on Postgres)."""
+    backend_for(cur).copy_rows(cur, table, columns, rows)
+
+
+class BulkWriter:
+    """Buffer rows and apply them with COPY into a temp table plus one statement per flush.
+
+    `columns` are (name, SQL type) pairs of the buffered rows. `apply_sql` is the statement run
+    against the temp table, referenced as `{table}`; `params` are bound into it. `changes` is an
+    optional (kind, SQL) pair: the query selects the incident_num of every incident the flushed rows
+    touched (also against `{table}`), logged to the change feed after the apply. `rollup_days` is an
+    optional query selecting the distinct incident days the flushed rows touched (against `{table}`);
+    their rollup rows are rebuilt after the apply, for writes to columns the rollups group by. Flushes
+    happen every `flush_size` rows and on `flush()` / leaving the `with` block; the caller commits.
+
+    Example:
+        with BulkWriter(conn, "side_of_town", [("loc", "text"), ("side_of_town", "text")],
+                        "UPDATE location SET side_of_town = b.side_of_town FROM {table} b "
+                        "WHERE location.loc = b.loc") as writer:
+            writer.add(loc, direction)
+    """
+
+    def __init__(
+        self,
+        db: connection,
+        name: str,
+        columns: Sequence[tuple[str, str]],
+        apply_sql: str,
+        params: Sequence = (),
+        flush_size: int = BULK_FLUSH_SIZE,
+        changes: Optional[tuple[str, str]] = None,
+        rollup_days: Optional[str] = None,
+    ):
+        self.db = db
+        self.table = f"bulk_{name}"
+        self.columns = list(columns)
+        self.apply_sql = apply_sql.format(table=self.table)
+        self.params = tuple(params)
+        self.flush_size = flush_size
+        self.changes = (changes[0], changes[1].format(table=self.table)) if changes else None
+        self.rollup_days = rollup_days.format(table=self.table) if rollup_days else None
+        self.rows_written = 0
+        self._rows: list[tuple] = []
+
+    def add(self, *row) -> None:
+        if len(row) != len(self.columns):
+            raise ValueError(f"{self.table} expects {len(self.columns)} values, got {len(row)}")
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Apply the buffered rows; return the number of rows the apply statement affected."""
+        if not self._rows:
+            return 0
+        column_defs = ", ".join(f"{name} {sql_type}" for name, sql_type in self.columns)
+        try:
+            with self.db.cursor() as cur:
+                # Dropped at commit on Postgres, so pooled / long-lived connections are left clean
+                options = backend_for(self.db).temp_table_options
+                cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {self.table} ({column_defs}){options}")
+                cur.execute(f"TRUNCATE {self.table}")
+                copy_rows(cur, self.table, [name for name, _ in self.columns], self._rows)
+                cur.execute(self.apply_sql, self.params)
+                affected = cur.rowcount
+                if self.changes:
+                    log_changes_from(cur, *self.changes)
+                if self.rollup_days:
+                    cur.execute(self.rollup_days)
+                    refresh_rollup_days(self.db, [day for day, in cur.fetchall()])
+        except Exception as e:
+            logger.exception("Error flushing %d rows to %s: %s", len(self._rows), self.table, e)
+            raise Exception(f"Error flushing {self.table}: {e}") from e
+        logger.debug("Flushed %d rows through %s (%d affected)", len(self._rows), self.table, affected)
+        self._rows.clear()
+        self.rows_written += affected
+        return affected
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,41 @@
+from psycopg2.extensions import connection
+import logging
+from datetime import datetime
+
+from src.db.backend import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Re-loading a report (or replaying it with a fixed parser) rewrites only cases whose values changed
+CASE_UPSERT_SQL = """INSERT INTO cases AS c (case_num, case_ts, location, offense)
+               VALUES %s
+               ON CONFLICT (case_num) DO UPDATE SET
+                   case_ts = EXCLUDED.case_ts,
+                   location = EXCLUDED.location,
+                   offense = EXCLUDED.offense
+               WHERE (c.case_ts, c.location, c.offense) IS DISTINCT FROM (EXCLUDED.case_ts, EXCLUDED.location, EXCLUDED.offense)
+               RETURNING c.case_num"""
+
+
+def _case_rows(cases: list[list[str]]) -> list[tuple]:
+    """Convert extract_cases rows into (case_num, case_ts, location, offense) tuples, one per case number."""
+    rows = {}
+    for case_ts, case_num, location, offense in cases:
+        # Last occurrence wins if a report lists a case twice (one row per key per statement)
+        rows[case_num] = (case_num, datetime.strptime(case_ts, '%m/%d/%Y %H:%M'), location, offense or None)
+    return list(rows.values())
+
+
+def populate_cases(db: connection, cases: list[list[str]]) -> int:
+    """Insert new cases and rewrite stored ones whose values changed; return the number of rows written."""
+    try:
+        values = _case_rows(cases)
+        if not values:
+            return 0
+        with db.cursor() as cur:
+            written = execute_values(cur, CASE_UPSERT_SQL, values, page_size=1000, fetch=True)
+        db.commit()
+        return len(written)
+    except Exception as e:
+        logger.exception("Error populating cases: %s", e)
+        raise Exception(f"Error populating cases: {e}") from e
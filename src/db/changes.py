@@ -0,0 +1,147 @@
+"""
+Incident change feed: a durable `change_log` of which incidents each committed batch created, rewrote
+or enriched, numbered by a sequence so consumers can resume from a cursor instead of polling `incidents`.
+
+Writers (the loader, the weather and side-of-town stages, queue workers) log the incident_nums they
+changed in the same transaction as the change, and announce the batch with NOTIFY (src.db.events).
+Entries are written under a transaction-level lock on Postgres, so they become visible in seq order
+and a reader never skips an entry that commits after it has read past it.
+
+Kinds: new, updated (loader), weather, side_of_town, beat (enrichment). Rank updates are not logged: every
+run can shift the rank of most incidents; read them from incidents_enriched.
+
+Run from repo root (prints changes as they are committed):
+  python -m src.db.changes --after 0
+"""
+import argparse
+import logging
+import select
+import threading
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+from psycopg2.extensions import connection, cursor
+
+from src.logging_config import setup_logging
+from src.db.backend import POSTGRES, backend_for, execute_values
+from src.db.connection import create_connection, terminate_connection
+from src.db.events import BATCH_CHANNEL
+
+CHANGE_NEW = "new"
+CHANGE_UPDATED = "updated"
+CHANGE_WEATHER = "weather"
+CHANGE_SIDE_OF_TOWN = "side_of_town"
+CHANGE_BEAT = "beat"
+
+# Entries returned per read; a follower drains the backlog in pages of this size
+CHANGE_PAGE_SIZE = 1000
+# Seconds a follower waits for a notification before re-reading anyway (and noticing `stop`)
+FOLLOW_WAIT_SECONDS = 5
+
+# One entry per incident a batch changed ({rows}: "VALUES %s" of (kind, incident_num), or a SELECT of them)
+LOG_CHANGES_SQL = "INSERT INTO change_log (kind, incident_num) {rows}"
+# One page of the feed after a cursor (seq, limit), oldest first
+READ_CHANGES_SQL = "SELECT seq, kind, incident_num, logged_at FROM change_log WHERE seq > %s ORDER BY seq LIMIT %s"
+
+logger = logging.getLogger(__name__)
+
+
+class Change(NamedTuple):
+    seq: int
+    kind: str
+    incident_num: str
+    logged_at: datetime
+
+
+def _lock_change_log(cur: cursor) -> None:
+    """Hold the change-log lock until commit, so concurrent writers commit their entries in seq order."""
+    if backend_for(cur).concurrent_writers:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('change_log'))")
+
+
+def log_changes(cur: cursor, kind: str, incident_nums: Sequence[str]) -> None:
+    """Log a batch's changed incidents (committed by the caller, with the change)."""
+    if not incident_nums:
+        return
+    _lock_change_log(cur)
+    execute_values(cur, LOG_CHANGES_SQL.format(rows="VALUES %s"), [(kind, num) for num in incident_nums], page_size=1000)
+
+
+def log_changes_from(cur: cursor, kind: str, select_sql: str, params: Sequence = ()) -> None:
+    """Log the incident_nums a query selects (e.g. the rows a bulk apply just wrote), without fetching them."""
+    _lock_change_log(cur)
+    cur.execute(LOG_CHANGES_SQL.format(rows=f"SELECT %s, incident_num FROM ({select_sql}) changed"), (kind, *params))
+
+
+def read_changes(db: connection, after: int = 0, limit: int = CHANGE_PAGE_SIZE) -> list[Change]:
+    """Up to `limit` changes with seq above `after` (a cursor: the seq of the last change already seen), oldest first."""
+    with db.cursor() as cur:
+        cur.execute(READ_CHANGES_SQL, (after, limit))
+        return [Change(*row) for row in cur.fetchall()]
+
+
+def follow_changes(
+    after: int = 0,
+    limit: int = CHANGE_PAGE_SIZE,
+    wait: float = FOLLOW_WAIT_SECONDS,
+    stop: Optional[threading.Event] = None,
+) -> Iterator[list[Change]]:
+    """Yield pages of changes above `after` as batches commit, until `stop` is set.
+
+    Sleeps on LISTEN for the batch channel between reads (Postgres), so a new batch is seen as soon as it
+    commits without polling the table. Resume after a restart by passing the last seq seen as `after`.
+    """
+    stop = stop or threading.Event()
+    conn = create_connection()
+    try:
+        listening = backend_for(conn) is POSTGRES
+        if listening:
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {BATCH_CHANNEL}")
+            conn.commit()
+        while not stop.is_set():
+            changes = read_changes(conn, after, limit)
+            # End the read transaction: notifications are only delivered to an idle connection
+            conn.rollback()
+            if changes:
+                after = changes[-1].seq
+                yield changes
+                continue
+            if not listening:
+                stop.wait(wait)
+                continue
+            if select.select([conn], [], [], wait) != ([], [], []):
+                conn.poll()
+                conn.notifies.clear()
+    finally:
+        terminate_connection(conn)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Print incident changes (seq, kind, incident_num) as batches commit")
+    parser.add_argument("--after", type=int, default=0, help="cursor: print changes with a higher seq")
+    parser.add_argument("--once", action="store_true", help="print the backlog and exit instead of following")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    if args.once:
+        conn = create_connection()
+        try:
+            after = args.after
+            while changes := read_changes(conn, after):
+                for change in changes:
+                    print(f"{change.seq}\t{change.kind}\t{change.incident_num}", flush=True)
+                after = changes[-1].seq
+        finally:
+            terminate_connection(conn)
+        return
+    try:
+        for changes in follow_changes(args.after):
+            for change in changes:
+                print(f"{change.seq}\t{change.kind}\t{change.incident_num}", flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,24 @@ import os
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extensions import connection
+from psycopg2.pool import ThreadedConnectionPool
+
+from src.db.backend import POSTGRES, backend_for_url
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 def create_connection() -> connection:
-    """Create a connection to the database."""
+    """Create a connection to the database (Postgres, or embedded DuckDB for a duckdb:// URL)."""
     DATABASE_URL = os.getenv("DATABASE_URL")
     if not DATABASE_URL:
         raise Exception("DATABASE_URL is not set")
+    backend = backend_for_url(DATABASE_URL)
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        logger.debug("Database connection established")
-    except psycopg2.Error as e:
+        conn = backend.connect(DATABASE_URL)
+        logger.debug("Database connection established (%s)", backend.name)
+    except Exception as e:
         logger.exception("Error creating database connection: %s", e)
         raise Exception(f"Error creating database connection: {e}")
     return conn
@@ -25,6 +29,21 @@ def terminate_connection(conn: connection) -> None:
     """Terminate a connection to the database."""
     try:
         conn.close()
-    except psycopg2.Error as e:
+    except Exception as e:
         logger.exception("Error terminating database connection: %s", e)
         raise Exception(f"Error terminating database connection: {e}")
+
+def create_connection_pool(maxconn: int) -> ThreadedConnectionPool:
+    """Create a thread-safe pool of up to `maxconn` database connections."""
+    DATABASE_URL = os.getenv("DATABASE_URL")
+    if not DATABASE_URL:
+        raise Exception("DATABASE_URL is not set")
+    if backend_for_url(DATABASE_URL) is not POSTGRES:
+        raise Exception("Connection pools (query API) need a Postgres DATABASE_URL")
+    try:
+        pool = ThreadedConnectionPool(1, maxconn, DATABASE_URL)
+        logger.debug("Database connection pool established (max %d)", maxconn)
+    except psycopg2.Error as e:
+        logger.exception("Error creating database connection pool: %s", e)
+        raise Exception(f"Error creating database connection pool: {e}")
+    return pool
@@ -0,0 +1,185 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+from psycopg2.extensions import connection, cursor
+
+from src.config import ENRICH_CHECKPOINT_ITEMS, ENRICH_CHECKPOINT_SECONDS
+from src.db.backend import backend_for
+from src.db.events import notify_batch
+
+# Stage names used as keys in enrichment_state
+STAGE_GEOCODE = "geocode"
+STAGE_WEATHER = "weather"
+STAGE_SIDE_OF_TOWN = "side_of_town"
+STAGE_ROLLUP = "rollup"
+STAGE_FEATURES = "features"
+
+# Advisory lock (hashtext key) between incident writers (shared, until commit) and pending_window (exclusive, briefly)
+CHANGE_SEQ_LOCK = "incidents_change_seq"
+
+logger = logging.getLogger(__name__)
+
+
+def lock_change_seq(cur: cursor) -> None:
+    """Hold the change_seq writer lock (shared) until commit; taken before writing incident rows that get a change_seq."""
+    if backend_for(cur).concurrent_writers:
+        cur.execute("SELECT pg_advisory_xact_lock_shared(hashtext(%s))", (CHANGE_SEQ_LOCK,))
+
+
+def _committed_high(cur: cursor) -> int:
+    """Highest change_seq below which no uncommitted incident row can still appear."""
+    if not backend_for(cur).concurrent_writers:
+        cur.execute("SELECT COALESCE(MAX(change_seq), 0) FROM incidents")
+        return cur.fetchone()[0]
+    # A change_seq is drawn at insert but visible at commit: wait out the writers in flight (they hold the lock
+    # shared), so none of them commits a row below the bound after it is read. Later writers draw higher seqs.
+    cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (CHANGE_SEQ_LOCK,))
+    try:
+        cur.execute("SELECT COALESCE(MAX(change_seq), 0) FROM incidents")
+        return cur.fetchone()[0]
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (CHANGE_SEQ_LOCK,))
+
+
+def pending_window(db: connection, stage: str) -> tuple[int, int]:
+    """Return the (low, high] change_seq window of incident rows the stage has not processed yet.
+
+    `high` is commit-safe: no concurrent writer can still commit a row at or below it.
+    """
+    try:
+        with db.cursor() as cur:
+            cur.execute("SELECT watermark FROM enrichment_state WHERE stage = %s", (stage,))
+            row = cur.fetchone()
+            low = row[0] if row else 0
+            high = _committed_high(cur)
+    except Exception as e:
+        logger.exception("Error reading enrichment watermark for %s: %s", stage, e)
+        raise Exception(f"Error reading enrichment watermark for {stage}: {e}") from e
+    logger.debug("Stage %s pending window (%d, %d]", stage, low, high)
+    return low, high
+
+
+def advance_watermark(db: connection, stage: str, high: int) -> None:
+    """Mark rows up to change_seq `high` as processed by the stage (committed by the caller).
+
+    Also announces the stage's batch to listeners (query API cache) once the caller commits.
+    """
+    notify_batch(db, stage)
+    with db.cursor() as cur:
+        cur.execute(
+            """INSERT INTO enrichment_state (stage, watermark, updated_at) VALUES (%s, %s, NOW())
+               ON CONFLICT (stage) DO UPDATE SET watermark = GREATEST(enrichment_state.watermark, EXCLUDED.watermark),
+                                                 updated_at = EXCLUDED.updated_at""",
+            (stage, high),
+        )
+
+
+def with_next_seq(rows: Sequence[Sequence]) -> Iterator[tuple[Sequence, Optional[int]]]:
+    """Pair each pending item (rows ordered by their first change_seq, the last column) with the next item's first change_seq."""
+    for i, row in enumerate(rows):
+        yield row, (rows[i + 1][-1] if i + 1 < len(rows) else None)
+
+
+class StageCheckpoint:
+    """Commit a stage's work in batches, moving its watermark with every commit so a restarted run resumes there.
+
+    Items must be processed in order of their first (lowest) pending change_seq. Once an item is done,
+    every pending row below the next item's first change_seq is done, so that is what a checkpoint records.
+    An item that failed (or could not be processed yet) is `hold`-ed instead: the watermark then stays below
+    its first change_seq, so the next run's window starts at it again. A checkpoint is taken after `every`
+    items or `seconds`, whichever comes first (`every=None`: only at `finish`, one transaction for the run);
+    `flush` (e.g. a BulkWriter's) writes the batch's buffered results into its transaction first.
+    """
+
+    def __init__(
+        self,
+        db: connection,
+        stage: str,
+        high: int,
+        flush: Optional[Callable[[], object]] = None,
+        every: Optional[int] = ENRICH_CHECKPOINT_ITEMS,
+        seconds: float = ENRICH_CHECKPOINT_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.db = db
+        self.stage = stage
+        self.high = high
+        self.flush = flush
+        self.every = every
+        self.seconds = seconds
+        self.clock = clock
+        self.items = 0
+        self.held = 0
+        self.checkpoints = 0
+        self._hold_below: Optional[int] = None
+        self._batch = 0
+        self._started = clock()
+
+    def done(self, next_seq: Optional[int]) -> None:
+        """Record one finished item; `next_seq` is the first change_seq of the next item (None after the last)."""
+        self.items += 1
+        self._batch += 1
+        if next_seq is None or self.every is None:
+            return
+        if self._batch >= self.every or self.clock() - self._started >= self.seconds:
+            self._commit(next_seq - 1)
+
+    def hold(self, seq: int) -> None:
+        """Keep the watermark below change_seq `seq` (the first change_seq of an item left for a later run)."""
+        self.held += 1
+        if self._hold_below is None or seq < self._hold_below:
+            self._hold_below = seq
+
+    def finish(self) -> None:
+        """Flush and commit the last batch; the watermark moves to the end of the run's window (or the first hold)."""
+        self._commit(self.high)
+        if self.held:
+            logger.warning(
+                "Stage %s: %d items left for a later run; watermark held at %d of %d",
+                self.stage, self.held, self._hold_below - 1, self.high,
+            )
+
+    def _commit(self, watermark: int) -> None:
+        if self._hold_below is not None:
+            watermark = min(watermark, self._hold_below - 1)
+        if self.flush is not None:
+            self.flush()
+        advance_watermark(self.db, self.stage, watermark)
+        self.db.commit()
+        self.checkpoints += 1
+        self._batch = 0
+        self._started = self.clock()
+        logger.info("Stage %s checkpoint: %d items done, watermark %d of %d", self.stage, self.items, watermark, self.high)
+
+
+@contextmanager
+def stage_lock(db: connection, stage: str) -> Iterator[None]:
+    """Run the body as the only instance of the stage across processes (session-level lock on Postgres)."""
+    if not backend_for(db).concurrent_writers:
+        yield
+        return
+    with db.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(hashtext(%s))", (f"stage:{stage}",))
+    try:
+        yield
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        with db.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (f"stage:{stage}",))
+        db.commit()
+
+
+def reset_watermarks(db: connection, stages: Optional[Iterable[str]] = None) -> None:
+    """Forget enrichment progress so the next run reprocesses the full table (all stages by default)."""
+    stages = None if stages is None else list(stages)
+    with db.cursor() as cur:
+        if stages is None:
+            cur.execute("DELETE FROM enrichment_state")
+        else:
+            cur.execute("DELETE FROM enrichment_state WHERE stage = ANY(%s)", (stages,))
+    db.commit()
+    logger.info("Enrichment watermarks reset for %s", "all stages" if stages is None else ", ".join(stages))
@@ -0,0 +1,16 @@
+import logging
+
+from psycopg2.extensions import connection
+
+from src.db.backend import backend_for
+
+# NOTIFY channel announcing that a batch touching incidents/location was committed
+BATCH_CHANNEL = "incidents_batch"
+
+logger = logging.getLogger(__name__)
+
+
+def notify_batch(db: connection, source: str) -> None:
+    """Queue a batch notification (payload: which stage wrote); Postgres delivers it only when the caller commits."""
+    with db.cursor() as cur:
+        backend_for(db).notify(cur, BATCH_CHANNEL, source)
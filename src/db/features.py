@@ -0,0 +1,144 @@
+"""
+Rolling-window incident features, kept in `incident_features` (one row per incident_num):
+
+  loc_prior_7d / loc_prior_30d / loc_prior_90d   incidents at the same location in the 7/30/90 days before
+  loc_nature_prior_30d                           same location and nature in the 30 days before
+
+"Before" is [incident_ts - N days, incident_ts): the incident itself and others at the same minute are excluded.
+
+Maintained incrementally from the change_seq window: a new or rewritten incident changes its own
+features and those of later incidents at its location within the longest window (and, if it moved,
+at its previous location). Only those locations and time spans are recounted, with per-location
+sliding counters over the sorted incident times.
+"""
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.config import ENRICH_CHECKPOINT_ITEMS
+from src.db.bulk import BulkWriter
+from src.db.enrichment import STAGE_FEATURES, StageCheckpoint, pending_window, with_next_seq
+
+# Look-back windows in days (the longest bounds how far a change propagates)
+LOCATION_WINDOWS = (7, 30, 90)
+NATURE_WINDOW = 30
+FEATURE_COLUMNS = ("loc_prior_7d", "loc_prior_30d", "loc_prior_90d", "loc_nature_prior_30d")
+
+# Locations whose features a change_seq window invalidates, with the time span changed there and the first
+# change_seq involved (checkpoint order). Moved incidents count at their old location, read from incident_features.
+PENDING_FEATURE_LOCATIONS_SQL = """SELECT location, MIN(incident_ts), MAX(incident_ts), MIN(seq) FROM (
+                   SELECT i.location, i.incident_ts, i.change_seq AS seq FROM incidents i
+                   WHERE i.change_seq > %s AND i.change_seq <= %s
+                   UNION ALL
+                   SELECT f.location, f.incident_ts, i.change_seq FROM incident_features f
+                   JOIN incidents i ON i.incident_num = f.incident_num
+                   WHERE i.change_seq > %s AND i.change_seq <= %s
+                     AND (f.location, f.incident_ts) IS DISTINCT FROM (i.location, i.incident_ts)
+               ) changed
+               WHERE location IS NOT NULL AND incident_ts IS NOT NULL
+               GROUP BY location
+               ORDER BY 4"""
+LOCATION_HISTORY_SQL = """SELECT incident_num, incident_ts, nature FROM incidents
+               WHERE location = %s AND incident_ts >= %s AND incident_ts <= %s
+               ORDER BY incident_ts"""
+FEATURE_APPLY_SQL = """INSERT INTO incident_features (incident_num, location, incident_ts, loc_prior_7d, loc_prior_30d,
+                                              loc_prior_90d, loc_nature_prior_30d)
+               SELECT incident_num, location, incident_ts, loc_prior_7d, loc_prior_30d, loc_prior_90d, loc_nature_prior_30d
+               FROM {table}
+               ON CONFLICT (incident_num) DO UPDATE SET
+                   location = EXCLUDED.location,
+                   incident_ts = EXCLUDED.incident_ts,
+                   loc_prior_7d = EXCLUDED.loc_prior_7d,
+                   loc_prior_30d = EXCLUDED.loc_prior_30d,
+                   loc_prior_90d = EXCLUDED.loc_prior_90d,
+                   loc_nature_prior_30d = EXCLUDED.loc_nature_prior_30d"""
+FEATURE_BULK_COLUMNS = [
+    ("incident_num", "text"), ("location", "text"), ("incident_ts", "timestamp"),
+    ("loc_prior_7d", "integer"), ("loc_prior_30d", "integer"), ("loc_prior_90d", "integer"), ("loc_nature_prior_30d", "integer"),
+]
+
+logger = logging.getLogger(__name__)
+
+
+def window_counts(history: Sequence[tuple[str, datetime, str]], since: datetime) -> list[tuple]:
+    """Features of every incident in `history` at or after `since`.
+
+    `history` is one location's (incident_num, incident_ts, nature) rows sorted by time, starting at least
+    the longest window before `since`. Returns (incident_num, incident_ts, *FEATURE_COLUMNS) tuples.
+    """
+    times = [ts for _, ts, _ in history]
+    nature_times = defaultdict(list)
+    for _, ts, nature in history:
+        nature_times[nature].append(ts)
+
+    rows = []
+    for incident_num, ts, nature in history[bisect_left(times, since):]:
+        # Incidents before ts: everything left of its first same-minute entry
+        before = bisect_left(times, ts)
+        counts = [before - bisect_left(times, ts - timedelta(days=days)) for days in LOCATION_WINDOWS]
+        same_nature = nature_times[nature]
+        counts.append(bisect_left(same_nature, ts) - bisect_left(same_nature, ts - timedelta(days=NATURE_WINDOW)))
+        rows.append((incident_num, ts, *counts))
+    return rows
+
+
+def refresh_features(db: connection, checkpoint_every: Optional[int] = ENRICH_CHECKPOINT_ITEMS) -> int:
+    """Recount the features invalidated since the last refresh; return the number of incident rows written.
+
+    `checkpoint_every=None` writes the whole window in one transaction (a failed queue job leaves no partial progress).
+    """
+    longest = timedelta(days=max(LOCATION_WINDOWS + (NATURE_WINDOW,)))
+    try:
+        low, high = pending_window(db, STAGE_FEATURES)
+        with db.cursor() as cur:
+            cur.execute(PENDING_FEATURE_LOCATIONS_SQL, (low, high, low, high))
+            pending = cur.fetchall()
+        logger.info("Recounting incident features at %d locations", len(pending))
+
+        writer = BulkWriter(db, "features", FEATURE_BULK_COLUMNS, FEATURE_APPLY_SQL)
+        checkpoint = StageCheckpoint(db, STAGE_FEATURES, high, writer.flush, every=checkpoint_every)
+        for (location, first_ts, last_ts, _), next_seq in with_next_seq(pending):
+            # Changed span plus everything up to the longest window later, and the history those rows look back on
+            with db.cursor() as cur:
+                cur.execute(LOCATION_HISTORY_SQL, (location, first_ts - longest, last_ts + longest))
+                history = cur.fetchall()
+            for incident_num, ts, *counts in window_counts(history, first_ts):
+                writer.add(incident_num, location, ts, *counts)
+            checkpoint.done(next_seq)
+        checkpoint.finish()
+    except Exception as e:
+        logger.exception("Error refreshing incident features: %s", e)
+        raise Exception(f"Error refreshing incident features: {e}") from e
+    logger.info("Incident features written for %d incidents", writer.rows_written)
+    return writer.rows_written
+
+
+def feature_rows(db: connection, start: Optional[datetime] = None, end: Optional[datetime] = None) -> list[tuple]:
+    """Training rows over incidents in [start, end): incident columns plus their features, in time order.
+
+    Rows are (incident_num, incident_ts, location, nature, day_of_week, time_of_day, weather, side_of_town,
+    emsstat, *FEATURE_COLUMNS), read through the incident_features time index and the incidents primary key
+    (enrichment columns from incidents_enriched).
+    """
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("f.incident_ts >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("f.incident_ts < %s")
+        params.append(end)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    with db.cursor() as cur:
+        cur.execute(
+            f"""SELECT i.incident_num, i.incident_ts, i.location, i.nature, i.day_of_week, i.time_of_day, i.weather,
+                       i.side_of_town, i.emsstat, {', '.join('f.' + c for c in FEATURE_COLUMNS)}
+                FROM incident_features f JOIN incidents_enriched i ON i.incident_num = f.incident_num
+                {where}
+                ORDER BY f.incident_ts, f.incident_num""",
+            params,
+        )
+        return cur.fetchall()
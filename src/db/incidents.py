@@ -1,58 +1,132 @@
 from psycopg2.extensions import connection
 import logging
-from src.pdf.parse_incidents import get_day_of_week
+from src.pdf.parse_incidents import PARSER_VERSION, get_day_of_week
 from datetime import datetime
 
+from src.db.backend import execute_values
+from src.db.changes import CHANGE_NEW, CHANGE_UPDATED, log_changes
+from src.db.enrichment import lock_change_seq
+from src.db.events import notify_batch
+from src.db.rollups import refresh_rollup_days
+from src.db.sketches import add_to_sketches, refresh_sketch_days
+
 logger = logging.getLogger(__name__)
 
+# Pipeline SQL kept as constants so src.bench.plans can EXPLAIN exactly what the pipeline runs
+EMSSTAT_PROPAGATE_SQL = """
+    UPDATE incidents SET emsstat = 1
+    WHERE incident_num IN (
+        SELECT i2.incident_num FROM incidents i1
+        JOIN incidents i2 ON i1.incident_ts = i2.incident_ts AND i1.location = i2.location AND i1.incident_num <> i2.incident_num
+        WHERE i1.emsstat = 1 AND i2.emsstat = 0
+    )
+"""
+# Ranks live in narrow per-location / per-nature tables; only ranks that changed are written. NULL locations
+# and natures take part in the ranking (as they always did) but get no row.
+LOCATION_RANK_SQL = """INSERT INTO location_ranks (location, location_rank)
+               SELECT location, rank FROM (
+                   SELECT location, RANK() OVER (ORDER BY COUNT(*) DESC) AS rank FROM incidents GROUP BY location
+               ) ranked
+               WHERE location IS NOT NULL
+               ON CONFLICT (location) DO UPDATE SET location_rank = EXCLUDED.location_rank
+               WHERE location_ranks.location_rank <> EXCLUDED.location_rank"""
+INCIDENT_RANK_SQL = """INSERT INTO nature_ranks (nature, incident_rank)
+               SELECT nature, rank FROM (
+                   SELECT nature, RANK() OVER (ORDER BY COUNT(*) DESC) AS rank FROM incidents GROUP BY nature
+               ) ranked
+               WHERE nature IS NOT NULL
+               ON CONFLICT (nature) DO UPDATE SET incident_rank = EXCLUDED.incident_rank
+               WHERE nature_ranks.incident_rank <> EXCLUDED.incident_rank"""
+# Ranks of locations / natures no incident has any more (an upsert moved their last incident)
+STALE_RANKS_SQL = (
+    "DELETE FROM location_ranks WHERE NOT EXISTS (SELECT 1 FROM incidents WHERE incidents.location = location_ranks.location)",
+    "DELETE FROM nature_ranks WHERE NOT EXISTS (SELECT 1 FROM incidents WHERE incidents.nature = nature_ranks.nature)",
+)
+# Change-detecting upsert of parsed rows ({rows}: "VALUES %s" for execute_values, or a SELECT of the same columns).
+# Identical rows are not written; a new parser_version alone is stamped without a new change_seq.
+UPSERT_INCIDENTS_SQL = """INSERT INTO incidents AS i (incident_num, incident_ts, day_of_week, time_of_day, location, nature, emsstat, parser_version)
+               {rows}
+               ON CONFLICT (incident_num) DO UPDATE SET
+                   incident_ts = EXCLUDED.incident_ts,
+                   day_of_week = EXCLUDED.day_of_week,
+                   time_of_day = EXCLUDED.time_of_day,
+                   location = EXCLUDED.location,
+                   nature = EXCLUDED.nature,
+                   emsstat = EXCLUDED.emsstat,
+                   parser_version = EXCLUDED.parser_version,
+                   change_seq = CASE
+                       WHEN (i.incident_ts, i.day_of_week, i.time_of_day, i.location, i.nature, i.emsstat)
+                            IS DISTINCT FROM
+                            (EXCLUDED.incident_ts, EXCLUDED.day_of_week, EXCLUDED.time_of_day, EXCLUDED.location, EXCLUDED.nature, EXCLUDED.emsstat)
+                       THEN nextval('incidents_change_seq') ELSE i.change_seq END
+               WHERE (i.incident_ts, i.day_of_week, i.time_of_day, i.location, i.nature, i.emsstat, i.parser_version)
+                     IS DISTINCT FROM
+                     (EXCLUDED.incident_ts, EXCLUDED.day_of_week, EXCLUDED.time_of_day, EXCLUDED.location, EXCLUDED.nature, EXCLUDED.emsstat,
+                      EXCLUDED.parser_version)
+               RETURNING i.incident_num, i.change_seq"""
+
+def _incident_rows(incidents: list[list[list[str]]]) -> list[tuple]:
+    """Flatten extract_incidents output into (incident_num, incident_ts, day_of_week, time_of_day, location, nature, emsstat) tuples."""
+    dttime = incidents[0]
+    inc_no = incidents[1]
+    loc = incidents[2]
+    nature = incidents[3]
+    inc_ori = incidents[4]
+    temp = []
+
+    # Splitting date and time into separate lists for each page
+    dates = [[j.split(' ')[0] for j in i]for i in dttime]
+    times = [[j.split(' ')[1] for j in i]for i in dttime]
+
+    # Extracting day of week and hour of day from date and time
+    days_of_week = [[get_day_of_week(j) for j in i] for i in dates]
+    hours_of_day = [[int(j.split(':')[0]) for j in i] for i in times]
+
+    emsstat = [[1 if j=='EMSSTAT' else 0 for j in i] for i in inc_ori]
+
+    # Splitting and re-arranging data into tuple format for easy insertion using executemany
+    #incident_num INT, datetime TEXT, day_of_week int, time_of_day int, weather int, location TEXT, location_rank int, side_of_town TEXT, incident_rank int, nature TEXT, emsstat int
+    for i in range(len(dttime)): # Total pages in the PDF
+        for j in range(len(dttime[i])): # Entries per page
+            dt_str = dttime[i][j]  # e.g. "1/2/2026 0:03"
+            incident_ts = datetime.strptime(dt_str, '%m/%d/%Y %H:%M')
+            temp.append((inc_no[i][j], incident_ts, days_of_week[i][j], hours_of_day[i][j], loc[i][j], nature[i][j], emsstat[i][j]))
+    return temp
+
+
+def _propagate_emsstat(db: connection) -> None:
+    """When multiple incidents with same time and location have different emsstat values, set emsstat to 1 for all of them."""
+    with db.cursor() as cur:
+        cur.execute(EMSSTAT_PROPAGATE_SQL)
+
+
 def populate_incidents(db: connection, incidents: list[list[list[str]]]) -> int:
     """Populate the database with the incidents."""
     try:
+        # First occurrence wins if a report lists an incident twice (one row per key per statement)
+        temp = {}
+        for row in _incident_rows(incidents):
+            temp.setdefault(row[0], row + (PARSER_VERSION,))
 
-        dttime = incidents[0]
-        inc_no = incidents[1]
-        loc = incidents[2]
-        nature = incidents[3]
-        inc_ori = incidents[4]
-        temp = []
-
-        # Splitting date and time into separate lists for each page
-        dates = [[j.split(' ')[0] for j in i]for i in dttime]
-        times = [[j.split(' ')[1] for j in i]for i in dttime]
-
-        # Extracting day of week and hour of day from date and time
-        days_of_week = [[get_day_of_week(j) for j in i] for i in dates]
-        hours_of_day = [[int(j.split(':')[0]) for j in i] for i in times]
-
-        emsstat = [[1 if j=='EMSSTAT' else 0 for j in i] for i in inc_ori]
-        
-        # Splitting and re-arranging data into tuple format for easy insertion using executemany
-        #incident_num INT, datetime TEXT, day_of_week int, time_of_day int, weather int, location TEXT, location_rank int, side_of_town TEXT, incident_rank int, nature TEXT, emsstat int
-        for i in range(len(dttime)): # Total pages in the PDF
-            for j in range(len(dttime[i])): # Entries per page
-                dt_str = dttime[i][j]  # e.g. "1/2/2026 0:03"
-                incident_ts = datetime.strptime(dt_str, '%m/%d/%Y %H:%M')
-                temp.append((inc_no[i][j], incident_ts, days_of_week[i][j], hours_of_day[i][j], loc[i][j], nature[i][j], emsstat[i][j]))
-        
         with db.cursor() as cur:
+            lock_change_seq(cur)
             # Data insertion (ON CONFLICT for idempotent runs)
-            cur.executemany(
-                """INSERT INTO incidents(incident_num, incident_ts, day_of_week, time_of_day, location, nature, emsstat)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s)
-                   ON CONFLICT (incident_num) DO NOTHING""",
-                temp,
+            inserted = execute_values(
+                cur,
+                """INSERT INTO incidents(incident_num, incident_ts, day_of_week, time_of_day, location, nature, emsstat, parser_version)
+                   VALUES %s
+                   ON CONFLICT (incident_num) DO NOTHING
+                   RETURNING incident_num""",
+                list(temp.values()),
+                fetch=True,
             )
-            inserted_incidents = cur.rowcount
-
-            # When multiple incidents with same time and location have different emsstat values, set emsstat to 1 for all of them
-            cur.execute("""
-                UPDATE incidents SET emsstat = 1
-                WHERE incident_num IN (
-                    SELECT i2.incident_num FROM incidents i1
-                    JOIN incidents i2 ON i1.incident_ts = i2.incident_ts AND i1.location = i2.location AND i1.incident_num <> i2.incident_num
-                    WHERE i1.emsstat = 1 AND i2.emsstat = 0
-                )
-            """)
+            inserted_incidents = len(inserted)
+            log_changes(cur, CHANGE_NEW, [num for num, in inserted])
+        add_to_sketches(db, [(temp[num][1], temp[num][4], temp[num][5]) for num, in inserted])
+
+        _propagate_emsstat(db)
+        if inserted_incidents:
+            notify_batch(db, "load")
         db.commit()
         return inserted_incidents
 
@@ -61,13 +135,92 @@ def populate_incidents(db: connection, incidents: list[list[list[str]]]) -> int:
         raise Exception(f"Error populating database: {e}") from e
 
 
+def upsert_incidents(db: connection, incidents: list[list[list[str]]], parser_version: int = PARSER_VERSION) -> dict[str, int]:
+    """Insert new incidents and rewrite stored ones whose parsed values changed; return new/updated/unchanged counts.
+
+    Unlike populate_incidents, a corrected parse of an already-loaded report fixes the stored rows.
+    Rows whose values and parser_version are identical are left untouched (no write, no new change_seq),
+    so replaying a large archive costs little when little changed. A row whose values are identical but
+    whose parser_version differs only gets the new version (counted unchanged, no new change_seq). A
+    rewritten row takes a new change_seq so the incremental stages revisit it; its weather is cleared
+    when time or location moved.
+    """
+    try:
+        # Last occurrence wins if a report lists an incident twice (one row per key per statement)
+        rows = {row[0]: row for row in _incident_rows(incidents)}
+        # Apply the same-time-and-place EMSSTAT rule within the report up front, so a replay compares
+        # against values as they were stored instead of re-flagging every propagated row as changed
+        flagged = {(row[1], row[4]) for row in rows.values() if row[6] == 1}
+        if not rows:
+            return {"new": 0, "updated": 0, "unchanged": 0}
+
+        with db.cursor() as cur:
+            lock_change_seq(cur)
+            # Flags from stored incidents outside this batch count too (a partial reload of a report's changed pages)
+            cur.execute(
+                "SELECT incident_ts, location FROM incidents WHERE emsstat = 1 AND incident_ts = ANY(%s) AND NOT (incident_num = ANY(%s))",
+                (sorted({row[1] for row in rows.values()}), list(rows)),
+            )
+            flagged.update(cur.fetchall())
+            values = [row[:6] + (1 if (row[1], row[4]) in flagged else row[6], parser_version) for row in rows.values()]
+            # Time and place of stored rows that may be rewritten, so rollups of the day they leave are rebuilt and
+            # weather of moved rows is cleared (also tells inserted from updated rows in RETURNING, which has no
+            # portable "was inserted" flag)
+            cur.execute(
+                "SELECT incident_num, incident_ts, location, change_seq FROM incidents WHERE incident_num = ANY(%s)",
+                (list(rows),),
+            )
+            stored = cur.fetchall()
+            old_places = {num: (ts, location) for num, ts, location, _ in stored}
+            old_seqs = {num: seq for num, _, _, seq in stored}
+            written = execute_values(
+                cur,
+                UPSERT_INCIDENTS_SQL.format(rows="VALUES %s"),
+                values,
+                fetch=True,
+            )
+            # A stored row keeping its change_seq was only restamped with the new parser_version
+            written = [num for num, seq in written if old_seqs.get(num) != seq]
+            rewritten = [num for num in written if num in old_places]
+            moved = [num for num in rewritten if old_places[num] != (rows[num][1], rows[num][4])]
+            if moved:
+                cur.execute("DELETE FROM incident_weather WHERE incident_num = ANY(%s)", (moved,))
+            log_changes(cur, CHANGE_NEW, [num for num in written if num not in old_places])
+            log_changes(cur, CHANGE_UPDATED, rewritten)
+        new = len(written) - len(rewritten)
+        updated = len(rewritten)
+        moved_days = {old_places[num][0].date() for num in rewritten}
+        if moved_days:
+            refresh_rollup_days(db, moved_days)
+        # Sketches cannot forget a value: days a rewritten incident left or joined are rebuilt, new ones added to
+        rebuilt_days = moved_days | {rows[num][1].date() for num in rewritten}
+        refresh_sketch_days(db, rebuilt_days)
+        add_to_sketches(db, [
+            (rows[num][1], rows[num][4], rows[num][5])
+            for num in written
+            if num not in old_places and rows[num][1].date() not in rebuilt_days
+        ])
+        _propagate_emsstat(db)
+        if written:
+            notify_batch(db, "load")
+        db.commit()
+        return {"new": new, "updated": updated, "unchanged": len(values) - len(written)}
+
+    except Exception as e:
+        logger.exception("Error upserting incidents: %s", e)
+        raise Exception(f"Error upserting incidents: {e}") from e
+
+
 def update_ranks_incidents(db: connection) -> None:
     """Update the ranks of the incidents."""
     try:
         with db.cursor() as cur:
             # Updating location_rank and incident_rank
-            cur.execute("WITH LocationFrequency AS (SELECT location, RANK() OVER (ORDER BY COUNT(*) DESC) AS Rank FROM incidents GROUP BY location) UPDATE incidents SET location_rank = LocationFrequency.Rank FROM LocationFrequency WHERE incidents.location = LocationFrequency.location;")
-            cur.execute("WITH NatureFrequency AS (SELECT nature, RANK() OVER (ORDER BY COUNT(*) DESC) AS Rank FROM incidents GROUP BY nature) UPDATE incidents SET incident_rank = NatureFrequency.Rank FROM NatureFrequency WHERE incidents.nature = NatureFrequency.nature;")
+            cur.execute(LOCATION_RANK_SQL)
+            cur.execute(INCIDENT_RANK_SQL)
+            for sql in STALE_RANKS_SQL:
+                cur.execute(sql)
+        notify_batch(db, "ranks")
         db.commit()
     except Exception as e:
         logger.exception("Error updating ranks: %s", e)
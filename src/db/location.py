@@ -1,23 +1,48 @@
 import logging
-from geopy.geocoders import Nominatim
-import geopy.extra.rate_limiter as rl
+from typing import Iterable, Iterator, Optional, Sequence
+
 from psycopg2.extensions import connection
 
-# Nominatim can be slow or rate-limited; use a longer timeout to avoid ReadTimeoutError (geopy default is 1s)
-GEOCODE_TIMEOUT = 10
-geolocator = Nominatim(user_agent="normanpd-incident-pipeline-geocoder", timeout=GEOCODE_TIMEOUT)
-rate_limiter = rl.RateLimiter(geolocator.geocode, min_delay_seconds=1)
+from src.db.bulk import BulkWriter
+from src.db.enrichment import STAGE_GEOCODE, StageCheckpoint, pending_window, with_next_seq
+from src.enrich.geocoders import get_geocoder_pool
+from src.geo.geohash import encode as geohash_encode
+
+# Geohash length stored per location (~5 m cells); queries use shorter prefixes of it
+GEOHASH_PRECISION = 9
+
+# Geocoded locations are checkpointed every this many addresses (~this many seconds of public Nominatim time)
+GEOCODE_COMMIT_EVERY = 100
 
 # For intersection-style addresses (e.g. "VINE ST / S BERRY RD"), geocoding each side with locality often works
 LOCALITY_SUFFIX = ", Norman, OK, USA"
 INTERSECTION_SEP = " / "
 
+# Marks a geocode that failed with an error (retried later), as opposed to None: the geocoder found nothing
+GEOCODE_ERROR = object()
+
+# Distinct locations of rows in the (low, high] change_seq window that are not cached yet, in checkpoint order
+PENDING_LOCATIONS_SQL = """SELECT i.location, MIN(i.change_seq) FROM incidents i
+                   LEFT JOIN location l ON l.loc = i.location
+                   WHERE i.change_seq > %s AND i.change_seq <= %s AND l.loc IS NULL
+                   GROUP BY i.location
+                   ORDER BY 2"""
+# First change_seq in the (low, high] window of an incident whose location is not cached yet (geocode pending or failed)
+UNGEOCODED_SEQ_SQL = """SELECT MIN(i.change_seq) FROM incidents i
+                   LEFT JOIN location l ON l.loc = i.location
+                   WHERE i.change_seq > %s AND i.change_seq <= %s AND i.location IS NOT NULL AND l.loc IS NULL"""
+
 logger = logging.getLogger(__name__)
 
 
+def _geocode_query(query: str):
+    """One geocoder request, routed through the rate-limited backend pool."""
+    return get_geocoder_pool().geocode(query)
+
+
 def _geocode_with_intersection_fallback(address: str):
     """Try full address, then each side of ' / ' with locality if that fails."""
-    loc = rate_limiter(address)
+    loc = _geocode_query(address)
     if loc:
         return loc
     if INTERSECTION_SEP not in address:
@@ -25,48 +50,157 @@ def _geocode_with_intersection_fallback(address: str):
     parts = [p.strip() for p in address.split(INTERSECTION_SEP, 1) if p.strip()]
     for part in parts:
         query = part + LOCALITY_SUFFIX
-        loc = rate_limiter(query)
+        loc = _geocode_query(query)
         if loc:
             logger.debug("Geocoded intersection '%s' via part '%s'", address, part)
             return loc
     return None
 
 
+def geocode_address(address: str):
+    """Geocode an address (with the intersection fallback); return (latitude, longitude) or None."""
+    loc = _geocode_with_intersection_fallback(address)
+    if loc:
+        return loc.latitude, loc.longitude
+    logger.warning("No location found for %s", address)
+    return None
+
+
+def _try_geocode_address(address: str):
+    """geocode_address that logs and returns GEOCODE_ERROR on errors (used from pool threads)."""
+    try:
+        return geocode_address(address)
+    except Exception as e:
+        logger.exception("Error in geocoding %s: %s", address, e)
+        return GEOCODE_ERROR
+
+
+def store_geocode(address: str, db: connection) -> bool:
+    """Geocode an uncached address and store it in the location table; return True if it has coordinates afterwards.
+
+    An address the geocoder does not know is stored with NULL coordinates, so it is not looked up again.
+    Committed by the caller (the queue worker commits the row with the rest of its geocode job).
+    """
+    with db.cursor() as con:
+        con.execute("SELECT loc, latitude, longitude FROM location WHERE loc = %s", (address,))
+        result = con.fetchone()
+
+        if result:
+            logger.debug("Cache hit for %s", address)
+            return result[1] is not None and result[2] is not None
+        coords = geocode_address(address)
+        latitude, longitude = coords or (None, None)
+        con.execute(
+            "INSERT INTO location (loc, latitude, longitude, geohash) VALUES (%s, %s, %s, %s) ON CONFLICT (loc) DO NOTHING",
+            (address, latitude, longitude, _geohash(latitude, longitude)),
+        )
+        if coords:
+            logger.info("Location %s cached: lat=%s lon=%s", address, latitude, longitude)
+        return coords is not None
+
+
+def _geohash(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    """Stored geohash of a location row (None for a negative result)."""
+    if latitude is None or longitude is None:
+        return None
+    return geohash_encode(latitude, longitude, GEOHASH_PRECISION)
+
+
+def first_ungeocoded_seq(db: connection, low: int, high: int) -> Optional[int]:
+    """First change_seq in the (low, high] window whose location has no cached geocode yet, or None.
+
+    Stages that read coordinates hold their watermark below it, so those incidents are picked up once geocoded.
+    """
+    with db.cursor() as cur:
+        cur.execute(UNGEOCODED_SEQ_SQL, (low, high))
+        return cur.fetchone()[0]
+
+
 def cache_geocode(address: str, db: connection) -> None:
     """Cache the latitude and longitude for a given address in the database."""
     try:
-        with db.cursor() as con:
-            con.execute("SELECT loc, latitude, longitude FROM location WHERE loc = %s", (address,))
-            result = con.fetchone()
-
-            if result:
-                logger.debug("Cache hit for %s", address)
-                return
-            loc = _geocode_with_intersection_fallback(address)
-            if loc:
-                latitude = loc.latitude
-                longitude = loc.longitude
-                con.execute(
-                    "INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s) ON CONFLICT (loc) DO NOTHING",
-                    (address, latitude, longitude),
-                )
-                db.commit()
-                logger.info("Location %s cached: lat=%s lon=%s", address, latitude, longitude)
-            else:
-                logger.warning("No location found for %s", address)
+        store_geocode(address, db)
+        db.commit()
     except Exception as e:
         logger.exception("Error in geocoding %s: %s", address, e)
 
+
+def location_writer(db: connection) -> BulkWriter:
+    """Bulk writer inserting (loc, latitude, longitude, geohash) rows into the location cache."""
+    return BulkWriter(
+        db,
+        "location",
+        [("loc", "text"), ("latitude", "real"), ("longitude", "real"), ("geohash", "text")],
+        """INSERT INTO location (loc, latitude, longitude, geohash)
+           SELECT loc, latitude, longitude, geohash FROM {table}
+           ON CONFLICT (loc) DO NOTHING""",
+    )
+
+
+def backfill_geohashes(db: connection) -> int:
+    """Compute geohashes for geocoded locations that do not have one yet; return how many were set."""
+    with db.cursor() as cur:
+        cur.execute("SELECT loc, latitude, longitude FROM location WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL")
+        rows = cur.fetchall()
+    with BulkWriter(
+        db,
+        "geohash",
+        [("loc", "text"), ("geohash", "text")],
+        "UPDATE location SET geohash = b.geohash FROM {table} b WHERE location.loc = b.loc",
+    ) as writer:
+        for loc, latitude, longitude in rows:
+            writer.add(loc, geohash_encode(latitude, longitude, GEOHASH_PRECISION))
+    db.commit()
+    if rows:
+        logger.info("Backfilled geohash for %d locations", len(rows))
+    return len(rows)
+
+
 def get_location(db: connection) -> connection:
-    """Get the latitude and longitude for the locations in the database."""
+    """Geocode the uncached locations of incidents added since the last run."""
     try:
+        low, high = pending_window(db, STAGE_GEOCODE)
         with db.cursor() as cur:
-            cur.execute("SELECT DISTINCT location FROM incidents")
-            addresses = [row[0] for row in cur.fetchall()]
-        logger.info("Geocoding %d distinct incident locations", len(addresses))
-        for address in addresses:
-            cache_geocode(address, db)
+            cur.execute(PENDING_LOCATIONS_SQL, (low, high))
+            pending = cur.fetchall()
+        addresses = [row[0] for row in pending]
+        logger.info("Geocoding %d new incident locations", len(addresses))
+        writer = location_writer(db)
+        # Geocodes are slow (rate limited), so they are checkpointed in small batches rather than all at the end
+        checkpoint = StageCheckpoint(db, STAGE_GEOCODE, high, writer.flush, every=GEOCODE_COMMIT_EVERY)
+        # Addresses are geocoded concurrently across the pool's backends; results are written here, in order
+        results = get_geocoder_pool().map(_try_geocode_address, addresses)
+        misses = 0
+        for ((address, first_seq), next_seq), coords in zip(with_next_seq(pending), results):
+            if coords is GEOCODE_ERROR:
+                # Errors (including no backend available) are left for a later run: the watermark stays below them
+                checkpoint.hold(first_seq)
+            else:
+                # Not found is cached too (NULL coordinates), so it is not looked up again
+                latitude, longitude = coords or (None, None)
+                misses += coords is None
+                writer.add(address, latitude, longitude, _geohash(latitude, longitude))
+            checkpoint.done(next_seq)
+        checkpoint.finish()
+        logger.info("Cached %d new locations (%d not found)", writer.rows_written, misses)
+        backfill_geohashes(db)
     except Exception as e:
         logger.exception("Error in getting location: %s", e)
         raise Exception(f"Error in getting location: {e}") from e
     return db
+
+
+def export_locations(db: connection) -> Iterator[tuple]:
+    """Every cached geocode as (loc, latitude, longitude), negative results with NULL coordinates."""
+    with db.cursor() as cur:
+        cur.execute("SELECT loc, latitude, longitude FROM location ORDER BY loc")
+        yield from cur.fetchall()
+
+
+def import_locations(db: connection, rows: Iterable[Sequence]) -> int:
+    """Bulk-load (loc, latitude, longitude) rows into the location cache; rows already cached win. Returns rows added."""
+    with location_writer(db) as writer:
+        for loc, latitude, longitude in rows:
+            writer.add(loc, latitude, longitude, _geohash(latitude, longitude))
+    db.commit()
+    return writer.rows_written
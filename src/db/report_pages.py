@@ -0,0 +1,38 @@
+"""
+Page fingerprints of loaded reports: SHA-256 of each page's extracted text, per report URL.
+
+A report fetched again (a republished correction) is parsed and loaded only for the pages whose
+fingerprint differs from the stored one; a report whose pages all match is not loaded at all.
+"""
+import logging
+from collections import defaultdict
+from typing import Sequence
+
+from psycopg2.extensions import connection
+
+from src.db.backend import execute_values
+
+logger = logging.getLogger(__name__)
+
+
+def load_fingerprints(db: connection, urls: Sequence[str]) -> dict[str, list[str]]:
+    """Stored page fingerprints per URL, in page order (URLs never loaded are absent)."""
+    pages = defaultdict(list)
+    with db.cursor() as cur:
+        cur.execute("SELECT url, fingerprint FROM report_pages WHERE url = ANY(%s) ORDER BY url, page", (list(urls),))
+        for url, fingerprint in cur.fetchall():
+            pages[url].append(fingerprint)
+    return dict(pages)
+
+
+def store_fingerprints(db: connection, url: str, fingerprints: Sequence[str]) -> None:
+    """Replace the stored page fingerprints of a report once its changed pages are loaded."""
+    try:
+        with db.cursor() as cur:
+            cur.execute("DELETE FROM report_pages WHERE url = %s", (url,))
+            execute_values(cur, "INSERT INTO report_pages (url, page, fingerprint) VALUES %s",
+                           [(url, page, fingerprint) for page, fingerprint in enumerate(fingerprints)])
+        db.commit()
+    except Exception as e:
+        logger.exception("Error storing page fingerprints of %s: %s", url, e)
+        raise Exception(f"Error storing page fingerprints of {url}: {e}") from e
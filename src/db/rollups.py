@@ -0,0 +1,111 @@
+"""
+Dashboard rollups: a small cube of incident counts per day over time_of_day, day_of_week,
+nature, side_of_town and weather, kept in `incident_rollup`.
+
+A day's rows are rebuilt from `incidents_enriched` whenever incidents on that day are loaded or enriched,
+so dashboards read a few thousand pre-aggregated rows instead of scanning `incidents`.
+"""
+import logging
+from datetime import date
+from typing import Iterable, Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.db.backend import backend_for
+from src.db.enrichment import STAGE_ROLLUP, StageCheckpoint, pending_window, with_next_seq
+
+# Group-by dimensions available in incident_rollup (also the only accepted column names)
+ROLLUP_DIMENSIONS = ("day", "time_of_day", "day_of_week", "nature", "side_of_town", "weather")
+
+# Rebuild of the rollup rows of a set of days (params: first day, last day, all days)
+ROLLUP_REBUILD_SQL = """INSERT INTO incident_rollup (day, time_of_day, day_of_week, nature, side_of_town, weather, incidents)
+               SELECT incident_ts::date, time_of_day, day_of_week, nature, side_of_town, weather, COUNT(*)
+               FROM incidents_enriched
+               WHERE incident_ts >= %s::date AND incident_ts < %s::date + 1 AND incident_ts::date = ANY(%s::date[])
+               GROUP BY 1, 2, 3, 4, 5, 6"""
+# Days with rows in the (low, high] change_seq window, in checkpoint order (first change_seq)
+PENDING_ROLLUP_DAYS_SQL = """SELECT incident_ts::date, MIN(change_seq) FROM incidents WHERE change_seq > %s AND change_seq <= %s
+               GROUP BY 1 ORDER BY 2"""
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_rollup_days(db: connection, days: Iterable[date]) -> None:
+    """Rebuild the rollup rows of the given days from incidents_enriched (committed by the caller)."""
+    days = sorted(set(days))
+    if not days:
+        return
+    with db.cursor() as cur:
+        # Serialize concurrent rebuilds of the same day (queue workers); sorted order avoids deadlocks
+        if backend_for(db).concurrent_writers:
+            for day in days:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('incident_rollup'), %s::date - DATE '2000-01-01')", (day,))
+        cur.execute("DELETE FROM incident_rollup WHERE day = ANY(%s::date[])", (days,))
+        cur.execute(ROLLUP_REBUILD_SQL, (days[0], days[-1], days))
+
+
+def refresh_rollups(db: connection) -> int:
+    """Rebuild the rollup rows of every day touched since the last refresh; return the number of days."""
+    try:
+        low, high = pending_window(db, STAGE_ROLLUP)
+        with db.cursor() as cur:
+            cur.execute(PENDING_ROLLUP_DAYS_SQL, (low, high))
+            pending = cur.fetchall()
+        days = [day for day, _ in pending if day is not None]
+        batch: list[date] = []
+
+        def rebuild_batch() -> None:
+            refresh_rollup_days(db, batch)
+            batch.clear()
+
+        checkpoint = StageCheckpoint(db, STAGE_ROLLUP, high, rebuild_batch)
+        for (day, _), next_seq in with_next_seq(pending):
+            if day is not None:
+                batch.append(day)
+            checkpoint.done(next_seq)
+        checkpoint.finish()
+    except Exception as e:
+        logger.exception("Error refreshing rollups: %s", e)
+        raise Exception(f"Error refreshing rollups: {e}") from e
+    logger.info("Rollups refreshed for %d days", len(days))
+    return len(days)
+
+
+def rollup_counts(
+    db: connection,
+    dimensions: Sequence[str],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    filters: Optional[dict] = None,
+) -> list[tuple]:
+    """Incident counts grouped by `dimensions` over days in [start, end), optionally filtered by dimension values.
+
+    Example: rollup_counts(conn, ["side_of_town", "time_of_day"], filters={"nature": "Larceny"})
+    returns rows (side_of_town, time_of_day, count) ordered by the dimensions.
+    """
+    filters = filters or {}
+    unknown = [d for d in list(dimensions) + list(filters) if d not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown rollup dimension(s): {', '.join(unknown)}")
+
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("day >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("day < %s")
+        params.append(end)
+    for column, value in filters.items():
+        if value is None:
+            clauses.append(f"{column} IS NULL")
+        else:
+            clauses.append(f"{column} = %s")
+            params.append(value)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    columns = ", ".join(dimensions)
+    select = f"{columns}, SUM(incidents)::bigint" if dimensions else "SUM(incidents)::bigint"
+    group = f"GROUP BY {columns} ORDER BY {columns}" if dimensions else ""
+
+    with db.cursor() as cur:
+        cur.execute(f"SELECT {select} FROM incident_rollup {where} {group}", params)
+        return cur.fetchall()
@@ -1,29 +1,74 @@
 import logging
 from psycopg2.extensions import connection
 
+from src.db.backend import backend_for
+
 logger = logging.getLogger(__name__)
 
+# Enrichment columns the incidents table carried before they moved to side tables (migrated by create_enrichment_tables)
+LEGACY_ENRICHMENT_COLUMNS = ("weather", "location_rank", "side_of_town", "incident_rank")
+
+# The incidents row as readers see it: base columns plus the enrichment kept in the side tables
+INCIDENTS_ENRICHED_VIEW = """CREATE OR REPLACE VIEW incidents_enriched AS
+               SELECT i.incident_num, i.incident_ts, i.day_of_week, i.time_of_day, w.weather, i.location,
+                      lr.location_rank, l.side_of_town, nr.incident_rank, i.nature, i.emsstat, i.change_seq, i.parser_version,
+                      l.beat
+               FROM incidents i
+               LEFT JOIN incident_weather w ON w.incident_num = i.incident_num
+               LEFT JOIN location l ON l.loc = i.location
+               LEFT JOIN location_ranks lr ON lr.location = i.location
+               LEFT JOIN nature_ranks nr ON nr.nature = i.nature"""
+
 def create_incident_table(conn: connection) -> None:
     """Create the incident table."""
     cur = conn.cursor()
     try:
+        # Every inserted (or re-written) row takes the next value; enrichers track how far they have processed it
+        cur.execute("CREATE SEQUENCE IF NOT EXISTS incidents_change_seq")
         cur.execute("""
             CREATE TABLE IF NOT EXISTS incidents (
                 incident_num TEXT PRIMARY KEY,
                 incident_ts TIMESTAMP,
                 day_of_week INTEGER,
                 time_of_day INTEGER,
-                weather INTEGER,
                 location TEXT,
-                location_rank INTEGER,
-                side_of_town TEXT,
-                incident_rank INTEGER,
                 nature TEXT,
-                emsstat INTEGER
+                emsstat INTEGER,
+                change_seq BIGINT DEFAULT nextval('incidents_change_seq'),
+                parser_version INTEGER
+            )
+        """)
+        # Tables created before change tracking / parser versioning existed
+        cur.execute("ALTER TABLE incidents ADD COLUMN IF NOT EXISTS change_seq BIGINT DEFAULT nextval('incidents_change_seq')")
+        cur.execute("ALTER TABLE incidents ADD COLUMN IF NOT EXISTS parser_version INTEGER")
+        # incident_num is the primary key; this duplicate of its index only slowed writes and made plans flip between the two
+        cur.execute("DROP INDEX IF EXISTS idx_incidents_incident_num")
+        if backend_for(conn).secondary_indexes:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_incidents_incident_ts ON incidents (incident_ts)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_incidents_change_seq ON incidents (change_seq)")
+            # Location lookups (joins, spatial queries) and per-location time ranges (rolling features)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_incidents_location_ts ON incidents (location, incident_ts)")
+            cur.execute("DROP INDEX IF EXISTS idx_incidents_location")
+        # Change feed (src.db.changes): one entry per incident a committed batch created, rewrote or enriched
+        cur.execute("CREATE SEQUENCE IF NOT EXISTS change_log_seq")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq BIGINT DEFAULT nextval('change_log_seq') PRIMARY KEY,
+                kind TEXT NOT NULL,
+                incident_num TEXT NOT NULL,
+                logged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Per-day HyperLogLog / Count-Min sketches of location and nature (src.db.sketches), maintained by the loader
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS incident_sketches (
+                day DATE NOT NULL,
+                dimension TEXT NOT NULL,
+                distinct_sketch BYTEA NOT NULL,
+                topk_sketch BYTEA NOT NULL,
+                PRIMARY KEY (day, dimension)
             )
         """)
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_incidents_incident_num ON incidents (incident_num)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_incidents_incident_ts ON incidents (incident_ts)")
         conn.commit()
         logger.debug("Incidents table ready")
     except Exception as e:
@@ -39,11 +84,330 @@ def create_location_table(conn: connection) -> None:
                 loc TEXT PRIMARY KEY,
                 latitude REAL,
                 longitude REAL,
-                weather INTEGER
+                weather INTEGER,
+                geohash TEXT COLLATE "C",
+                side_of_town TEXT,
+                beat TEXT,
+                beat_layer TEXT
             )
         """)
+        # Tables created before the spatial index / location-level side of town / beats existed
+        cur.execute('ALTER TABLE location ADD COLUMN IF NOT EXISTS geohash TEXT COLLATE "C"')
+        cur.execute("ALTER TABLE location ADD COLUMN IF NOT EXISTS side_of_town TEXT")
+        cur.execute("ALTER TABLE location ADD COLUMN IF NOT EXISTS beat TEXT")
+        cur.execute("ALTER TABLE location ADD COLUMN IF NOT EXISTS beat_layer TEXT")
+        # C collation lets a plain btree serve geohash prefix ranges (cell lookups) directly
+        if backend_for(conn).secondary_indexes:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_location_geohash ON location (geohash)")
         conn.commit()
         logger.debug("Location table ready")
     except Exception as e:
         logger.exception("Error creating location table: %s", e)
         raise Exception(f"Error creating location table: {e}") from e
+
+def _table_columns(cur, table: str) -> set:
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s",
+        (table,),
+    )
+    return {row[0] for row in cur.fetchall()}
+
+def create_enrichment_tables(conn: connection) -> None:
+    """Create the narrow enrichment side tables and the incidents_enriched view (after incidents and location).
+
+    Enrichment writes go to small rows keyed by incident_num (weather), location (side of town on `location`,
+    location ranks) or nature (incident ranks) instead of new versions of the wide incidents row.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS incident_weather (
+                incident_num TEXT PRIMARY KEY,
+                weather INTEGER NOT NULL
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS location_ranks (
+                location TEXT PRIMARY KEY,
+                location_rank INTEGER NOT NULL
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS nature_ranks (
+                nature TEXT PRIMARY KEY,
+                incident_rank INTEGER NOT NULL
+            )
+        """)
+        # Databases from before the side tables: carry the values over, then drop the columns (and the indexes using them)
+        legacy = [c for c in LEGACY_ENRICHMENT_COLUMNS if c in _table_columns(cur, "incidents")]
+        if legacy:
+            cur.execute("DROP VIEW IF EXISTS incidents_enriched")
+            if "weather" in legacy:
+                cur.execute("""INSERT INTO incident_weather (incident_num, weather)
+                               SELECT incident_num, weather FROM incidents WHERE weather IS NOT NULL
+                               ON CONFLICT (incident_num) DO NOTHING""")
+            if "side_of_town" in legacy:
+                cur.execute("""UPDATE location SET side_of_town = s.side_of_town
+                               FROM (SELECT location, MIN(side_of_town) AS side_of_town FROM incidents
+                                     WHERE side_of_town IS NOT NULL GROUP BY location) s
+                               WHERE location.loc = s.location AND location.side_of_town IS NULL""")
+            if "location_rank" in legacy:
+                cur.execute("""INSERT INTO location_ranks (location, location_rank)
+                               SELECT location, MIN(location_rank) FROM incidents
+                               WHERE location IS NOT NULL AND location_rank IS NOT NULL GROUP BY location
+                               ON CONFLICT (location) DO NOTHING""")
+            if "incident_rank" in legacy:
+                cur.execute("""INSERT INTO nature_ranks (nature, incident_rank)
+                               SELECT nature, MIN(incident_rank) FROM incidents
+                               WHERE nature IS NOT NULL AND incident_rank IS NOT NULL GROUP BY nature
+                               ON CONFLICT (nature) DO NOTHING""")
+            for column in legacy:
+                cur.execute(f"ALTER TABLE incidents DROP COLUMN {column}")
+            logger.info("Moved incident columns %s to the enrichment side tables", ", ".join(legacy))
+        cur.execute(INCIDENTS_ENRICHED_VIEW)
+        conn.commit()
+        logger.debug("Enrichment tables ready")
+    except Exception as e:
+        logger.exception("Error creating enrichment tables: %s", e)
+        raise Exception(f"Error creating enrichment tables: {e}") from e
+
+def create_enrichment_state_table(conn: connection) -> None:
+    """Create the enrichment state table (per-stage change_seq watermark)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS enrichment_state (
+                stage TEXT PRIMARY KEY,
+                watermark BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP
+            )
+        """)
+        conn.commit()
+        logger.debug("Enrichment state table ready")
+    except Exception as e:
+        logger.exception("Error creating enrichment state table: %s", e)
+        raise Exception(f"Error creating enrichment state table: {e}") from e
+
+def create_job_tables(conn: connection) -> None:
+    """Create the work queue tables (jobs + per-kind throttle)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id BIGSERIAL PRIMARY KEY,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_after TIMESTAMP NOT NULL DEFAULT NOW(),
+                leased_by TEXT,
+                lease_expires_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                UNIQUE (kind, key)
+            )
+        """)
+        # Claim order for workers; only unfinished jobs are ever scanned
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (priority DESC, id) WHERE status IN ('pending', 'running')")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS job_throttle (
+                kind TEXT PRIMARY KEY,
+                next_at TIMESTAMP NOT NULL
+            )
+        """)
+        conn.commit()
+        logger.debug("Job tables ready")
+    except Exception as e:
+        logger.exception("Error creating job tables: %s", e)
+        raise Exception(f"Error creating job tables: {e}") from e
+
+def create_rollup_table(conn: connection) -> None:
+    """Create the dashboard rollup table (incident counts per day and dimension combination)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS incident_rollup (
+                day DATE NOT NULL,
+                time_of_day INTEGER,
+                day_of_week INTEGER,
+                nature TEXT,
+                side_of_town TEXT,
+                weather INTEGER,
+                incidents INTEGER NOT NULL
+            )
+        """)
+        if backend_for(conn).secondary_indexes:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_incident_rollup_day ON incident_rollup (day)")
+        conn.commit()
+        logger.debug("Rollup table ready")
+    except Exception as e:
+        logger.exception("Error creating rollup table: %s", e)
+        raise Exception(f"Error creating rollup table: {e}") from e
+
+def create_feature_table(conn: connection) -> None:
+    """Create the rolling-window feature table (one row per incident; see src.db.features)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS incident_features (
+                incident_num TEXT PRIMARY KEY,
+                location TEXT,
+                incident_ts TIMESTAMP,
+                loc_prior_7d INTEGER,
+                loc_prior_30d INTEGER,
+                loc_prior_90d INTEGER,
+                loc_nature_prior_30d INTEGER
+            )
+        """)
+        # Training-set extraction reads time ranges
+        if backend_for(conn).secondary_indexes:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_incident_features_ts ON incident_features (incident_ts)")
+        conn.commit()
+        logger.debug("Feature table ready")
+    except Exception as e:
+        logger.exception("Error creating feature table: %s", e)
+        raise Exception(f"Error creating feature table: {e}") from e
+
+def create_case_table(conn: connection) -> None:
+    """Create the case table (Daily Case Summary rows)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cases (
+                case_num TEXT PRIMARY KEY,
+                case_ts TIMESTAMP,
+                location TEXT,
+                offense TEXT
+            )
+        """)
+        # Cross-reference with incidents, which carry no case number: same location around the same time
+        if backend_for(conn).secondary_indexes:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_cases_location_ts ON cases (location, case_ts)")
+        conn.commit()
+        logger.debug("Cases table ready")
+    except Exception as e:
+        logger.exception("Error creating case table: %s", e)
+        raise Exception(f"Error creating case table: {e}") from e
+
+def create_arrest_table(conn: connection) -> None:
+    """Create the arrest table (Daily Arrest Summary rows)."""
+    cur = conn.cursor()
+    try:
+        # An arrest has no number of its own; case_num leads the key, so the primary key index serves case joins
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS arrests (
+                case_num TEXT NOT NULL,
+                arrest_ts TIMESTAMP NOT NULL,
+                arrestee TEXT NOT NULL,
+                location TEXT,
+                offense TEXT,
+                arrestee_birthday DATE,
+                arrestee_address TEXT,
+                status TEXT,
+                officer TEXT,
+                PRIMARY KEY (case_num, arrest_ts, arrestee)
+            )
+        """)
+        if backend_for(conn).secondary_indexes:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_arrests_location_ts ON arrests (location, arrest_ts)")
+        conn.commit()
+        logger.debug("Arrests table ready")
+    except Exception as e:
+        logger.exception("Error creating arrest table: %s", e)
+        raise Exception(f"Error creating arrest table: {e}") from e
+
+def create_report_pages_table(conn: connection) -> None:
+    """Create the per-page fingerprint table of loaded reports (see src.db.report_pages)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS report_pages (
+                url TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (url, page)
+            )
+        """)
+        conn.commit()
+        logger.debug("Report pages table ready")
+    except Exception as e:
+        logger.exception("Error creating report pages table: %s", e)
+        raise Exception(f"Error creating report pages table: {e}") from e
+
+def create_pipeline_run_tables(conn: connection) -> None:
+    """Create the run manifest tables (runs, their report URLs and stages; see src.pipeline.manifest)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("CREATE SEQUENCE IF NOT EXISTS pipeline_runs_seq")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_runs (
+                run_id BIGINT DEFAULT nextval('pipeline_runs_seq') PRIMARY KEY,
+                status TEXT NOT NULL,
+                recheck_days INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP,
+                error TEXT
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_run_reports (
+                run_id BIGINT NOT NULL,
+                ordinal INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                loaded_at TIMESTAMP,
+                PRIMARY KEY (run_id, ordinal)
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_run_stages (
+                run_id BIGINT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                through_change_seq BIGINT,
+                error TEXT,
+                PRIMARY KEY (run_id, stage)
+            )
+        """)
+        conn.commit()
+        logger.debug("Pipeline run tables ready")
+    except Exception as e:
+        logger.exception("Error creating pipeline run tables: %s", e)
+        raise Exception(f"Error creating pipeline run tables: {e}") from e
+
+def create_query_indexes(conn: connection) -> None:
+    """Create the covering indexes behind the read-only query API (keyset order: incident_ts, incident_num)."""
+    cur = conn.cursor()
+    # Every column the API returns from incidents itself; the enrichment comes from the side tables by primary key
+    returned = ["nature", "location", "emsstat"]
+    if not backend_for(conn).secondary_indexes:
+        logger.debug("Query API indexes skipped (%s backend)", backend_for(conn).name)
+        return
+    # name: (table, key columns, covered columns)
+    indexes = {
+        "idx_incidents_api_ts": ("incidents", ["incident_ts", "incident_num"], returned),
+        "idx_incidents_api_nature": ("incidents", ["nature", "incident_ts", "incident_num"], returned),
+        # side_of_town and the ranks live on side tables: a selective filter starts from the matching locations
+        # (or ranks) and reaches their incidents by location, instead of walking every incident by time
+        "idx_incidents_api_location": ("incidents", ["location", "incident_ts", "incident_num"], returned),
+        "idx_location_api_side": ("location", ["side_of_town", "loc"], ["latitude", "longitude"]),
+        "idx_location_ranks_api": ("location_ranks", ["location_rank", "location"], []),
+        "idx_nature_ranks_api": ("nature_ranks", ["incident_rank", "nature"], []),
+    }
+    try:
+        # side_of_town is no longer an incidents column: idx_location_api_side replaces this one
+        cur.execute("DROP INDEX IF EXISTS idx_incidents_api_side")
+        for name, (table, keys, covered) in indexes.items():
+            include = ", ".join(c for c in covered if c not in keys)
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(keys)})" + (f" INCLUDE ({include})" if include else "")
+            )
+        conn.commit()
+        logger.debug("Query API indexes ready")
+    except Exception as e:
+        logger.exception("Error creating query indexes: %s", e)
+        raise Exception(f"Error creating query indexes: {e}") from e
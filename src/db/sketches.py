@@ -0,0 +1,187 @@
+"""
+Per-day approximate statistics: a HyperLogLog (distinct values) and a Count-Min top-K (most frequent
+values) of each sketched incident column, kept in `incident_sketches` by the loader.
+
+populate_incidents adds each batch's new incidents to the sketches of their days; upsert_incidents,
+which can also move or rewrite incidents, rebuilds the sketches of the days it touched from `incidents`.
+Queries merge the sketches of a date range one row at a time, so memory stays constant however long
+the range, and no `incidents` row is read.
+
+Run from repo root:
+  python -m src.db.sketches distinct location --start 2026-01-01 --end 2026-02-01
+  python -m src.db.sketches top nature --k 20 --start 2026-01-05
+  python -m src.db.sketches rebuild                   # backfill from incidents (existing databases)
+"""
+import argparse
+import logging
+from datetime import date
+from typing import Iterable, Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.logging_config import setup_logging
+from src.db.backend import backend_for, execute_values
+from src.db.connection import create_connection, terminate_connection
+from src.stats.sketches import HyperLogLog, TopK
+
+# Incident columns with sketches (also the only accepted dimension names)
+SKETCH_DIMENSIONS = ("location", "nature")
+
+# Days rebuilt per transaction by rebuild_sketches
+REBUILD_BATCH_DAYS = 31
+# Sketch rows fetched per round trip while merging a date range
+MERGE_FETCH_SIZE = 64
+
+# Write (day, dimension) sketches ({rows}: "VALUES %s" for execute_values, or a SELECT of the same columns)
+SKETCH_UPSERT_SQL = """INSERT INTO incident_sketches (day, dimension, distinct_sketch, topk_sketch) {rows}
+               ON CONFLICT (day, dimension) DO UPDATE SET
+                   distinct_sketch = EXCLUDED.distinct_sketch, topk_sketch = EXCLUDED.topk_sketch"""
+# Stored sketches of a set of days, merged with a batch's new incidents
+SKETCH_DAYS_SQL = "SELECT day, dimension, distinct_sketch, topk_sketch FROM incident_sketches WHERE day = ANY(%s::date[])"
+# Incidents of a set of days (first day, last day, days), re-sketched from scratch
+SKETCH_DAY_INCIDENTS_SQL = """SELECT incident_ts, location, nature FROM incidents
+               WHERE incident_ts >= %s::date AND incident_ts < %s::date + 1 AND incident_ts::date = ANY(%s::date[])"""
+
+logger = logging.getLogger(__name__)
+
+Sketches = dict[tuple[date, str], tuple[HyperLogLog, TopK]]
+
+
+def _sketch_rows(rows: Iterable[tuple], sketches: Optional[Sketches] = None) -> Sketches:
+    """Add (incident_ts, location, nature) rows to per-(day, dimension) sketches."""
+    sketches = sketches if sketches is not None else {}
+    for incident_ts, *values in rows:
+        day = incident_ts.date()
+        for dimension, value in zip(SKETCH_DIMENSIONS, values):
+            if value is None:
+                continue
+            if (day, dimension) not in sketches:
+                sketches[(day, dimension)] = (HyperLogLog(), TopK())
+            distinct, top = sketches[(day, dimension)]
+            distinct.add(value)
+            top.add(value)
+    return sketches
+
+
+def _lock_days(cur, days: Sequence[date]) -> None:
+    # Serialize concurrent read-merge-writes of the same day (queue workers); sorted order avoids deadlocks
+    if backend_for(cur).concurrent_writers:
+        for day in days:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('incident_sketches'), %s::date - DATE '2000-01-01')", (day,))
+
+
+def _write(cur, sketches: Sketches) -> None:
+    execute_values(
+        cur,
+        SKETCH_UPSERT_SQL.format(rows="VALUES %s"),
+        [(day, dimension, distinct.to_bytes(), top.to_bytes()) for (day, dimension), (distinct, top) in sketches.items()],
+    )
+
+
+def add_to_sketches(db: connection, rows: Sequence[tuple]) -> None:
+    """Add newly inserted incidents, as (incident_ts, location, nature) rows, to their days' sketches (committed by the caller)."""
+    batch = _sketch_rows(rows)
+    if not batch:
+        return
+    days = sorted({day for day, _ in batch})
+    with db.cursor() as cur:
+        _lock_days(cur, days)
+        cur.execute(SKETCH_DAYS_SQL, (days,))
+        for day, dimension, distinct_bytes, topk_bytes in cur.fetchall():
+            if (day, dimension) in batch:
+                distinct, top = HyperLogLog.from_bytes(distinct_bytes), TopK.from_bytes(topk_bytes)
+                distinct.merge(batch[(day, dimension)][0])
+                top.merge(batch[(day, dimension)][1])
+                batch[(day, dimension)] = (distinct, top)
+        _write(cur, batch)
+
+
+def refresh_sketch_days(db: connection, days: Iterable[date]) -> None:
+    """Rebuild the sketches of the given days from incidents (committed by the caller)."""
+    days = sorted(set(days))
+    if not days:
+        return
+    with db.cursor() as cur:
+        _lock_days(cur, days)
+        cur.execute("DELETE FROM incident_sketches WHERE day = ANY(%s::date[])", (days,))
+        cur.execute(SKETCH_DAY_INCIDENTS_SQL, (days[0], days[-1], days))
+        sketches = _sketch_rows(cur.fetchall())
+        if sketches:
+            _write(cur, sketches)
+
+
+def rebuild_sketches(db: connection) -> int:
+    """Rebuild the sketches of every day with incidents (backfill); return the number of days."""
+    try:
+        with db.cursor() as cur:
+            cur.execute("SELECT DISTINCT incident_ts::date FROM incidents WHERE incident_ts IS NOT NULL ORDER BY 1")
+            days = [row[0] for row in cur.fetchall()]
+        for start in range(0, len(days), REBUILD_BATCH_DAYS):
+            refresh_sketch_days(db, days[start:start + REBUILD_BATCH_DAYS])
+            db.commit()
+    except Exception as e:
+        logger.exception("Error rebuilding sketches: %s", e)
+        raise Exception(f"Error rebuilding sketches: {e}") from e
+    logger.info("Sketches rebuilt for %d days", len(days))
+    return len(days)
+
+
+def _merged(db: connection, column: str, sketch_type, dimension: str, start: Optional[date], end: Optional[date]):
+    """One sketch column of a dimension over days in [start, end), merged into a single sketch."""
+    if dimension not in SKETCH_DIMENSIONS:
+        raise ValueError(f"Unknown sketch dimension: {dimension}")
+    clauses, params = ["dimension = %s"], [dimension]
+    if start is not None:
+        clauses.append("day >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("day < %s")
+        params.append(end)
+    merged = sketch_type()
+    with db.cursor() as cur:
+        cur.execute(f"SELECT {column} FROM incident_sketches WHERE {' AND '.join(clauses)}", params)
+        while rows := cur.fetchmany(MERGE_FETCH_SIZE):
+            for data, in rows:
+                merged.merge(sketch_type.from_bytes(data))
+    return merged
+
+
+def distinct_count(db: connection, dimension: str, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Estimated number of distinct values of a dimension among incidents on days in [start, end)."""
+    return _merged(db, "distinct_sketch", HyperLogLog, dimension, start, end).estimate()
+
+
+def top_values(
+    db: connection, dimension: str, k: int = 20, start: Optional[date] = None, end: Optional[date] = None
+) -> list[tuple[str, int]]:
+    """Estimated k most frequent values of a dimension on days in [start, end), as (value, count), highest first."""
+    return _merged(db, "topk_sketch", TopK, dimension, start, end).top(k)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Approximate distinct counts and top values from the per-day sketches")
+    parser.add_argument("action", choices=["distinct", "top", "rebuild"])
+    parser.add_argument("dimension", nargs="?", choices=SKETCH_DIMENSIONS)
+    parser.add_argument("--start", type=date.fromisoformat, help="first day (inclusive)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day (exclusive)")
+    parser.add_argument("--k", type=int, default=20, help="values to list for `top`")
+    args = parser.parse_args(argv)
+    if args.action != "rebuild" and args.dimension is None:
+        parser.error(f"{args.action} needs a dimension ({', '.join(SKETCH_DIMENSIONS)})")
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        if args.action == "rebuild":
+            rebuild_sketches(conn)
+        elif args.action == "distinct":
+            print(distinct_count(conn, args.dimension, args.start, args.end))
+        else:
+            for value, count in top_values(conn, args.dimension, args.k, args.start, args.end):
+                print(f"{count}\t{value}")
+    finally:
+        terminate_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Spatial incident queries backed by the `location.geohash` index (plain Postgres, no PostGIS).
+
+Each lookup turns its area into a handful of geohash prefixes, reads only the locations inside
+those cells through `idx_location_geohash`, then joins their incidents via `idx_incidents_location_ts`.
+"""
+import logging
+from datetime import datetime
+from typing import Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.geo.geohash import EARTH_RADIUS_M, cover_bbox, cover_circle, decode
+
+# Great-circle distance (meters) from the point bound to the (lat, lat, lon) parameters to a location row
+_DISTANCE_SQL = (
+    f"{EARTH_RADIUS_M} * 2 * asin(sqrt("
+    "power(sin(radians(location.latitude - %s) / 2), 2) + "
+    "cos(radians(%s)) * cos(radians(location.latitude)) * power(sin(radians(location.longitude - %s) / 2), 2)))"
+)
+
+# Columns returned for each incident by the lookups below
+INCIDENT_COLUMNS = "incidents.incident_num, incidents.incident_ts, incidents.nature, incidents.location, location.latitude, location.longitude"
+
+# Busiest geohash cells (precision, start, end, limit): incidents of the [start, end) range are counted per location
+# first (range scan on the incident_ts index), then the locations are rolled up into cells
+HOTSPOTS_SQL = """SELECT left(location.geohash, %s) AS cell, SUM(per_location.n)::bigint AS n
+                FROM (
+                    SELECT incidents.location, COUNT(*) AS n FROM incidents
+                    WHERE incidents.incident_ts >= %s AND incidents.incident_ts < %s
+                    GROUP BY incidents.location
+                ) per_location
+                JOIN location ON location.loc = per_location.location
+                WHERE location.geohash IS NOT NULL
+                GROUP BY cell
+                ORDER BY n DESC, cell
+                LIMIT %s"""
+
+logger = logging.getLogger(__name__)
+
+
+def _prefix_filter(prefixes: Sequence[str]) -> tuple[str, list[str]]:
+    """SQL condition matching location rows whose geohash starts with any prefix (index range scans)."""
+    if prefixes == [""]:
+        return "location.geohash IS NOT NULL", []
+    # '{' sorts right after 'z', the last geohash character, so [p, p || '{') is exactly "starts with p"
+    clause = " OR ".join("(location.geohash >= %s AND location.geohash < %s)" for _ in prefixes)
+    params = [bound for p in prefixes for bound in (p, p + "{")]
+    return f"({clause})", params
+
+
+def _time_filter(start: Optional[datetime], end: Optional[datetime]) -> tuple[str, list]:
+    """SQL condition on incident_ts for an optional [start, end) range."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("incidents.incident_ts >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("incidents.incident_ts < %s")
+        params.append(end)
+    return (" AND " + " AND ".join(clauses)) if clauses else "", params
+
+
+def radius_query(
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> tuple[str, list]:
+    """SQL and parameters of incidents_within_radius (the cover's cell count shapes the statement)."""
+    cells, cell_params = _prefix_filter(cover_circle(latitude, longitude, radius_m))
+    time_sql, time_params = _time_filter(start, end)
+    sql = f"""SELECT * FROM (
+                    SELECT {INCIDENT_COLUMNS}, {_DISTANCE_SQL} AS distance_m
+                    FROM location JOIN incidents ON incidents.location = location.loc
+                    WHERE {cells}{time_sql}
+                ) nearby
+                WHERE distance_m <= %s
+                ORDER BY distance_m, incident_ts"""
+    return sql, [latitude, latitude, longitude] + cell_params + time_params + [radius_m]
+
+
+def bbox_query(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> tuple[str, list]:
+    """SQL and parameters of incidents_in_bbox."""
+    cells, cell_params = _prefix_filter(cover_bbox(south, west, north, east))
+    time_sql, time_params = _time_filter(start, end)
+    sql = f"""SELECT {INCIDENT_COLUMNS}
+                FROM location JOIN incidents ON incidents.location = location.loc
+                WHERE {cells}
+                  AND location.latitude BETWEEN %s AND %s AND location.longitude BETWEEN %s AND %s{time_sql}
+                ORDER BY incidents.incident_ts DESC"""
+    return sql, cell_params + [south, north, west, east] + time_params
+
+
+def incidents_within_radius(
+    db: connection,
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[tuple]:
+    """Incidents within `radius_m` meters of a point, nearest first; rows end with distance in meters."""
+    with db.cursor() as cur:
+        cur.execute(*radius_query(latitude, longitude, radius_m, start, end))
+        return cur.fetchall()
+
+
+def incidents_in_bbox(
+    db: connection,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> list[tuple]:
+    """Incidents whose location lies inside the box, newest first."""
+    with db.cursor() as cur:
+        cur.execute(*bbox_query(south, west, north, east, start, end))
+        return cur.fetchall()
+
+
+def hotspots(
+    db: connection,
+    start: datetime,
+    end: datetime,
+    precision: int = 7,
+    limit: int = 20,
+) -> list[tuple[str, int, float, float]]:
+    """Busiest geohash grid cells of the [start, end) range as (cell, incident count, center latitude, center longitude).
+
+    The time bound is required, so the count reads an index range rather than the whole history.
+    precision 7 cells are about 150 m x 120 m in Norman; 6 is about 1.2 km x 0.6 km.
+    """
+    if start is None or end is None or end <= start:
+        raise ValueError(f"hotspots needs a time range with start < end, got [{start}, {end})")
+    with db.cursor() as cur:
+        cur.execute(HOTSPOTS_SQL, (precision, start, end, limit))
+        rows = cur.fetchall()
+    return [(cell, n, *decode(cell)) for cell, n in rows]
@@ -0,0 +1,104 @@
+"""
+Patrol beat / neighborhood assignment: each geocoded location gets the name of the polygon it falls in,
+from a local GeoJSON layer (BEATS_GEOJSON), stored once per location (`location.beat`).
+
+`location.beat_layer` records the fingerprint of the layer a location was assigned with, so a run only
+looks at locations that are new or were assigned with a different file; editing the polygons reassigns
+every location on the next run. Locations outside every polygon are stored with a NULL beat.
+
+Run from repo root (assign pending locations; also part of the pipeline's post-processing):
+  python -m src.enrich.beats [--geojson resources/beats.geojson]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+from typing import Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.config import BEATS_GEOJSON, BEATS_NAME_PROPERTY
+from src.logging_config import setup_logging
+from src.db.bulk import BulkWriter
+from src.db.changes import CHANGE_BEAT
+from src.db.connection import create_connection, terminate_connection
+from src.db.events import notify_batch
+from src.db.schema import create_enrichment_tables, create_incident_table, create_location_table
+from src.geo.polygons import GridIndex, load_polygons
+
+# Geocoded locations not yet assigned with this layer (fingerprint), their current beat, and the bulk apply
+PENDING_BEATS_SQL = """SELECT loc, latitude, longitude, beat FROM location
+               WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+                 AND (beat_layer IS NULL OR beat_layer <> %s)"""
+BEATS_APPLY_SQL = """UPDATE location SET beat = b.beat, beat_layer = b.beat_layer FROM {table} b
+           WHERE location.loc = b.loc"""
+# Incidents at the locations whose beat a flush changed, for the change feed
+BEATS_CHANGES_SQL = """SELECT incidents.incident_num FROM {table} b
+           JOIN incidents ON incidents.location = b.loc
+           WHERE b.changed"""
+BEATS_BULK_COLUMNS = [("loc", "text"), ("beat", "text"), ("beat_layer", "text"), ("changed", "boolean")]
+
+logger = logging.getLogger(__name__)
+
+
+def layer_fingerprint(path: str, name_property: str = BEATS_NAME_PROPERTY) -> str:
+    """Content hash of the polygon file (and the property naming its polygons)."""
+    digest = hashlib.sha256(name_property.encode("utf-8") + b"\0")
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def assign_beats(db: connection, path: str = BEATS_GEOJSON, name_property: str = BEATS_NAME_PROPERTY) -> int:
+    """Assign the beat of every geocoded location not yet assigned with this polygon layer; return locations written."""
+    if not path or not os.path.exists(path):
+        logger.info("No beat polygons at %s; skipping beat assignment", path)
+        return 0
+    layer = layer_fingerprint(path, name_property)
+    with db.cursor() as cur:
+        cur.execute(PENDING_BEATS_SQL, (layer,))
+        locs = cur.fetchall()
+    if not locs:
+        db.rollback()
+        return 0
+
+    started = time.perf_counter()
+    polygons = load_polygons(path, name_property)
+    index = GridIndex(polygons)
+    built = time.perf_counter()
+    assigned = [(loc, index.lookup(latitude, longitude), beat) for loc, latitude, longitude, beat in locs]
+    logger.info(
+        "Assigned %d locations to %d polygons of %s (index %.1f ms, lookups %.1f ms), %d outside every polygon",
+        len(assigned), len(polygons), path, (built - started) * 1000, (time.perf_counter() - built) * 1000,
+        sum(1 for _, beat, _ in assigned if beat is None),
+    )
+
+    writer = BulkWriter(db, "beats", BEATS_BULK_COLUMNS, BEATS_APPLY_SQL, changes=(CHANGE_BEAT, BEATS_CHANGES_SQL))
+    for loc, beat, old_beat in assigned:
+        writer.add(loc, beat, layer, beat != old_beat)
+    writer.flush()
+    notify_batch(db, "beats")
+    db.commit()
+    return writer.rows_written
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Assign geocoded locations to beat / neighborhood polygons")
+    parser.add_argument("--geojson", default=BEATS_GEOJSON, help="polygon layer (GeoJSON Polygon / MultiPolygon features)")
+    parser.add_argument("--name-property", default=BEATS_NAME_PROPERTY, help="feature property naming each polygon")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        for create in (create_incident_table, create_location_table, create_enrichment_tables):
+            create(conn)
+        assign_beats(conn, args.geojson, args.name_property)
+    finally:
+        terminate_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
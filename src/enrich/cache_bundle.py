@@ -0,0 +1,115 @@
+"""
+Warm-cache bundles: the geocode cache (`location` rows, including addresses the geocoder did not find)
+and the Open-Meteo HTTP cache (`.cache`) in one gzip'd JSON-lines file, so a new database or checkout
+starts without hours of rate-limited lookups.
+
+Layout: a header line {"format": "normanpd-cache-bundle", "version": 1, "created_at", "locations", "weather"},
+then one ["location", loc, latitude, longitude] line per geocode and one ["weather", {...}] line per
+cached response (see src.enrich.weather.export_weather_cache).
+
+Run from repo root:
+  python -m src.enrich.cache_bundle export resources/cache_bundle.jsonl.gz
+  python -m src.enrich.cache_bundle import resources/cache_bundle.jsonl.gz
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.logging_config import setup_logging
+from src.db.connection import create_connection, terminate_connection
+from src.db.location import export_locations, import_locations
+from src.db.schema import create_location_table
+from src.enrich.weather import export_weather_cache, import_weather_cache
+
+BUNDLE_FORMAT = "normanpd-cache-bundle"
+BUNDLE_VERSION = 1
+
+RECORD_LOCATION = "location"
+RECORD_WEATHER = "weather"
+
+logger = logging.getLogger(__name__)
+
+
+def export_bundle(db: connection, path: str) -> dict:
+    """Write the geocode and weather caches to a bundle file; return the header written."""
+    locations = list(export_locations(db))
+    db.rollback()
+    weather = list(export_weather_cache())
+    header = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "locations": len(locations),
+        "weather": len(weather),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written beside the target and renamed, so an interrupted export never leaves a truncated bundle
+    partial = path + ".partial"
+    with gzip.open(partial, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        for loc, latitude, longitude in locations:
+            f.write(json.dumps([RECORD_LOCATION, loc, latitude, longitude]) + "\n")
+        for entry in weather:
+            f.write(json.dumps([RECORD_WEATHER, entry], separators=(",", ":")) + "\n")
+    os.replace(partial, path)
+    logger.info("Exported %d locations and %d weather responses to %s", len(locations), len(weather), path)
+    return header
+
+
+def import_bundle(db: connection, path: str) -> dict:
+    """Load a bundle into the location table and the weather cache (entries already present are kept).
+
+    Returns counts of the rows read and added per cache.
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != BUNDLE_FORMAT:
+                raise ValueError(f"{path} is not a cache bundle")
+            if header.get("version") != BUNDLE_VERSION:
+                raise ValueError(f"{path} is bundle version {header.get('version')}, this code reads version {BUNDLE_VERSION}")
+            locations, weather = [], []
+            for line in f:
+                kind, *record = json.loads(line)
+                if kind == RECORD_LOCATION:
+                    locations.append(record)
+                elif kind == RECORD_WEATHER:
+                    weather.append(record[0])
+        create_location_table(db)
+        added = import_locations(db, locations)
+        stored = import_weather_cache(weather)
+    except Exception as e:
+        logger.exception("Error importing cache bundle %s: %s", path, e)
+        raise Exception(f"Error importing cache bundle {path}: {e}") from e
+    logger.info(
+        "Imported %s: %d of %d locations added (%d not found), %d of %d weather responses added",
+        path, added, len(locations), sum(1 for _, latitude, _ in locations if latitude is None), stored, len(weather),
+    )
+    return {"locations": len(locations), "locations_added": added, "weather": len(weather), "weather_added": stored}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export or import the geocode and weather caches as one bundle file")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="bundle file (gzip'd JSON lines)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        if args.action == "export":
+            export_bundle(conn, args.path)
+        else:
+            import_bundle(conn, args.path)
+    finally:
+        terminate_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Geocoder pool: several Nominatim / Photon backends driven concurrently, each behind its own token bucket.
+
+Backends come from GEOCODER_BACKENDS ("<kind> <base url> <requests per second>", comma separated), e.g.
+  GEOCODER_BACKENDS="photon http://photon:2322 20, nominatim https://nominatim.openstreetmap.org 1"
+
+Each query goes to the healthy backend whose bucket frees a token soonest, so throughput adds up
+across backends. A backend that errors (5xx, timeout, connection refused, rate limited) is taken out
+of rotation for an exponentially growing cool-down and the query is retried on another backend. When
+every backend is out, the query waits for the earliest cool-down to end and tries again, up to a deadline.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+from urllib.parse import urlparse
+
+from geopy.exc import GeocoderQueryError, GeocoderRateLimited
+from geopy.geocoders import Nominatim, Photon
+
+from src.config import GEOCODER_BACKENDS, GEOCODER_WORKERS, GEOCODE_MAX_WAIT, GEOCODE_TIMEOUT
+
+NOMINATIM_USER_AGENT = "normanpd-incident-pipeline-geocoder"
+
+# Seconds a failing backend sits out after its first consecutive failure (doubles per failure, capped)
+BACKEND_COOLDOWN = 5.0
+MAX_BACKEND_COOLDOWN = 300.0
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+
+class NoGeocoderAvailable(Exception):
+    """Every backend failed (or stayed cooling down) for a query until its deadline."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` banked."""
+
+    def __init__(self, rate: float, burst: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        with self._lock:
+            self._refill(self._clock())
+            return max(0.0, (1.0 - self._tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def reserve(self) -> float:
+        """Take the next token now, possibly in advance (the balance may go negative); return seconds to wait for it."""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= 1.0
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> None:
+        """Block until a token is ours; concurrent callers are queued one 1/rate slot apart."""
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+@dataclass
+class GeocoderBackend:
+    """One geocoding service with its rate limit and failure state."""
+
+    name: str
+    geocode: Callable[[str], object]
+    bucket: TokenBucket
+    failures: int = 0
+    down_until: float = 0.0
+    requests: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def available(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.failures = 0
+            self.down_until = 0.0
+
+    def record_failure(self, now: float, retry_after: Optional[float] = None) -> float:
+        """Take the backend out of rotation; return the cool-down in seconds."""
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            cooldown = retry_after or min(BACKEND_COOLDOWN * 2 ** (self.failures - 1), MAX_BACKEND_COOLDOWN)
+            self.down_until = now + cooldown
+            return cooldown
+
+
+def build_backend(kind: str, url: str, rate: float, timeout: float = GEOCODE_TIMEOUT) -> GeocoderBackend:
+    """Create a geopy-backed backend for a Nominatim or Photon base URL."""
+    parsed = urlparse(url)
+    domain = parsed.netloc + parsed.path.rstrip("/")
+    if kind == "nominatim":
+        client = Nominatim(user_agent=NOMINATIM_USER_AGENT, domain=domain, scheme=parsed.scheme, timeout=timeout)
+    elif kind == "photon":
+        client = Photon(user_agent=NOMINATIM_USER_AGENT, domain=domain, scheme=parsed.scheme, timeout=timeout)
+    else:
+        raise ValueError(f"Unknown geocoder backend kind: {kind}")
+    return GeocoderBackend(name=f"{kind}:{parsed.netloc}", geocode=client.geocode, bucket=TokenBucket(rate))
+
+
+def parse_backends(spec: str) -> list[tuple[str, str, float]]:
+    """Parse a GEOCODER_BACKENDS value into (kind, url, rate) triples."""
+    backends = []
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        parts = entry.split()
+        if len(parts) != 3:
+            raise ValueError(f"Geocoder backend must be '<kind> <url> <rate>': {entry.strip()}")
+        kind, url, rate = parts
+        backends.append((kind.lower(), url, float(rate)))
+    if not backends:
+        raise ValueError("No geocoder backends configured")
+    return backends
+
+
+class GeocoderPool:
+    """Routes geocode queries across backends by token availability, skipping backends that are failing."""
+
+    def __init__(
+        self,
+        backends: list[GeocoderBackend],
+        max_workers: Optional[int] = None,
+        max_wait: float = GEOCODE_MAX_WAIT,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if not backends:
+            raise ValueError("GeocoderPool needs at least one backend")
+        self.backends = backends
+        # Enough threads to keep every bucket busy by default (one per request/second, at least one per backend)
+        self.max_workers = max_workers or sum(max(1, round(b.bucket.rate)) for b in backends)
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+
+    def _pick(self, tried: set[str]) -> Optional[GeocoderBackend]:
+        now = self._clock()
+        candidates = [b for b in self.backends if b.name not in tried and b.available(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: b.bucket.wait_time())
+
+    def geocode(self, query: str):
+        """Geocode one query (geopy Location or None).
+
+        Once every backend has failed or is cooling down, sleeps until the earliest cool-down ends and tries
+        again; NoGeocoderAvailable if no backend answers within `max_wait` seconds of the call.
+        """
+        deadline = self._clock() + self.max_wait
+        tried: set[str] = set()
+        last_error: Optional[Exception] = None
+        while True:
+            backend = self._pick(tried)
+            if backend is None:
+                now = self._clock()
+                wait = min(b.down_until for b in self.backends) - now
+                if now + wait > deadline:
+                    raise NoGeocoderAvailable(
+                        f"No geocoder available for {query!r} within {self.max_wait:g}s: {last_error or 'all backends cooling down'}"
+                    )
+                if wait > 0:
+                    self._sleep(wait)
+                tried.clear()
+                continue
+            tried.add(backend.name)
+            backend.bucket.acquire()
+            try:
+                result = backend.geocode(query)
+            except GeocoderQueryError:
+                raise
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None) if isinstance(e, GeocoderRateLimited) else None
+                cooldown = backend.record_failure(self._clock(), retry_after)
+                logger.warning("Geocoder %s failed for %r (%s); out of rotation for %.0fs", backend.name, query, e, cooldown)
+                last_error = e
+                continue
+            backend.record_success()
+            return result
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> Iterator[R]:
+        """Apply fn (which calls geocode) to items concurrently, yielding results in input order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="geocoder") as executor:
+            yield from executor.map(fn, items)
+
+
+_pool: Optional[GeocoderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_geocoder_pool() -> GeocoderPool:
+    """Process-wide pool built from GEOCODER_BACKENDS on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            backends = [build_backend(kind, url, rate) for kind, url, rate in parse_backends(GEOCODER_BACKENDS)]
+            _pool = GeocoderPool(backends, max_workers=GEOCODER_WORKERS or None)
+            logger.info("Geocoder pool: %s", ", ".join(f"{b.name} @ {b.bucket.rate:g}/s" for b in backends))
+        return _pool
@@ -3,39 +3,75 @@ from math import radians, cos, sin, atan2, degrees
 from psycopg2.extensions import connection
 
 from src.config import TOWN_CENTER
+from src.db.bulk import BulkWriter
+from src.db.changes import CHANGE_SIDE_OF_TOWN
+from src.db.enrichment import STAGE_SIDE_OF_TOWN, StageCheckpoint, pending_window, with_next_seq
+from src.db.location import first_ungeocoded_seq
 
 logger = logging.getLogger(__name__)
 
+DIRECTIONS = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+# Geocoded locations of rows in the (low, high] change_seq window that have no side of town yet, in checkpoint
+# order (first change_seq), and the bulk apply of their directions to the location rows
+PENDING_SIDE_OF_TOWN_SQL = """SELECT loc, latitude, longitude, MIN(incidents.change_seq) FROM location
+               JOIN incidents ON incidents.location = location.loc
+               WHERE incidents.change_seq > %s AND incidents.change_seq <= %s
+                 AND location.latitude IS NOT NULL AND location.longitude IS NOT NULL AND location.side_of_town IS NULL
+               GROUP BY loc, latitude, longitude
+               ORDER BY 4"""
+SIDE_OF_TOWN_APPLY_SQL = """UPDATE location SET side_of_town = b.side_of_town FROM {table} b
+           WHERE location.loc = b.loc"""
+# Incidents at the locations a flush gave a side of town, for the change feed
+SIDE_OF_TOWN_CHANGES_SQL = """SELECT incidents.incident_num FROM {table} b
+           JOIN incidents ON incidents.location = b.loc"""
+# Days with incidents at those locations, whose rollups are rebuilt
+SIDE_OF_TOWN_ROLLUP_DAYS_SQL = """SELECT DISTINCT incidents.incident_ts::date FROM {table} b
+           JOIN incidents ON incidents.location = b.loc"""
+SIDE_OF_TOWN_BULK_COLUMNS = [("loc", "text"), ("side_of_town", "text")]
+
+
+def compass_direction(latitude: float, longitude: float, town_center: tuple[float, float] = TOWN_CENTER) -> str:
+    """Return the 8-point compass direction of a point as seen from the town center."""
+    point = (latitude, longitude)
+    lat1, lon1 = map(radians, town_center)
+    lat2, lon2 = map(radians, point)
+
+    dLon = lon2 - lon1
+    x = cos(lat2) * sin(dLon)
+    y = cos(lat1) * sin(lat2) - (sin(lat1) * cos(lat2) * cos(dLon))
+    initial_bearing = atan2(x, y)
+
+    bearing = (degrees(initial_bearing) + 360) % 360
+    return DIRECTIONS[round(bearing / 45) % 8]
+
+
 def side_of_town(db: connection) -> None:
-    """Calculate the side of town for each location in the database."""
+    """Calculate the side of town for the locations of incidents added since the last run."""
     town_center = TOWN_CENTER
     if not town_center:
         logger.error("TOWN_CENTER is not set")
         return
 
+    low, high = pending_window(db, STAGE_SIDE_OF_TOWN)
     with db.cursor() as cur:
-        cur.execute("SELECT DISTINCT loc, latitude, longitude FROM location")
+        cur.execute(PENDING_SIDE_OF_TOWN_SQL, (low, high))
         locs = cur.fetchall()
 
-    directions = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
-
-    for loc, latitude, longitude in locs:
+    # One narrow location row per direction; every incident at the location reads it through incidents_enriched
+    writer = BulkWriter(
+        db, "side_of_town", SIDE_OF_TOWN_BULK_COLUMNS, SIDE_OF_TOWN_APPLY_SQL,
+        changes=(CHANGE_SIDE_OF_TOWN, SIDE_OF_TOWN_CHANGES_SQL), rollup_days=SIDE_OF_TOWN_ROLLUP_DAYS_SQL,
+    )
+    checkpoint = StageCheckpoint(db, STAGE_SIDE_OF_TOWN, high, writer.flush)
+    # Locations not geocoded yet (e.g. the geocoder failed) are picked up by the run after they are
+    ungeocoded = first_ungeocoded_seq(db, low, high)
+    if ungeocoded is not None:
+        checkpoint.hold(ungeocoded)
+    for (loc, latitude, longitude, _), next_seq in with_next_seq(locs):
         if latitude is None or longitude is None:
             logger.warning("Latitude or longitude is None for %s", loc)
-            continue
-        point = (latitude, longitude)
-        lat1, lon1 = map(radians, town_center)
-        lat2, lon2 = map(radians, point)
-
-        dLon = lon2 - lon1
-        x = cos(lat2) * sin(dLon)
-        y = cos(lat1) * sin(lat2) - (sin(lat1) * cos(lat2) * cos(dLon))
-        initial_bearing = atan2(x, y)
-
-        bearing = (degrees(initial_bearing) + 360) % 360
-        direction = directions[round(bearing / 45) % 8]
-
-        with db.cursor() as cur:
-            cur.execute("UPDATE incidents SET side_of_town = %s WHERE location = %s", (direction, loc))
-
-    db.commit()
+        else:
+            writer.add(loc, compass_direction(latitude, longitude, town_center))
+        checkpoint.done(next_seq)
+    checkpoint.finish()
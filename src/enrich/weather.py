@@ -1,13 +1,51 @@
+import base64
 import logging
+import math
 from datetime import datetime
+from typing import Iterable, Iterator, Optional
 import openmeteo_requests
 import requests_cache
+from requests.structures import CaseInsensitiveDict
+from requests_cache.models import CachedRequest, CachedResponse
 from retry_requests import retry
 from psycopg2.extensions import connection
 
+from src.config import OPENMETEO_ARCHIVE_URL
+from src.db.bulk import BulkWriter
+from src.db.changes import CHANGE_WEATHER
+from src.db.enrichment import STAGE_WEATHER, StageCheckpoint, pending_window, with_next_seq
+from src.db.location import first_ungeocoded_seq
+
 # Open-Meteo archive API can be slow; use a longer timeout to avoid ReadTimeoutError (requests default is no timeout)
 OPENMETEO_TIMEOUT = 10
 
+# Weather is resolved per ~1 km grid cell (lat/lon rounded to 2 decimals); SQL expression for a location row's cell key
+WEATHER_CELL_SQL = "round(location.latitude::numeric, 2)::text || ',' || round(location.longitude::numeric, 2)::text"
+
+# Pending (time, location) pairs of rows in the (low, high] change_seq window with no incident_weather row, in
+# checkpoint order (first change_seq), skipping locations the geocoder did not find, and the bulk apply of their
+# codes into incident_weather
+PENDING_WEATHER_SQL = """SELECT incident_ts, location, latitude, longitude, MIN(incidents.change_seq) FROM incidents
+               JOIN location ON incidents.location = location.loc
+               WHERE incidents.change_seq > %s AND incidents.change_seq <= %s
+                 AND NOT EXISTS (SELECT 1 FROM incident_weather w WHERE w.incident_num = incidents.incident_num)
+                 AND location.latitude IS NOT NULL AND location.longitude IS NOT NULL
+               GROUP BY incident_ts, location, latitude, longitude
+               ORDER BY 5"""
+WEATHER_APPLY_SQL = """INSERT INTO incident_weather (incident_num, weather)
+           SELECT incidents.incident_num, b.weather FROM {table} b
+           JOIN incidents ON incidents.incident_ts = b.incident_ts AND incidents.location = b.location
+           ON CONFLICT (incident_num) DO UPDATE SET weather = EXCLUDED.weather"""
+# Incidents a flush gave weather, for the change feed
+WEATHER_CHANGES_SQL = """SELECT incidents.incident_num FROM {table} b
+           JOIN incidents ON incidents.incident_ts = b.incident_ts AND incidents.location = b.location"""
+# Days a flush gave weather, whose rollups are rebuilt
+WEATHER_ROLLUP_DAYS_SQL = "SELECT DISTINCT incident_ts::date FROM {table}"
+WEATHER_BULK_COLUMNS = [("incident_ts", "timestamp"), ("location", "text"), ("weather", "integer")]
+
+# Marks a weather lookup that failed with an error (retried later), as opposed to None: no data for that hour
+WEATHER_ERROR = object()
+
 
 class CachedSessionWithTimeout(requests_cache.CachedSession):
     """CachedSession that applies a default timeout to every request."""
@@ -27,42 +65,107 @@ _openmeteo_client = openmeteo_requests.Client(session=_retry_session)
 
 logger = logging.getLogger(__name__)
 
-def get_weather(db: connection) -> None:
-    """Fetch weather data for each location in the database."""
-    url = "https://archive-api.open-meteo.com/v1/archive"
-    with db.cursor() as cur:
-        cur.execute("SELECT DISTINCT incident_ts, location, latitude, longitude FROM incidents JOIN location ON incidents.location = location.loc")
-        locations = cur.fetchall()
 
-    for incident_ts, location, latitude, longitude in locations:
-        date_str = incident_ts.strftime("%Y-%m-%d") if hasattr(incident_ts, "strftime") else str(incident_ts)[:10]
-        hour = incident_ts.hour if hasattr(incident_ts, "hour") else 0
+def fetch_hourly_weather_codes(latitude: float, longitude: float, date_str: str) -> list[Optional[int]]:
+    """Fetch the 24 hourly Open-Meteo weather codes for a point and day (None where missing)."""
+    params = {
+        "latitude": latitude,
+        "longitude": longitude,
+        "start_date": date_str,
+        "end_date": date_str,
+        "hourly": "weather_code",
+        "timezone": "auto"
+    }
+    responses = _openmeteo_client.weather_api(OPENMETEO_ARCHIVE_URL, params=params)
+    hourly_weather_code = responses[0].Hourly().Variables(0).ValuesAsNumpy()
+    return [None if math.isnan(code) else int(code) for code in hourly_weather_code]
+
 
-        if latitude is None or longitude is None:
-            logger.warning("Latitude or longitude is None for %s on %s at hour %s", location, date_str, hour)
+def export_weather_cache() -> Iterator[dict]:
+    """Every cached Open-Meteo response as a JSON-ready dict (cache key, request, status, headers, base64 body)."""
+    responses = _cache_session.cache.responses
+    for key in responses.keys():
+        response = responses.get(key)
+        if response is None:
             continue
-        params = {
-            "latitude": latitude,
-            "longitude": longitude,
-            "start_date": date_str,
-            "end_date": date_str,
-            "hourly": "weather_code",
-            "timezone": "auto"
+        yield {
+            "key": key,
+            "method": response.request.method,
+            "url": response.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "created_at": response.created_at.isoformat(),
+            "content": base64.b64encode(response.content or b"").decode("ascii"),
         }
-        try:
-            responses = _openmeteo_client.weather_api(url, params=params)
-            response = responses[0]
-
-            hourly_weather_code = response.Hourly().Variables(0).ValuesAsNumpy()
-
-            if hour < len(hourly_weather_code):
-                weather_code = int(hourly_weather_code[hour])
-                with db.cursor() as cur:
-                    cur.execute("UPDATE incidents SET weather = %s WHERE incident_ts = %s AND location = %s", (weather_code, incident_ts, location))
-            else:
-                logger.warning("No weather data found for %s on %s at hour %s", location, date_str, hour)
+
+
+def import_weather_cache(entries: Iterable[dict]) -> int:
+    """Store exported responses in the local HTTP cache under their original keys, keeping keys already cached; return how many were added."""
+    responses = _cache_session.cache.responses
+    stored = 0
+    with responses.bulk_commit():
+        for entry in entries:
+            if entry["key"] in responses:
                 continue
-        except Exception as e:
-            logger.exception("Error fetching weather data for %s on %s at hour %s: %s", location, date_str, hour, e)
-            continue
-    db.commit()
+            responses[entry["key"]] = CachedResponse(
+                content=base64.b64decode(entry["content"]),
+                created_at=datetime.fromisoformat(entry["created_at"]),
+                headers=CaseInsensitiveDict(entry["headers"]),
+                reason=entry["reason"],
+                request=CachedRequest(method=entry["method"], url=entry["url"]),
+                status_code=entry["status"],
+                url=entry["url"],
+            )
+            stored += 1
+    return stored
+
+
+def _weather_code(incident_ts, location: str, latitude: Optional[float], longitude: Optional[float]):
+    """Weather code at the hour of an incident, None (logged) when there is none, or WEATHER_ERROR if the API call failed."""
+    date_str = incident_ts.strftime("%Y-%m-%d") if hasattr(incident_ts, "strftime") else str(incident_ts)[:10]
+    hour = incident_ts.hour if hasattr(incident_ts, "hour") else 0
+
+    if latitude is None or longitude is None:
+        logger.warning("Latitude or longitude is None for %s on %s at hour %s", location, date_str, hour)
+        return None
+    try:
+        hourly_weather_code = fetch_hourly_weather_codes(latitude, longitude, date_str)
+    except Exception as e:
+        logger.exception("Error fetching weather data for %s on %s at hour %s: %s", location, date_str, hour, e)
+        return WEATHER_ERROR
+    if hour < len(hourly_weather_code) and hourly_weather_code[hour] is not None:
+        return hourly_weather_code[hour]
+    logger.warning("No weather data found for %s on %s at hour %s", location, date_str, hour)
+    return None
+
+
+def get_weather(db: connection) -> None:
+    """Fetch weather data for incidents added since the last run that have none yet.
+
+    Results are committed in checkpointed batches, so an interrupted run resumes after the last batch. Failed
+    lookups and incidents whose location is not geocoded yet keep the watermark below them, so a later run
+    retries them.
+    """
+    low, high = pending_window(db, STAGE_WEATHER)
+    with db.cursor() as cur:
+        cur.execute(PENDING_WEATHER_SQL, (low, high))
+        locations = cur.fetchall()
+    logger.info("Fetching weather for %d new (time, location) pairs", len(locations))
+
+    writer = BulkWriter(
+        db, "weather", WEATHER_BULK_COLUMNS, WEATHER_APPLY_SQL,
+        changes=(CHANGE_WEATHER, WEATHER_CHANGES_SQL), rollup_days=WEATHER_ROLLUP_DAYS_SQL,
+    )
+    checkpoint = StageCheckpoint(db, STAGE_WEATHER, high, writer.flush)
+    ungeocoded = first_ungeocoded_seq(db, low, high)
+    if ungeocoded is not None:
+        checkpoint.hold(ungeocoded)
+    for (incident_ts, location, latitude, longitude, first_seq), next_seq in with_next_seq(locations):
+        code = _weather_code(incident_ts, location, latitude, longitude)
+        if code is WEATHER_ERROR:
+            checkpoint.hold(first_seq)
+        elif code is not None:
+            writer.add(incident_ts, location, code)
+        checkpoint.done(next_seq)
+    checkpoint.finish()
@@ -0,0 +1,129 @@
+from math import asin, ceil, cos, radians, sin, sqrt
+
+# Standard geohash base32 alphabet (no a, i, l, o)
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(BASE32)}
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = 111320.0
+MAX_PRECISION = 12
+
+
+def encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    """Encode a point as a geohash of `precision` characters."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    n_bits = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        n_bits += 1
+        if n_bits == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            n_bits = 0
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> tuple[float, float, float, float]:
+    """Return the (south, west, north, east) bounds of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lon_lo, lat_hi, lon_hi
+
+
+def decode(geohash: str) -> tuple[float, float]:
+    """Return the center (latitude, longitude) of a geohash cell."""
+    south, west, north, east = decode_bbox(geohash)
+    return (south + north) / 2, (west + east) / 2
+
+
+def cell_size_degrees(precision: int) -> tuple[float, float]:
+    """Height and width in degrees of a geohash cell of `precision` characters."""
+    n_bits = 5 * precision
+    lon_bits = ceil(n_bits / 2)
+    lat_bits = n_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters between two points."""
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(sqrt(a))
+
+
+def _cells_in_bbox(south: float, west: float, north: float, east: float, precision: int) -> list[str]:
+    """Every geohash cell of `precision` that intersects the box."""
+    dlat, dlon = cell_size_degrees(precision)
+    cells = []
+    lat = south
+    while True:
+        lon = west
+        while True:
+            cells.append(encode(max(min(lat, 90.0), -90.0), max(min(lon, 180.0), -180.0), precision))
+            if lon >= east:
+                break
+            lon = min(lon + dlon, east)
+        if lat >= north:
+            break
+        lat = min(lat + dlat, north)
+    return list(dict.fromkeys(cells))
+
+
+def cover_bbox(south: float, west: float, north: float, east: float, max_cells: int = 16) -> list[str]:
+    """Geohash prefixes that together cover the box, using the finest precision that needs at most `max_cells`."""
+    best = [""]
+    for precision in range(1, MAX_PRECISION + 1):
+        dlat, dlon = cell_size_degrees(precision)
+        if ((north - south) / dlat + 2) * ((east - west) / dlon + 2) > max_cells * 4:
+            break  # cheap upper bound says this precision is far too fine
+        cells = _cells_in_bbox(south, west, north, east, precision)
+        if len(cells) > max_cells:
+            break
+        best = cells
+    return best
+
+
+def cover_circle(latitude: float, longitude: float, radius_m: float, max_cells: int = 16) -> list[str]:
+    """Geohash prefixes that together cover the circle of `radius_m` meters around a point."""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlon = radius_m / (METERS_PER_DEGREE * max(cos(radians(latitude)), 1e-6))
+    return cover_bbox(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon, max_cells)
@@ -0,0 +1,142 @@
+"""
+Polygon layers (patrol beats, neighborhoods) from GeoJSON, with a uniform grid index for point-in-polygon lookups.
+
+Coordinates follow GeoJSON: (longitude, latitude) pairs. Rings are tested with the even-odd rule, so holes
+(inner rings) and MultiPolygon parts need no special handling.
+
+The grid covers the layer's bounding box. Each cell is classified once, at build time:
+- interior: no polygon edge crosses it and it lies inside a polygon, so every point in it belongs to that polygon
+- boundary: edges of one or more polygons cross it; points are tested against those polygons only
+- empty: outside every polygon
+so most lookups cost one dict access, and the rest a ray cast against a handful of candidate polygons.
+"""
+import json
+from bisect import bisect_left
+from math import floor
+from typing import NamedTuple, Optional, Sequence
+
+Ring = list[tuple[float, float]]
+
+# Grid resolution: cells along the longer side of the layer's bounding box
+DEFAULT_GRID_SIZE = 256
+
+
+class Polygon(NamedTuple):
+    name: str
+    rings: list[Ring]  # every ring of every part (outer boundaries and holes)
+    bbox: tuple[float, float, float, float]  # min_x, min_y, max_x, max_y
+
+
+def _rings(geometry: dict) -> list[Ring]:
+    if geometry["type"] == "Polygon":
+        parts = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        parts = geometry["coordinates"]
+    else:
+        raise ValueError(f"Unsupported geometry type {geometry['type']}")
+    return [[(float(x), float(y)) for x, y, *_ in ring] for part in parts for ring in part]
+
+
+def load_polygons(path: str, name_property: str = "name") -> list[Polygon]:
+    """Read the Polygon / MultiPolygon features of a GeoJSON file, named by `name_property`."""
+    with open(path, encoding="utf-8") as f:
+        collection = json.load(f)
+    polygons = []
+    for feature in collection.get("features", []):
+        geometry = feature.get("geometry")
+        if not geometry or geometry["type"] not in ("Polygon", "MultiPolygon"):
+            continue
+        name = (feature.get("properties") or {}).get(name_property)
+        if name is None:
+            raise ValueError(f"{path}: feature without a {name_property!r} property")
+        rings = _rings(geometry)
+        xs = [x for ring in rings for x, _ in ring]
+        ys = [y for ring in rings for _, y in ring]
+        polygons.append(Polygon(str(name), rings, (min(xs), min(ys), max(xs), max(ys))))
+    return polygons
+
+
+def _edges(rings: Sequence[Ring]):
+    for ring in rings:
+        for i in range(len(ring)):
+            yield ring[i - 1], ring[i]
+
+
+def contains(polygon: Polygon, x: float, y: float) -> bool:
+    """Even-odd ray cast: True if (x, y) lies inside the polygon (points on an edge may go either way)."""
+    min_x, min_y, max_x, max_y = polygon.bbox
+    if not (min_x <= x <= max_x and min_y <= y <= max_y):
+        return False
+    inside = False
+    for (x1, y1), (x2, y2) in _edges(polygon.rings):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+class GridIndex:
+    """Uniform grid over a polygon layer; `lookup` returns the name of the polygon containing a point.
+
+    Polygons are expected not to overlap (beats, neighborhoods); a point in an overlap gets one of them.
+    """
+
+    def __init__(self, polygons: Sequence[Polygon], grid_size: int = DEFAULT_GRID_SIZE):
+        self.polygons = list(polygons)
+        self._interior: dict[tuple[int, int], int] = {}
+        self._boundary: dict[tuple[int, int], list[int]] = {}
+        if not self.polygons:
+            self.bbox = (0.0, 0.0, 0.0, 0.0)
+            self.cell = 1.0
+            return
+        min_x = min(p.bbox[0] for p in self.polygons)
+        min_y = min(p.bbox[1] for p in self.polygons)
+        max_x = max(p.bbox[2] for p in self.polygons)
+        max_y = max(p.bbox[3] for p in self.polygons)
+        self.bbox = (min_x, min_y, max_x, max_y)
+        self.cell = max(max_x - min_x, max_y - min_y) / grid_size or 1.0
+        for pid, polygon in enumerate(self.polygons):
+            self._add(pid, polygon)
+
+    def _cell_of(self, x: float, y: float) -> tuple[int, int]:
+        return floor((x - self.bbox[0]) / self.cell), floor((y - self.bbox[1]) / self.cell)
+
+    def _add(self, pid: int, polygon: Polygon) -> None:
+        # Boundary cells: every cell an edge's bounding box touches (a superset of the cells it crosses)
+        boundary = set()
+        for (x1, y1), (x2, y2) in _edges(polygon.rings):
+            i1, j1 = self._cell_of(min(x1, x2), min(y1, y2))
+            i2, j2 = self._cell_of(max(x1, x2), max(y1, y2))
+            boundary.update((i, j) for i in range(i1, i2 + 1) for j in range(j1, j2 + 1))
+        for key in boundary:
+            self._boundary.setdefault(key, []).append(pid)
+
+        # Interior cells, row by row: a cell no edge touches is wholly inside or outside, which the number of
+        # edge crossings left of its center (on the row's center line) decides
+        i_lo, j_lo = self._cell_of(polygon.bbox[0], polygon.bbox[1])
+        i_hi, j_hi = self._cell_of(polygon.bbox[2], polygon.bbox[3])
+        for j in range(j_lo, j_hi + 1):
+            y = self.bbox[1] + (j + 0.5) * self.cell
+            crossings = sorted(
+                x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                for (x1, y1), (x2, y2) in _edges(polygon.rings)
+                if (y1 > y) != (y2 > y)
+            )
+            if not crossings:
+                continue
+            for i in range(i_lo, i_hi + 1):
+                if (i, j) in boundary:
+                    continue
+                x = self.bbox[0] + (i + 0.5) * self.cell
+                if bisect_left(crossings, x) % 2:
+                    self._interior.setdefault((i, j), pid)
+
+    def lookup(self, latitude: float, longitude: float) -> Optional[str]:
+        """Name of the polygon containing the point, or None."""
+        key = self._cell_of(longitude, latitude)
+        pid = self._interior.get(key)
+        if pid is not None:
+            return self.polygons[pid].name
+        for pid in self._boundary.get(key, ()):
+            if contains(self.polygons[pid], longitude, latitude):
+                return self.polygons[pid].name
+        return None
@@ -0,0 +1,86 @@
+import logging
+import threading
+from typing import BinaryIO, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import (
+    HTTP_BACKOFF_FACTOR,
+    HTTP_POOL_SIZE,
+    HTTP_RETRIES,
+    HTTP_TIMEOUT,
+    HTTP_USER_AGENT,
+)
+
+# Size of each chunk pulled off the socket when streaming a response body
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Transient statuses worth retrying (rate limiting and upstream/gateway errors)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+logger = logging.getLogger(__name__)
+
+
+class SessionWithTimeout(requests.Session):
+    """Session that applies a default (connect, read) timeout to every request."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        super().__init__()
+        self._default_timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self._default_timeout)
+        return super().request(*args, **kwargs)
+
+
+def build_session(
+    retries: int = HTTP_RETRIES,
+    backoff_factor: float = HTTP_BACKOFF_FACTOR,
+    pool_size: int = HTTP_POOL_SIZE,
+    timeout=HTTP_TIMEOUT,
+) -> SessionWithTimeout:
+    """Build a keep-alive session with pooled connections, retries with backoff and a default timeout."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the final response back so callers can inspect status_code
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    session = SessionWithTimeout(timeout=timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": HTTP_USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+_session: Optional[SessionWithTimeout] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> SessionWithTimeout:
+    """Return the process-wide shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+                logger.debug("Shared HTTP session created (pool size %d, retries %d)", HTTP_POOL_SIZE, HTTP_RETRIES)
+    return _session
+
+
+def stream_to(url: str, out: BinaryIO, session: Optional[requests.Session] = None) -> int:
+    """Stream the body of a GET response into a binary file object; return the number of bytes written."""
+    session = session or get_session()
+    written = 0
+    with session.get(url, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            out.write(chunk)
+            written += len(chunk)
+    return written
@@ -0,0 +1,153 @@
+import logging
+from typing import Iterable, NamedTuple, Optional
+
+from psycopg2.extensions import connection
+from psycopg2.extras import execute_values
+
+from src.config import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_MIN_INTERVAL, JOB_RETRY_BASE_SECONDS
+
+# Failed attempts back off exponentially up to this many seconds
+MAX_RETRY_DELAY = 3600
+
+logger = logging.getLogger(__name__)
+
+
+class Job(NamedTuple):
+    id: int
+    kind: str
+    key: str
+    attempts: int
+
+
+def retry_delay(attempts: int, base: float = JOB_RETRY_BASE_SECONDS) -> float:
+    """Seconds to wait before retrying a job that has failed `attempts` times."""
+    return min(base * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY)
+
+
+def enqueue_jobs(db: connection, kind: str, keys: Iterable[str], priority: int = 0, rearm: bool = False) -> int:
+    """Add jobs of one kind (deduplicated on key); return how many were added or re-armed. Committed by the caller.
+
+    With rearm=True a finished, failed or running job with the same key is put back to pending, for
+    jobs whose input can grow after they ran (weather for a cell-day, ranks).
+    """
+    rows = [(kind, key, priority) for key in dict.fromkeys(keys)]
+    if not rows:
+        return 0
+    if rearm:
+        conflict = """ON CONFLICT (kind, key) DO UPDATE SET status = 'pending', attempts = 0, run_after = NOW(),
+                          leased_by = NULL, lease_expires_at = NULL, updated_at = NOW()
+                      WHERE jobs.status <> 'pending'"""
+    else:
+        conflict = "ON CONFLICT (kind, key) DO NOTHING"
+    with db.cursor() as cur:
+        execute_values(cur, f"INSERT INTO jobs (kind, key, priority) VALUES %s {conflict}", rows)
+        return cur.rowcount
+
+
+def _take_throttle_slot(cur, kind: str, interval: float) -> bool:
+    """Reserve the next slot for a throttled job kind; False if another worker used it less than `interval` ago."""
+    cur.execute(
+        """INSERT INTO job_throttle (kind, next_at) VALUES (%s, clock_timestamp() + make_interval(secs => %s))
+           ON CONFLICT (kind) DO UPDATE SET next_at = EXCLUDED.next_at
+           WHERE job_throttle.next_at <= clock_timestamp()
+           RETURNING kind""",
+        (kind, interval),
+    )
+    return cur.fetchone() is not None
+
+
+def claim_job(db: connection, worker_id: str, kinds: Iterable[str], lease_seconds: int = JOB_LEASE_SECONDS) -> Optional[Job]:
+    """Lease the next runnable job of the given kinds, skipping rows other workers hold; None if there is none."""
+    kinds = list(kinds)
+    while kinds:
+        with db.cursor() as cur:
+            # Pending jobs that are due, plus running jobs whose worker let the lease expire (crashed or hung)
+            cur.execute(
+                """SELECT id, kind, key, attempts FROM jobs
+                   WHERE kind = ANY(%s)
+                     AND ((status = 'pending' AND run_after <= NOW())
+                          OR (status = 'running' AND lease_expires_at < NOW()))
+                   ORDER BY priority DESC, id
+                   LIMIT 1
+                   FOR UPDATE SKIP LOCKED""",
+                (kinds,),
+            )
+            row = cur.fetchone()
+            if row is None:
+                db.rollback()
+                return None
+            job_id, kind, key, attempts = row
+
+            if attempts >= JOB_MAX_ATTEMPTS:
+                cur.execute(
+                    """UPDATE jobs SET status = 'failed', leased_by = NULL, lease_expires_at = NULL, updated_at = NOW(),
+                              last_error = COALESCE(last_error, 'lease expired')
+                       WHERE id = %s""",
+                    (job_id,),
+                )
+                db.commit()
+                logger.warning("Job %s %s failed: lease expired after %d attempts", kind, key, attempts)
+                continue
+
+            interval = JOB_MIN_INTERVAL.get(kind)
+            if interval and not _take_throttle_slot(cur, kind, interval):
+                db.rollback()
+                kinds.remove(kind)
+                continue
+
+            cur.execute(
+                """UPDATE jobs SET status = 'running', attempts = attempts + 1, leased_by = %s,
+                          lease_expires_at = NOW() + make_interval(secs => %s), updated_at = NOW()
+                   WHERE id = %s""",
+                (worker_id, lease_seconds, job_id),
+            )
+        db.commit()
+        return Job(job_id, kind, key, attempts + 1)
+    return None
+
+
+def complete_job(db: connection, job: Job, worker_id: str) -> None:
+    """Mark a leased job done (no-op if the lease was lost or the job was re-armed meanwhile)."""
+    with db.cursor() as cur:
+        cur.execute(
+            """UPDATE jobs SET status = 'done', leased_by = NULL, lease_expires_at = NULL, last_error = NULL, updated_at = NOW()
+               WHERE id = %s AND leased_by = %s AND status = 'running'""",
+            (job.id, worker_id),
+        )
+    db.commit()
+
+
+def fail_job(db: connection, job: Job, worker_id: str, error: Exception) -> None:
+    """Record a failed attempt: back to pending with backoff, or failed once attempts are used up."""
+    delay = retry_delay(job.attempts)
+    with db.cursor() as cur:
+        cur.execute(
+            """UPDATE jobs SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                      run_after = NOW() + make_interval(secs => %s), last_error = %s,
+                      leased_by = NULL, lease_expires_at = NULL, updated_at = NOW()
+               WHERE id = %s AND leased_by = %s AND status = 'running'""",
+            (JOB_MAX_ATTEMPTS, delay, str(error), job.id, worker_id),
+        )
+    db.commit()
+    if job.attempts >= JOB_MAX_ATTEMPTS:
+        logger.error("Job %s %s failed permanently after %d attempts: %s", job.kind, job.key, job.attempts, error)
+    else:
+        logger.warning("Job %s %s attempt %d failed, retrying in %.0fs: %s", job.kind, job.key, job.attempts, delay, error)
+
+
+def has_unfinished_jobs(db: connection) -> bool:
+    """True while any job is pending or running."""
+    with db.cursor() as cur:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM jobs WHERE status IN ('pending', 'running'))")
+        result = cur.fetchone()[0]
+    db.commit()
+    return result
+
+
+def job_counts(db: connection) -> dict[tuple[str, str], int]:
+    """Number of jobs per (kind, status)."""
+    with db.cursor() as cur:
+        cur.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status")
+        counts = {(kind, status): n for kind, status, n in cur.fetchall()}
+    db.commit()
+    return counts
@@ -0,0 +1,334 @@
+"""
+Queue worker: any number of these (processes or containers) pull jobs from the Postgres `jobs` table.
+
+Job kinds:
+  fetch    one report URL: download, parse and load its changed pages; incident reports enqueue geocode/weather/ranks
+  geocode  one address: Nominatim lookup into `location`, side of town for its incidents
+  weather  one grid cell and day: one Open-Meteo call, weather for every incident in that cell-day
+  ranks    location/incident frequency ranks and rolling features (re-armed after every load)
+  watermarks  move the enrichment stage watermarks past the work done (re-armed after every fetch, geocode and weather)
+
+Run from repo root:
+  python -m src.jobs.worker --seed            # scrape and enqueue new report URLs, then work
+  python -m src.jobs.worker --processes 4     # four local worker processes
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from typing import Callable, Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.config import JOB_POLL_INTERVAL
+from src.logging_config import setup_logging
+from src.db.changes import CHANGE_SIDE_OF_TOWN, CHANGE_WEATHER, log_changes, log_changes_from
+from src.db.connection import create_connection, terminate_connection
+from src.db.enrichment import (
+    STAGE_FEATURES, STAGE_GEOCODE, STAGE_ROLLUP, STAGE_SIDE_OF_TOWN, STAGE_WEATHER, advance_watermark, pending_window,
+    stage_lock,
+)
+from src.db.schema import (
+    create_incident_table, create_location_table, create_enrichment_tables, create_enrichment_state_table, create_job_tables,
+    create_rollup_table, create_feature_table, create_case_table, create_arrest_table, create_report_pages_table,
+)
+from src.db.incidents import update_ranks_incidents
+from src.db.location import UNGEOCODED_SEQ_SQL, store_geocode
+from src.db.events import notify_batch
+from src.db.features import refresh_features
+from src.db.report_pages import load_fingerprints, store_fingerprints
+from src.db.rollups import refresh_rollup_days
+from src.enrich.geography import PENDING_SIDE_OF_TOWN_SQL, compass_direction
+from src.enrich.weather import WEATHER_CELL_SQL, fetch_hourly_weather_codes
+from src.jobs.queue import Job, claim_job, complete_job, enqueue_jobs, fail_job, has_unfinished_jobs, job_counts
+from src.pdf.fetch_incidents import fetchincidents
+from src.pipeline.ingest import KIND_INCIDENT, REPORT_TYPES, report_kind
+from src.scrape.normanpd import scrape_normanpd_pdf_urls
+
+KIND_FETCH = "fetch"
+KIND_GEOCODE = "geocode"
+KIND_WEATHER = "weather"
+KIND_RANKS = "ranks"
+KIND_WATERMARKS = "watermarks"
+
+# Higher runs first, so loads finish before the enrichment they feed
+PRIORITIES = {KIND_FETCH: 30, KIND_GEOCODE: 20, KIND_WEATHER: 10, KIND_RANKS: 0, KIND_WATERMARKS: -10}
+
+# First change_seq in the (low, high] window of a geocoded incident without weather whose cell-day job has not run
+UNWEATHERED_SEQ_SQL = f"""SELECT MIN(incidents.change_seq) FROM incidents
+               JOIN location ON incidents.location = location.loc
+               WHERE incidents.change_seq > %s AND incidents.change_seq <= %s
+                 AND location.latitude IS NOT NULL AND location.longitude IS NOT NULL
+                 AND NOT EXISTS (SELECT 1 FROM incident_weather w WHERE w.incident_num = incidents.incident_num)
+                 AND NOT EXISTS (SELECT 1 FROM jobs WHERE jobs.kind = '{KIND_WEATHER}' AND jobs.status = 'done'
+                                   AND jobs.key = {WEATHER_CELL_SQL} || '|' || incidents.incident_ts::date)"""
+# First change_seq in the window of a geocoded incident whose location has no side of town yet
+UNSIDED_SEQ_SQL = f"SELECT MIN(first_seq) FROM ({PENDING_SIDE_OF_TOWN_SQL}) pending (loc, latitude, longitude, first_seq)"
+
+# Rows a stage's watermark must stay below while the queue still has work for them: each query returns the first
+# such change_seq in a (low, high] window (or NULL). Rollups have none: every job rebuilds the days it touched.
+UNFINISHED_SEQ_SQL = {
+    STAGE_GEOCODE: [UNGEOCODED_SEQ_SQL],
+    STAGE_WEATHER: [UNGEOCODED_SEQ_SQL, UNWEATHERED_SEQ_SQL],
+    STAGE_SIDE_OF_TOWN: [UNGEOCODED_SEQ_SQL, UNSIDED_SEQ_SQL],
+    STAGE_ROLLUP: [],
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _enqueue_followups(db: connection, addresses: Sequence[str]) -> set:
+    """Queue geocoding for uncached addresses; set side of town and queue weather for cached ones.
+
+    Returns the incident days whose side of town changed (their rollups need a rebuild).
+    """
+    with db.cursor() as cur:
+        cur.execute("SELECT loc, latitude, longitude FROM location WHERE loc = ANY(%s)", (list(addresses),))
+        cached = cur.fetchall()
+    cached_locs = {loc for loc, _, _ in cached}
+    enqueue_jobs(db, KIND_GEOCODE, [a for a in addresses if a not in cached_locs], PRIORITIES[KIND_GEOCODE])
+
+    located = [(loc, lat, lon) for loc, lat, lon in cached if lat is not None and lon is not None]
+    touched_days = set()
+    if not located:
+        return touched_days
+    with db.cursor() as cur:
+        for loc, latitude, longitude in located:
+            cur.execute(
+                "UPDATE location SET side_of_town = %s WHERE loc = %s AND side_of_town IS NULL",
+                (compass_direction(latitude, longitude), loc),
+            )
+            if cur.rowcount:
+                cur.execute("SELECT DISTINCT incident_ts::date FROM incidents WHERE location = %s", (loc,))
+                touched_days.update(row[0] for row in cur.fetchall())
+                log_changes_from(cur, CHANGE_SIDE_OF_TOWN, "SELECT incident_num FROM incidents WHERE location = %s", (loc,))
+        cur.execute(
+            f"""SELECT DISTINCT {WEATHER_CELL_SQL} || '|' || incidents.incident_ts::date
+                FROM incidents JOIN location ON incidents.location = location.loc
+                WHERE incidents.location = ANY(%s)
+                  AND NOT EXISTS (SELECT 1 FROM incident_weather w WHERE w.incident_num = incidents.incident_num)""",
+            ([loc for loc, _, _ in located],),
+        )
+        cell_days = [row[0] for row in cur.fetchall()]
+    enqueue_jobs(db, KIND_WEATHER, cell_days, PRIORITIES[KIND_WEATHER], rearm=True)
+    return touched_days
+
+
+def _enqueue_incident_followups(db: connection, incidents) -> None:
+    """Queue the enrichment of a loaded incident report, rebuild its days' rollups and queue a ranks run."""
+    addresses = sorted({loc for page in incidents[2] for loc in page})
+    touched_days = _enqueue_followups(db, addresses)
+    with db.cursor() as cur:
+        cur.execute(
+            "SELECT DISTINCT incident_ts::date FROM incidents WHERE incident_num = ANY(%s)",
+            ([num for page in incidents[1] for num in page],),
+        )
+        touched_days.update(row[0] for row in cur.fetchall())
+    refresh_rollup_days(db, touched_days)
+    enqueue_jobs(db, KIND_RANKS, ["all"], PRIORITIES[KIND_RANKS], rearm=True)
+    enqueue_jobs(db, KIND_WATERMARKS, ["all"], PRIORITIES[KIND_WATERMARKS], rearm=True)
+    if touched_days:
+        notify_batch(db, KIND_FETCH)
+    db.commit()
+
+
+def handle_fetch(db: connection, job: Job) -> None:
+    """Download, parse and load the changed pages of one report; incident reports also queue their enrichment.
+
+    Follow-ups are queued for every row parsed, whether or not the load wrote it, and the page fingerprints are
+    stored last: a job retried after a failure parses the whole report again and re-queues all of its work.
+    """
+    kind = report_kind(job.key)
+    report_type = REPORT_TYPES[kind]
+    stored = load_fingerprints(db, [job.key]).get(job.key)
+    fingerprints, parsed = report_type.parse_pages(str(fetchincidents(job.key)), stored or ())
+    if fingerprints == stored:
+        logger.info("Report %s (%s): %d pages unchanged, skipped", job.key, kind, len(fingerprints))
+        return
+    loaded = (report_type.reload if stored else report_type.load)(db, parsed)
+    if kind == KIND_INCIDENT and report_type.rows(parsed):
+        _enqueue_incident_followups(db, parsed)
+    store_fingerprints(db, job.key, fingerprints)
+    logger.info("Report %s (%s): extracted %d, loaded %d", job.key, kind, report_type.rows(parsed), loaded)
+
+
+def handle_geocode(db: connection, job: Job) -> None:
+    """Geocode one address, then fill in its incidents' side of town and queue their weather."""
+    if store_geocode(job.key, db):
+        refresh_rollup_days(db, _enqueue_followups(db, [job.key]))
+        enqueue_jobs(db, KIND_WATERMARKS, ["all"], PRIORITIES[KIND_WATERMARKS], rearm=True)
+        notify_batch(db, KIND_GEOCODE)
+    db.commit()
+
+
+def handle_weather(db: connection, job: Job) -> None:
+    """Fetch one day of hourly weather for a grid cell and apply it to every incident in that cell-day."""
+    cell, day = job.key.split("|")
+    latitude, longitude = (float(v) for v in cell.split(","))
+    codes = fetch_hourly_weather_codes(latitude, longitude, day)
+    with db.cursor() as cur:
+        cur.execute(
+            f"""INSERT INTO incident_weather (incident_num, weather)
+                SELECT incident_num, weather FROM (
+                    SELECT incidents.incident_num, (%s::int[])[EXTRACT(HOUR FROM incidents.incident_ts)::int + 1] AS weather
+                    FROM incidents JOIN location ON incidents.location = location.loc
+                    WHERE {WEATHER_CELL_SQL} = %s
+                      AND incidents.incident_ts >= %s::date AND incidents.incident_ts < %s::date + 1
+                ) hourly
+                WHERE weather IS NOT NULL
+                ON CONFLICT (incident_num) DO NOTHING
+                RETURNING incident_num""",
+            (codes, cell, day, day),
+        )
+        weathered = [num for num, in cur.fetchall()]
+        log_changes(cur, CHANGE_WEATHER, weathered)
+        updated = len(weathered)
+    if updated:
+        refresh_rollup_days(db, [day])
+        notify_batch(db, KIND_WEATHER)
+    enqueue_jobs(db, KIND_WATERMARKS, ["all"], PRIORITIES[KIND_WATERMARKS], rearm=True)
+    db.commit()
+    logger.debug("Weather for cell %s on %s applied to %d incidents", cell, day, updated)
+
+
+def advance_stage_watermarks(db: connection) -> dict[str, int]:
+    """Move the geocode, weather, side of town and rollup watermarks past the rows the queue has finished.
+
+    A later batch run then picks up only what the jobs left: each stage stops below its first row with work
+    outstanding (see UNFINISHED_SEQ_SQL). Returns the watermark recorded per stage.
+    """
+    watermarks = {}
+    for stage, queries in UNFINISHED_SEQ_SQL.items():
+        low, high = pending_window(db, stage)
+        watermark = high
+        with db.cursor() as cur:
+            for sql in queries:
+                cur.execute(sql, (low, high))
+                first_seq = cur.fetchone()[0]
+                if first_seq is not None:
+                    watermark = min(watermark, first_seq - 1)
+        if watermark > low:
+            advance_watermark(db, stage, watermark)
+        watermarks[stage] = watermark
+    db.commit()
+    return watermarks
+
+
+def handle_ranks(db: connection, job: Job) -> None:
+    """Recompute location and incident frequency ranks, and the rolling features of incidents loaded since."""
+    update_ranks_incidents(db)
+    # Fetch jobs keep loading meanwhile: one worker at a time moves the features watermark, in one transaction
+    with stage_lock(db, STAGE_FEATURES):
+        refresh_features(db, checkpoint_every=None)
+
+
+def handle_watermarks(db: connection, job: Job) -> None:
+    """Record the enrichment the jobs finished, so the next batch run does not redo it."""
+    advance_stage_watermarks(db)
+
+
+HANDLERS: dict[str, Callable[[connection, Job], None]] = {
+    KIND_FETCH: handle_fetch,
+    KIND_GEOCODE: handle_geocode,
+    KIND_WEATHER: handle_weather,
+    KIND_RANKS: handle_ranks,
+    KIND_WATERMARKS: handle_watermarks,
+}
+
+
+def ensure_schema(db: connection) -> None:
+    """Create every table the worker touches."""
+    create_incident_table(db)
+    create_location_table(db)
+    create_enrichment_tables(db)
+    create_enrichment_state_table(db)
+    create_job_tables(db)
+    create_rollup_table(db)
+    create_feature_table(db)
+    create_case_table(db)
+    create_arrest_table(db)
+    create_report_pages_table(db)
+
+
+def seed_jobs(db: connection) -> int:
+    """Scrape the reports page and enqueue a fetch job per new incident, case and arrest report URL."""
+    incident_urls, case_urls, arrest_urls = scrape_normanpd_pdf_urls(db)
+    urls = sorted(incident_urls) + sorted(case_urls) + sorted(arrest_urls)
+    added = enqueue_jobs(db, KIND_FETCH, urls, PRIORITIES[KIND_FETCH])
+    db.commit()
+    logger.info("Seeded %d fetch jobs (%d report URLs scraped)", added, len(urls))
+    return added
+
+
+def run_worker(kinds: Optional[Sequence[str]] = None, exit_when_idle: bool = False, poll_interval: float = JOB_POLL_INTERVAL) -> int:
+    """Claim and run jobs until stopped (or until the queue drains); return the number of jobs run."""
+    setup_logging()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    kinds = list(kinds or HANDLERS)
+    processed = 0
+
+    conn = create_connection()
+    try:
+        logger.info("Worker %s started (kinds: %s)", worker_id, ", ".join(kinds))
+        while True:
+            job = claim_job(conn, worker_id, kinds)
+            if job is None:
+                if exit_when_idle and not has_unfinished_jobs(conn):
+                    break
+                time.sleep(poll_interval)
+                continue
+            try:
+                HANDLERS[job.kind](conn, job)
+            except Exception as e:
+                conn.rollback()
+                fail_job(conn, job, worker_id, e)
+                continue
+            complete_job(conn, job, worker_id)
+            processed += 1
+        logger.info("Worker %s finished: %d jobs", worker_id, processed)
+    finally:
+        terminate_connection(conn)
+    return processed
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Norman PD pipeline queue worker")
+    parser.add_argument("--seed", action="store_true", help="scrape the reports page and enqueue fetch jobs first")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(HANDLERS), help="only run these job kinds")
+    parser.add_argument("--processes", type=int, default=1, help="number of local worker processes")
+    parser.add_argument("--exit-when-idle", action="store_true", help="stop once no job is pending or running")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        ensure_schema(conn)
+        if args.seed:
+            seed_jobs(conn)
+    finally:
+        terminate_connection(conn)
+
+    if args.processes <= 1:
+        run_worker(args.kinds, args.exit_when_idle)
+    else:
+        procs = [
+            multiprocessing.Process(target=run_worker, args=(args.kinds, args.exit_when_idle))
+            for _ in range(args.processes)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+
+    conn = create_connection()
+    try:
+        for (kind, status), n in sorted(job_counts(conn).items()):
+            logger.info("Jobs %s/%s: %d", kind, status, n)
+    finally:
+        terminate_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,144 @@
+import atexit
+import copy
+import json
 import logging
+import multiprocessing.util
 import os
-from logging.handlers import RotatingFileHandler
-from typing import Any
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Optional
+
+# Attributes every LogRecord has; anything else came in through `extra=` and goes into JSON output as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "suppressed"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class RateLimitFilter(logging.Filter):
+    """Pass at most `limit` records per call site (logger, level, message template) every `window` seconds.
+
+    WARNING and above always pass. The first record let through after a suppressed stretch carries the
+    number of dropped records as `record.suppressed`.
+    """
+
+    def __init__(self, limit: int, window: float, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self._sites: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = self.clock()
+        with self._lock:
+            # [window start, passed in window, suppressed since last passed record]
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                site = self._sites[key] = [now, 0, site[2] if site else 0]
+            if site[1] >= self.limit:
+                site[2] += 1
+                return False
+            site[1] += 1
+            if site[2]:
+                record.suppressed, site[2] = site[2], 0
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """The plain-text line format, noting how many similar records the rate limit dropped."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} [{suppressed} similar suppressed]" if suppressed else line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, pid, thread, message, `extra=` fields, exception text."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.process,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class _EnqueueHandler(QueueHandler):
+    """QueueHandler that only merges the message args before enqueueing; formatting is left to the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Args may be mutated after the call returns, and tracebacks cannot cross the queue, so render both now
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _start_listener(handlers: list[logging.Handler]) -> None:
+    """Start a listener thread that feeds `handlers` from a fresh queue behind the root QueueHandler."""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener._thread.name = "log-listener"
+
+
+def _restart_in_child() -> None:
+    """A forked process (replay pool, queue workers) has the parent's queue but no listener thread."""
+    if _listener is None:
+        return
+    _start_listener(list(_listener.handlers))
+    # multiprocessing children leave through os._exit, which skips atexit
+    multiprocessing.util.Finalize(None, stop_logging, exitpriority=100)
+
+
+def stop_logging() -> None:
+    """Drain the log queue and stop the listener thread (registered at exit)."""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+
 
 def setup_logging() -> None:
-    """Configure logging once for the whole process (file + console)."""
+    """Configure logging once for the whole process (file + console behind a queue)."""
+    global _queue_handler
     if getattr(logging, "_pipeline_logging_configured", False):
         return
 
     log_level = getattr(logging, os.environ.get("LOG_LEVEL", "INFO").upper(), logging.INFO)
     log_file = os.environ.get("LOG_FILE", "app.log")
+    log_format = os.environ.get("LOG_FORMAT", "text").lower()
+    rate_limit = int(os.environ.get("LOG_RATE_LIMIT", "20"))
+    rate_window = float(os.environ.get("LOG_RATE_WINDOW", "60"))
 
     root = logging.getLogger()
     root.setLevel(log_level)
@@ -18,19 +147,28 @@ def setup_logging() -> None:
     for h in list(root.handlers):
         root.removeHandler(h)
 
-    formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+    if log_format == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter(
+            "%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
 
     fh = RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8")
     fh.setLevel(log_level)
     fh.setFormatter(formatter)
-    root.addHandler(fh)
 
     ch = logging.StreamHandler()
     ch.setLevel(log_level)
     ch.setFormatter(formatter)
-    root.addHandler(ch)
 
-    setattr(logging, "_pipeline_logging_configured", True)
\ No newline at end of file
+    # Callers only filter and enqueue; formatting and file/console I/O happen on the listener thread
+    _queue_handler = _EnqueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(RateLimitFilter(rate_limit, rate_window))
+    root.addHandler(_queue_handler)
+    _start_listener([fh, ch])
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=_restart_in_child)
+
+    setattr(logging, "_pipeline_logging_configured", True)
@@ -0,0 +1,140 @@
+"""
+Content-addressed on-disk archive of fetched report PDFs.
+
+Layout under PDF_ARCHIVE_DIR:
+  objects/<aa>/<sha256>.pdf   report bytes, named by their SHA-256
+  refs/<sha256 of url>.json   {"url", "sha256", "size", "etag", "last_modified", "fetched_at"}
+  tmp/                        downloads in progress (renamed into objects/ once complete)
+
+Downloads stream to disk chunk by chunk while hashing, so a report is never held in memory, and a
+URL that is already archived is served from disk without touching the network.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+from src.config import PDF_ARCHIVE_DIR
+from src.http_client import STREAM_CHUNK_SIZE, get_session
+
+logger = logging.getLogger(__name__)
+
+
+def _archive_dir(archive_dir: Optional[os.PathLike] = None) -> Path:
+    return Path(archive_dir or PDF_ARCHIVE_DIR)
+
+
+def object_path(sha256: str, archive_dir: Optional[os.PathLike] = None) -> Path:
+    """Path of the archived object with the given content hash."""
+    return _archive_dir(archive_dir) / "objects" / sha256[:2] / f"{sha256}.pdf"
+
+
+def _ref_path(url: str, archive_dir: Optional[os.PathLike] = None) -> Path:
+    return _archive_dir(archive_dir) / "refs" / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+
+def read_ref(url: str, archive_dir: Optional[os.PathLike] = None) -> Optional[dict]:
+    """The archive record for a URL, or None if it was never fetched (or its object is missing)."""
+    try:
+        ref = json.loads(_ref_path(url, archive_dir).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if not object_path(ref["sha256"], archive_dir).exists():
+        return None
+    return ref
+
+
+def archived_urls(archive_dir: Optional[os.PathLike] = None) -> dict[str, str]:
+    """Map of object SHA-256 to the URL it was fetched from (the last one read, if several URLs share content)."""
+    urls = {}
+    for path in (_archive_dir(archive_dir) / "refs").glob("*.json"):
+        try:
+            ref = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+        urls[ref["sha256"]] = ref["url"]
+    return urls
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def archive_report(
+    url: str,
+    refresh: bool = False,
+    archive_dir: Optional[os.PathLike] = None,
+    session: Optional[requests.Session] = None,
+) -> Path:
+    """Return the local path of a report, downloading it into the archive only if needed.
+
+    With refresh=True an archived URL is re-checked with a conditional GET (If-None-Match /
+    If-Modified-Since); a 304 keeps the archived copy, anything else is stored as a new object.
+    """
+    root = _archive_dir(archive_dir)
+    ref = read_ref(url, root)
+    if ref and not refresh:
+        logger.debug("Archive hit for %s (%s)", url, ref["sha256"])
+        return object_path(ref["sha256"], root)
+
+    headers = {}
+    if ref:
+        if ref.get("etag"):
+            headers["If-None-Match"] = ref["etag"]
+        if ref.get("last_modified"):
+            headers["If-Modified-Since"] = ref["last_modified"]
+
+    session = session or get_session()
+    tmp_dir = root / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    with session.get(url, stream=True, headers=headers) as response:
+        if response.status_code == 304 and ref:
+            logger.debug("Report %s not modified", url)
+            return object_path(ref["sha256"], root)
+        response.raise_for_status()
+
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=".part", delete=False) as tmp:
+            try:
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    tmp.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+    sha256 = digest.hexdigest()
+    path = object_path(sha256, root)
+    if path.exists():
+        os.unlink(tmp.name)  # identical content already archived (e.g. same report under another URL)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp.name, path)
+
+    record = {
+        "url": url,
+        "sha256": sha256,
+        "size": size,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+    }
+    _write_atomic(_ref_path(url, root), json.dumps(record).encode())
+    if ref and ref["sha256"] != sha256:
+        logger.info("Report %s changed: %s -> %s", url, ref["sha256"], sha256)
+    logger.debug("Archived %s as %s (%d bytes)", url, sha256, size)
+    return path
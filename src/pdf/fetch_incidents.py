@@ -1,17 +1,16 @@
-import io
-from urllib.request import urlopen
 import logging
+from pathlib import Path
+
+from src.pdf.archive import archive_report
 
 logger = logging.getLogger(__name__)
 
-def fetchincidents(url: str) -> io.BytesIO:
-    
+def fetchincidents(url: str, refresh: bool = False) -> Path:
+    """Return the archived incident PDF for a URL, streaming it to the on-disk archive on first fetch."""
     try:
-        response = urlopen(url).read()
+        path = archive_report(url, refresh=refresh)
     except Exception as e:
         logger.exception("Error fetching incidents from %s: %s", url, e)
         raise Exception(f"Error fetching incidents from {url}: {e}")
 
-    response = io.BytesIO(response) # In-Memory Binary Stream, can be read like a file
-
-    return response
\ No newline at end of file
+    return path
@@ -0,0 +1,32 @@
+import io
+import logging
+import os
+from typing import List, Sequence, Tuple, Union
+
+from src.pdf.tables import extract_rows
+
+logger = logging.getLogger(__name__)
+
+# Daily Arrest Summary columns, left to right
+ARREST_COLUMNS = (
+    "arrest_ts", "case_num", "location", "offense", "arrestee",
+    "arrestee_birthday", "arrestee_address", "status", "officer",
+)
+# The arrestee address wraps (street, then city/state/zip); birthday and address can be blank
+ARREST_WRAP_COLUMN = 6
+ARREST_OPTIONAL_COLUMNS = (6, 5)
+ARREST_WRAP_JOINER = " "
+
+
+def extract_arrests(arrest_data: Union[str, os.PathLike, io.BytesIO, bytes]) -> List[List[str]]:
+    """Extract arrest rows (ARREST_COLUMNS order) from a Daily Arrest Summary PDF."""
+    return extract_arrest_pages(arrest_data)[1]
+
+
+def extract_arrest_pages(arrest_data: Union[str, os.PathLike, io.BytesIO, bytes], known: Sequence[str] = ()) -> Tuple[List[str], List[List[str]]]:
+    """Fingerprint every page and extract arrest rows from the pages not matching `known`; return (fingerprints, rows)."""
+    fingerprints, rows = extract_rows(
+        arrest_data, len(ARREST_COLUMNS), ARREST_WRAP_COLUMN, ARREST_OPTIONAL_COLUMNS, ARREST_WRAP_JOINER, known
+    )
+    logger.debug("Extracted %d arrest rows", len(rows))
+    return fingerprints, rows
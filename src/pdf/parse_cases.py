@@ -0,0 +1,26 @@
+import io
+import logging
+import os
+from typing import List, Sequence, Tuple, Union
+
+from src.pdf.tables import extract_rows
+
+logger = logging.getLogger(__name__)
+
+# Daily Case Summary columns, left to right
+CASE_COLUMNS = ("case_ts", "case_num", "location", "offense")
+# A long location wraps; a case reported without an offense has no offense line
+CASE_WRAP_COLUMN = 2
+CASE_OPTIONAL_COLUMNS = (3,)
+
+
+def extract_cases(case_data: Union[str, os.PathLike, io.BytesIO, bytes]) -> List[List[str]]:
+    """Extract case rows [date/time, case number, location, offense] from a Daily Case Summary PDF."""
+    return extract_case_pages(case_data)[1]
+
+
+def extract_case_pages(case_data: Union[str, os.PathLike, io.BytesIO, bytes], known: Sequence[str] = ()) -> Tuple[List[str], List[List[str]]]:
+    """Fingerprint every page and extract case rows from the pages not matching `known`; return (fingerprints, rows)."""
+    fingerprints, rows = extract_rows(case_data, len(CASE_COLUMNS), CASE_WRAP_COLUMN, CASE_OPTIONAL_COLUMNS, known=known)
+    logger.debug("Extracted %d case rows", len(rows))
+    return fingerprints, rows
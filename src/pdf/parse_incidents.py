@@ -1,11 +1,17 @@
+import hashlib
 import io
+import os
 import fitz
 import logging
 from datetime import datetime
-from typing import List, Tuple
+from typing import List, Sequence, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever extract_incidents output changes; stored per row so corrected parses can be replayed
+PARSER_VERSION = 1
+
+
 def get_day_of_week(date_string: str) -> int:
 
     # Convert the date string to a datetime object
@@ -20,9 +26,43 @@ def get_day_of_week(date_string: str) -> int:
     return day_of_week_number
 
 
-def extract_incidents(incident_data: io.BytesIO) -> Tuple[List[List[str]], List[List[str]], List[List[str]], List[List[str]], List[List[str]]]:
-    """Extract incidents from a PDF file."""
-    doc = fitz.open(stream = incident_data, filetype="pdf") # Using PyMuPDF/ Fitz module for PDF data extraction
+def open_pdf(incident_data: Union[str, os.PathLike, io.BytesIO, bytes]) -> fitz.Document:
+    """Open a PDF from a file path (read lazily by MuPDF, not loaded into Python memory) or from bytes."""
+    if isinstance(incident_data, (str, os.PathLike)):
+        return fitz.open(os.fspath(incident_data), filetype="pdf")
+    return fitz.open(stream = incident_data, filetype="pdf")
+
+
+def page_fingerprint(blocks: Sequence[tuple]) -> str:
+    """SHA-256 of a page's extracted text (its text blocks, in order)."""
+    digest = hashlib.sha256()
+    for block in blocks:
+        digest.update(block[4].encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def changed_pages(doc: fitz.Document, known: Sequence[str] = ()) -> Tuple[List[str], List[Tuple[int, list]]]:
+    """Fingerprint every page of `doc`; return (fingerprints, [(page_number, text blocks)] of the pages
+    whose fingerprint differs from `known[page_number]` (all pages when `known` is empty)."""
+    fingerprints: List[str] = []
+    pages: List[Tuple[int, list]] = []
+    for page_number in range(len(doc)):
+        blocks = doc[page_number].get_text("blocks")
+        fingerprints.append(page_fingerprint(blocks))
+        if page_number >= len(known) or known[page_number] != fingerprints[-1]:
+            pages.append((page_number, blocks))
+    return fingerprints, pages
+
+
+def extract_incidents(incident_data: Union[str, os.PathLike, io.BytesIO, bytes]) -> Tuple[List[List[str]], List[List[str]], List[List[str]], List[List[str]], List[List[str]]]:
+    """Extract incidents from a PDF file (archived path or in-memory bytes)."""
+    return extract_incident_pages(incident_data)[1]
+
+
+def extract_incident_pages(incident_data: Union[str, os.PathLike, io.BytesIO, bytes], known: Sequence[str] = ()) -> Tuple[List[str], Tuple[List[List[str]], List[List[str]], List[List[str]], List[List[str]], List[List[str]]]]:
+    """Fingerprint every page and extract incidents from the pages not matching `known`; return (fingerprints, incidents)."""
+    doc = open_pdf(incident_data) # Using PyMuPDF/ Fitz module for PDF data extraction
 
     dttime: List[List[str]] = []
     inc_no: List[List[str]] = []
@@ -30,12 +70,10 @@ def extract_incidents(incident_data: io.BytesIO) -> Tuple[List[List[str]], List[
     nature: List[List[str]] = []
     inc_ori: List[List[str]] = []
 
-    for page_number in range(len(doc)):
+    fingerprints, pages = changed_pages(doc, known)
+    for page_number, text in pages:
 
         ls: List[List[str]] = []
-        
-        x = doc[page_number]
-        text = x.get_text("blocks")
 
         if page_number == 0: # Removing extraneous info from first page
             text.pop(0)
@@ -62,4 +100,4 @@ def extract_incidents(incident_data: io.BytesIO) -> Tuple[List[List[str]], List[
         nature.append([sublist[3] for sublist in ls])
         inc_ori.append([sublist[4] for sublist in ls])
 
-    return dttime, inc_no, loc, nature, inc_ori
\ No newline at end of file
+    return fingerprints, (dttime, inc_no, loc, nature, inc_ori)
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Row extraction shared by the case and arrest summary parsers.
+
+Norman PD summaries are laid out like the incident summary: PyMuPDF returns one text block per table
+row with one line per cell. Title, column header and footer blocks do not start with a report
+timestamp and are skipped. A blank cell has no line and a long value wraps onto extra lines, so each
+report type names the cells that may be blank and the cell that may wrap.
+"""
+import io
+import os
+import re
+from typing import List, Sequence, Tuple, Union
+
+from src.pdf.parse_incidents import changed_pages, open_pdf
+
+# First line of every table row, e.g. "1/2/2026 0:03"
+ROW_START = re.compile(r"^\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}$")
+
+
+def split_row(
+    lines: Sequence[str], n_columns: int, wrap_column: int, optional_columns: Sequence[int] = (), joiner: str = ""
+) -> List[str]:
+    """Fit one row block's lines to n_columns cells.
+
+    Extra lines are joined into `wrap_column` with `joiner` (locations use "", as extract_incidents
+    joins a wrapped location, so they compare equal across report types); missing lines become blank
+    cells at `optional_columns`, in that order, then at the end.
+    """
+    cells = list(lines)
+    extra = len(cells) - n_columns
+    if extra > 0:
+        cells[wrap_column:wrap_column + extra + 1] = [joiner.join(cells[wrap_column:wrap_column + extra + 1])]
+    for column in optional_columns:
+        if len(cells) >= n_columns:
+            break
+        cells.insert(column, "")
+    cells.extend([""] * (n_columns - len(cells)))
+    return [cell.strip() for cell in cells]
+
+
+def extract_rows(
+    report: Union[str, os.PathLike, io.BytesIO, bytes],
+    n_columns: int,
+    wrap_column: int,
+    optional_columns: Sequence[int] = (),
+    joiner: str = "",
+    known: Sequence[str] = (),
+) -> Tuple[List[str], List[List[str]]]:
+    """Fingerprint every page; return (fingerprints, table rows of the pages not matching `known`, each
+    fitted to n_columns cells)."""
+    doc = open_pdf(report)
+    rows: List[List[str]] = []
+    try:
+        fingerprints, pages = changed_pages(doc, known)
+        for _, blocks in pages:
+            for block in blocks:
+                lines = [line for line in block[4].split("\n") if line.strip()]
+                if lines and ROW_START.match(lines[0].strip()):
+                    rows.append(split_row(lines, n_columns, wrap_column, optional_columns, joiner))
+    finally:
+        doc.close()
+    return fingerprints, rows
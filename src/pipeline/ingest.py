@@ -0,0 +1,136 @@
+"""
+Report ingest: fetch, parse and load incident, case and arrest summaries in one pass.
+
+Downloads run on a thread pool sharing the keep-alive HTTP session (one connection pool to
+www.normanok.gov); each finished download is handed to a parser process, since PyMuPDF is
+CPU-bound and not thread-safe. The parent loads parsed reports in the order given, one commit
+per report, with the loader of its report type.
+
+Every page's extracted text is fingerprinted (src.db.report_pages). A report loaded before is parsed
+and loaded only for the pages whose fingerprint changed, through its type's change-detecting loader,
+so a republished correction costs its changed pages rather than the whole report.
+"""
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, NamedTuple, Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.config import INGEST_FETCH_WORKERS, INGEST_PARSE_WORKERS
+from src.db.arrests import populate_arrests
+from src.db.cases import populate_cases
+from src.db.incidents import populate_incidents, upsert_incidents
+from src.db.report_pages import load_fingerprints, store_fingerprints
+from src.pdf.fetch_incidents import fetchincidents
+from src.pdf.parse_arrests import extract_arrest_pages, extract_arrests
+from src.pdf.parse_cases import extract_case_pages, extract_cases
+from src.pdf.parse_incidents import extract_incident_pages, extract_incidents
+
+KIND_INCIDENT = "incident"
+KIND_CASE = "case"
+KIND_ARREST = "arrest"
+
+_KIND_IN_NAME = re.compile(r"_daily_(incident|case|arrest)_summary\.pdf$")
+
+logger = logging.getLogger(__name__)
+
+
+class ReportType(NamedTuple):
+    """How one kind of report is parsed, counted and loaded.
+
+    parse_pages(path, known fingerprints) -> (page fingerprints, parsed rows of the changed pages);
+    load writes a first-time report, reload the changed pages of one loaded before (rows written).
+    """
+
+    parse: Callable[[str], Any]
+    parse_pages: Callable[[str, Sequence[str]], tuple[list[str], Any]]
+    rows: Callable[[Any], int]
+    load: Callable[[connection, Any], int]
+    reload: Callable[[connection, Any], int]
+
+
+def _reload_incidents(db: connection, incidents: Any) -> int:
+    """Upsert the incidents of changed pages, so corrections overwrite the stored rows."""
+    counts = upsert_incidents(db, incidents)
+    return counts["new"] + counts["updated"]
+
+
+REPORT_TYPES: dict[str, ReportType] = {
+    KIND_INCIDENT: ReportType(
+        extract_incidents, extract_incident_pages, lambda parsed: sum(len(page) for page in parsed[0]),
+        populate_incidents, _reload_incidents,
+    ),
+    KIND_CASE: ReportType(extract_cases, extract_case_pages, len, populate_cases, populate_cases),
+    KIND_ARREST: ReportType(extract_arrests, extract_arrest_pages, len, populate_arrests, populate_arrests),
+}
+
+
+def report_kind(url_or_name: str) -> str:
+    """Report type from a Norman PD URL or file name (…_daily_<kind>_summary.pdf); anything else is an incident report."""
+    match = _KIND_IN_NAME.search(url_or_name)
+    return match.group(1) if match else KIND_INCIDENT
+
+
+def parse_report(kind: str, path: str, known: Sequence[str] = ()) -> tuple[Optional[list[str]], Any, Optional[str]]:
+    """Parse the pages of one archived report not matching `known` in a worker process; return (fingerprints, parsed, error)."""
+    try:
+        return (*REPORT_TYPES[kind].parse_pages(path, known), None)
+    except Exception as e:
+        return None, None, str(e)
+
+
+def ingest_reports(
+    db: connection,
+    urls: Sequence[str],
+    fetch_workers: int = INGEST_FETCH_WORKERS,
+    parse_workers: Optional[int] = INGEST_PARSE_WORKERS or None,
+    refresh: bool = False,
+    on_loaded: Optional[Callable[[str], None]] = None,
+) -> dict[str, dict[str, int]]:
+    """Fetch, parse and load every report URL; return report / page / row counts per report type.
+
+    With refresh=True archived URLs are re-checked with a conditional GET (see archive_report), and
+    reports are always loaded with their type's change-detecting loader.
+    on_loaded(url) is called after each report's rows and fingerprints are committed (or found unchanged).
+    """
+    totals = {kind: {"reports": 0, "pages": 0, "changed_pages": 0, "extracted": 0, "loaded": 0} for kind in REPORT_TYPES}
+    if not urls:
+        return totals
+    kinds = [report_kind(url) for url in urls]
+    known = load_fingerprints(db, urls)
+    with ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch") as fetchers, \
+            ProcessPoolExecutor(max_workers=parse_workers or min(len(urls), os.cpu_count() or 1)) as parsers:
+        fetching = {fetchers.submit(fetchincidents, url, refresh): i for i, url in enumerate(urls)}
+        parsing = [None] * len(urls)
+        # Parse each report as soon as its download lands, then load in the given order
+        for future in as_completed(fetching):
+            i = fetching[future]
+            parsing[i] = parsers.submit(parse_report, kinds[i], str(future.result()), known.get(urls[i], ()))
+        for url, kind, future in zip(urls, kinds, parsing):
+            fingerprints, parsed, error = future.result()
+            if error is not None:
+                logger.error("Error parsing %s report %s: %s", kind, url, error)
+                raise Exception(f"Error parsing {kind} report {url}: {error}")
+            report_type = REPORT_TYPES[kind]
+            stored = known.get(url)
+            changed = sum(1 for page, fp in enumerate(fingerprints) if not stored or page >= len(stored) or stored[page] != fp)
+            totals[kind]["reports"] += 1
+            totals[kind]["pages"] += len(fingerprints)
+            totals[kind]["changed_pages"] += changed
+            if fingerprints == stored:
+                logger.info("URL %s (%s): %d pages unchanged, skipped", url, kind, len(fingerprints))
+                if on_loaded is not None:
+                    on_loaded(url)
+                continue
+            extracted = report_type.rows(parsed)
+            loaded = (report_type.reload if stored or refresh else report_type.load)(db, parsed)
+            store_fingerprints(db, url, fingerprints)
+            totals[kind]["extracted"] += extracted
+            totals[kind]["loaded"] += loaded
+            logger.info("URL %s (%s): %d of %d pages changed, extracted %d, loaded %d",
+                        url, kind, changed, len(fingerprints), extracted, loaded)
+            if on_loaded is not None:
+                on_loaded(url)
+    return totals
@@ -1,16 +1,26 @@
+import argparse
 import logging
-from typing import Sequence
+from contextlib import nullcontext
+from typing import Optional, Sequence
 
 from src.logging_config import setup_logging
+from src.profiling import NULL_PROFILER, create_profiler
 from src.scrape.normanpd import scrape_normanpd_pdf_urls
-from src.pdf.fetch_incidents import fetchincidents
-from src.pdf.parse_incidents import extract_incidents
+from src.pipeline.ingest import KIND_INCIDENT, ingest_reports
+from src.pipeline.manifest import RunManifest
 from src.db.connection import create_connection, terminate_connection
-from src.db.schema import create_incident_table, create_location_table
-from src.db.incidents import populate_incidents, update_ranks_incidents
+from src.db.schema import (
+    create_incident_table, create_location_table, create_enrichment_tables, create_enrichment_state_table, create_rollup_table,
+    create_feature_table, create_case_table, create_arrest_table, create_report_pages_table, create_pipeline_run_tables,
+)
+from src.db.incidents import update_ranks_incidents
 from src.db.location import get_location
 from src.enrich.weather import get_weather
 from src.enrich.geography import side_of_town
+from src.enrich.beats import assign_beats
+from src.db.rollups import refresh_rollups
+from src.db.features import refresh_features
+from src.db.enrichment import STAGE_FEATURES, stage_lock
 
 
 logger = logging.getLogger(__name__)
@@ -21,7 +31,7 @@ def _output_incidents(db) -> None:
     cur = db.cursor()
     res = cur.execute(
         "SELECT day_of_week, time_of_day, weather, location, location_rank, "
-        "side_of_town, incident_rank, nature, emsstat FROM incidents;"
+        "side_of_town, incident_rank, nature, emsstat FROM incidents_enriched;"
     )
 
     print(
@@ -45,14 +55,91 @@ def _output_incidents(db) -> None:
         )
 
 
-def run() -> None:
+def _refresh_features(conn) -> None:
+    """Refresh the rolling features as the only features writer (queue workers may be refreshing them too)."""
+    with stage_lock(conn, STAGE_FEATURES):
+        refresh_features(conn)
+
+
+def post_process(conn, profiler=NULL_PROFILER, manifest: Optional[RunManifest] = None) -> None:
+    """Run the incremental post-processing stages (ranks, geocode, weather, side of town, beats, rollups, features).
+
+    With a run manifest each stage is recorded, and the stages it already records as completed are skipped.
+    """
+    stages = [
+        ("ranks", "Updating location and incident ranks", update_ranks_incidents),
+        ("geocode", "Geocoding incident locations", get_location),
+        ("weather", "Fetching weather for incident locations", get_weather),
+        ("side_of_town", "Computing side of town", side_of_town),
+        ("beats", "Assigning locations to beats", assign_beats),
+        ("rollups", "Refreshing dashboard rollups", refresh_rollups),
+        ("features", "Refreshing rolling-window incident features", _refresh_features),
+    ]
+    for name, message, step in stages:
+        if manifest is not None and manifest.is_completed(name):
+            logger.info("Stage %s already completed in run %d, skipped", name, manifest.run_id)
+            continue
+        logger.info(message)
+        with manifest.stage(name) if manifest is not None else nullcontext(), profiler.stage(name):
+            step(conn)
+
+    # Enrichment health: log NULL counts
+    with conn.cursor() as cur:
+        for col in ("weather", "location_rank", "side_of_town"):
+            cur.execute(f"SELECT COUNT(*) FROM incidents_enriched WHERE {col} IS NULL")
+            n = cur.fetchone()[0]
+            logger.info("Incidents with %s NULL: %d", col, n)
+
+
+def _load(conn, profiler, manifest: RunManifest) -> int:
+    """Scrape and load the run's reports (the parts its manifest does not record as done); return incidents inserted."""
+    if manifest.is_completed("scrape"):
+        logger.info("Scrape already completed in run %d, reusing its report URLs", manifest.run_id)
+    else:
+        # Scrape the Norman PD activity reports page
+        with manifest.stage("scrape"), profiler.stage("scrape"):
+            incident_urls, case_urls, arrest_urls = scrape_normanpd_pdf_urls(conn, manifest.recheck_days)
+            logger.info(
+                "Processing %d incident, %d case and %d arrest PDFs",
+                len(incident_urls),
+                len(case_urls),
+                len(arrest_urls),
+            )
+            manifest.record_reports(sorted(incident_urls) + sorted(case_urls) + sorted(arrest_urls))
+    if manifest.is_completed("load"):
+        logger.info("Load already completed in run %d, skipped", manifest.run_id)
+        return 0
+
+    # Fetch, parse, and load all three report types in one pass (incidents first)
+    urls = manifest.pending_reports()
+    logger.info("Loading %d reports not yet loaded in run %d", len(urls), manifest.run_id)
+    with manifest.stage("load"), profiler.stage("load"):
+        totals = ingest_reports(
+            conn, urls, refresh=manifest.recheck_days > 0, on_loaded=manifest.mark_report_loaded
+        )
+    for kind, counts in totals.items():
+        if counts["reports"]:
+            logger.info(
+                "Loaded %s reports: %d reports, %d of %d pages changed, extracted %d, loaded %d",
+                kind, counts["reports"], counts["changed_pages"], counts["pages"], counts["extracted"], counts["loaded"],
+            )
+    return totals[KIND_INCIDENT]["loaded"]
+
+
+def run(profiler=NULL_PROFILER, recheck_days: int = 0, resume: bool = False) -> None:
     """
     Orchestrate the full Norman PD incident pipeline.
 
     Scrape the Norman PD activity reports page.
-    Fetch, parse, and load incidents.
+    Fetch, parse, and load incident, case and arrest reports.
     Post-process the incidents.
     Output the incidents.
+
+    Each stage runs inside profiler.stage(); pass a RunProfiler to profile the run.
+    recheck_days > 0 also re-checks the reports of that many already loaded days for republished
+    corrections; only their changed pages are parsed and loaded.
+    Progress is recorded in a run manifest (src.pipeline.manifest); resume=True continues the latest run
+    that did not complete (with its recheck_days) from where it stopped, instead of starting a new one.
     """
     setup_logging()
     logger.info("Pipeline run started")
@@ -62,54 +149,38 @@ def run() -> None:
         # Ensure schema exists
         create_incident_table(conn)
         create_location_table(conn)
-
-        # Scrape the Norman PD activity reports page
-        incident_urls, case_urls, arrest_urls = scrape_normanpd_pdf_urls(conn)
-        logger.info(
-            "Processing %d incident PDFs (cases/arrests not yet handled)",
-            len(incident_urls),
-        )
-
-        # Fetch, parse, and load incidents
-        inserted_this_run = 0
-        for url in incident_urls:
-            logger.info("Fetching incidents from %s", url)
-            incident_pdf = fetchincidents(url)
-            incidents = extract_incidents(incident_pdf)
-            extracted_count = sum(len(page) for page in incidents[0])
-            inserted_this_url = populate_incidents(conn, incidents)
-            inserted_this_run += inserted_this_url
+        create_enrichment_tables(conn)
+        create_enrichment_state_table(conn)
+        create_rollup_table(conn)
+        create_feature_table(conn)
+        create_case_table(conn)
+        create_arrest_table(conn)
+        create_report_pages_table(conn)
+        create_pipeline_run_tables(conn)
+
+        manifest = RunManifest.resume(conn) if resume else None
+        if manifest is None:
+            if resume:
+                logger.info("No unfinished run to resume; starting a new run")
+            manifest = RunManifest.start(conn, recheck_days)
+        try:
+            inserted_this_run = _load(conn, profiler, manifest)
+
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM incidents")
+                total_in_db = cur.fetchone()[0]
             logger.info(
-                "URL %s: extracted %d, inserted %d",
-                url,
-                extracted_count,
-                inserted_this_url,
+                "Run summary: inserted this run=%d, total rows in incidents=%d",
+                inserted_this_run,
+                total_in_db,
             )
 
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM incidents")
-            total_in_db = cur.fetchone()[0]
-        logger.info(
-            "Run summary: inserted this run=%d, total rows in incidents=%d",
-            inserted_this_run,
-            total_in_db,
-        )
-
-        # Post-processing
-        logger.info("Updating location and incident ranks")
-        update_ranks_incidents(conn)
-        get_location(conn)
-        logger.info("Fetching weather for incident locations")
-        get_weather(conn)
-        logger.info("Computing side of town")
-        side_of_town(conn)
-
-        # Enrichment health: log NULL counts
-        with conn.cursor() as cur:
-            for col in ("weather", "location_rank", "side_of_town"):
-                cur.execute(f"SELECT COUNT(*) FROM incidents WHERE {col} IS NULL")
-                n = cur.fetchone()[0]
-                logger.info("Incidents with %s NULL: %d", col, n)
+            # Post-processing
+            post_process(conn, profiler, manifest)
+        except BaseException as e:
+            manifest.finish(e)
+            raise
+        manifest.finish()
 
         # Final output (optional)
         # _output_incidents(conn)
@@ -118,6 +189,35 @@ def run() -> None:
         terminate_connection(conn)
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Norman PD incident pipeline")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="RUN_DIR",
+        help="profile each stage (cProfile, tracemalloc, sampled stacks) into RUN_DIR (default: PROFILE_DIR/<timestamp>)",
+    )
+    parser.add_argument(
+        "--recheck-days",
+        type=int,
+        default=0,
+        metavar="N",
+        help="also re-fetch the reports of the last N loaded days and load the pages that changed",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the latest run that did not complete, skipping the reports and stages it already finished",
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    profiler = create_profiler(args.profile or None) if args.profile is not None else NULL_PROFILER
+    run(profiler, args.recheck_days, args.resume)
+
+
 if __name__ == "__main__":
-    run()
+    main()
 
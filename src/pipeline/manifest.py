@@ -0,0 +1,200 @@
+"""
+Run manifest: what each pipeline run (`python -m src.pipeline.main`) has done so far, so a run that dies
+partway can be resumed instead of started over.
+
+A run records, in its own committed rows:
+- the report URLs its scrape selected, in load order, each marked once it is loaded
+- each stage it started (load and the post-processing stages), and whether it completed or failed; a
+  completed stage also records the highest incidents.change_seq it saw, i.e. the rows it covered
+
+`--resume` picks up the latest run that did not complete: it skips the scrape (the recorded URLs stand),
+loads only the reports not yet marked, skips the stages that completed and re-runs the failed one and
+those after it. A report loaded but not yet marked when the run died is loaded again, which its
+fingerprints turn into a no-op (see src.db.report_pages).
+
+Run from repo root:
+  python -m src.pipeline.main --resume
+  python -m src.pipeline.manifest        # list recent runs and their stages
+"""
+import argparse
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+from psycopg2.extensions import connection
+
+from src.logging_config import setup_logging
+from src.db.backend import execute_values
+from src.db.connection import create_connection, terminate_connection
+from src.db.schema import create_pipeline_run_tables
+
+RUN_RUNNING = "running"
+RUN_FAILED = "failed"
+RUN_COMPLETED = "completed"
+
+# Runs listed by the CLI
+RECENT_RUNS = 10
+
+logger = logging.getLogger(__name__)
+
+
+class RunManifest:
+    """The manifest rows of one pipeline run; every method that writes commits."""
+
+    def __init__(self, db: connection, run_id: int, recheck_days: int = 0, completed: Optional[set] = None):
+        self.db = db
+        self.run_id = run_id
+        self.recheck_days = recheck_days
+        self.completed = set(completed or ())
+
+    @classmethod
+    def start(cls, db: connection, recheck_days: int = 0) -> "RunManifest":
+        """Record a new run."""
+        with db.cursor() as cur:
+            cur.execute(
+                "INSERT INTO pipeline_runs (status, recheck_days) VALUES (%s, %s) RETURNING run_id",
+                (RUN_RUNNING, recheck_days),
+            )
+            run_id = cur.fetchone()[0]
+        db.commit()
+        logger.info("Pipeline run %d started", run_id)
+        return cls(db, run_id, recheck_days)
+
+    @classmethod
+    def resume(cls, db: connection) -> Optional["RunManifest"]:
+        """Reopen the latest run that did not complete, or None if the latest run completed (or there is none)."""
+        with db.cursor() as cur:
+            cur.execute("SELECT run_id, status, recheck_days FROM pipeline_runs ORDER BY run_id DESC LIMIT 1")
+            row = cur.fetchone()
+            if row is None or row[1] == RUN_COMPLETED:
+                db.rollback()
+                return None
+            run_id, _, recheck_days = row
+            cur.execute(
+                "UPDATE pipeline_runs SET status = %s, attempts = attempts + 1, finished_at = NULL, error = NULL WHERE run_id = %s",
+                (RUN_RUNNING, run_id),
+            )
+            cur.execute("SELECT stage FROM pipeline_run_stages WHERE run_id = %s AND status = %s", (run_id, RUN_COMPLETED))
+            completed = {stage for stage, in cur.fetchall()}
+        db.commit()
+        logger.info("Resuming pipeline run %d (completed stages: %s)", run_id, ", ".join(sorted(completed)) or "none")
+        return cls(db, run_id, recheck_days, completed)
+
+    def is_completed(self, stage: str) -> bool:
+        return stage in self.completed
+
+    def record_reports(self, urls: Sequence[str]) -> None:
+        """Store the scrape's report URLs, in load order (replacing those of an earlier, failed scrape)."""
+        with self.db.cursor() as cur:
+            cur.execute("DELETE FROM pipeline_run_reports WHERE run_id = %s", (self.run_id,))
+            execute_values(
+                cur,
+                "INSERT INTO pipeline_run_reports (run_id, ordinal, url) VALUES %s",
+                [(self.run_id, i, url) for i, url in enumerate(urls)],
+                page_size=1000,
+            )
+        self.db.commit()
+
+    def pending_reports(self) -> list[str]:
+        """Recorded report URLs not yet loaded, in load order."""
+        with self.db.cursor() as cur:
+            cur.execute(
+                "SELECT url FROM pipeline_run_reports WHERE run_id = %s AND loaded_at IS NULL ORDER BY ordinal",
+                (self.run_id,),
+            )
+            urls = [url for url, in cur.fetchall()]
+        self.db.rollback()
+        return urls
+
+    def mark_report_loaded(self, url: str) -> None:
+        with self.db.cursor() as cur:
+            cur.execute(
+                "UPDATE pipeline_run_reports SET loaded_at = CURRENT_TIMESTAMP WHERE run_id = %s AND url = %s",
+                (self.run_id, url),
+            )
+        self.db.commit()
+
+    def _set_stage(self, stage: str, status: str, error: Optional[str] = None) -> None:
+        with self.db.cursor() as cur:
+            if status == RUN_RUNNING:
+                cur.execute("DELETE FROM pipeline_run_stages WHERE run_id = %s AND stage = %s", (self.run_id, stage))
+                cur.execute(
+                    "INSERT INTO pipeline_run_stages (run_id, stage, status, started_at) VALUES (%s, %s, %s, CURRENT_TIMESTAMP)",
+                    (self.run_id, stage, status),
+                )
+            else:
+                cur.execute("SELECT COALESCE(MAX(change_seq), 0) FROM incidents")
+                through = cur.fetchone()[0]
+                cur.execute(
+                    """UPDATE pipeline_run_stages SET status = %s, finished_at = CURRENT_TIMESTAMP,
+                           through_change_seq = %s, error = %s
+                       WHERE run_id = %s AND stage = %s""",
+                    (status, through, error, self.run_id, stage),
+                )
+        self.db.commit()
+        if status == RUN_COMPLETED:
+            self.completed.add(stage)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record a stage as running, then completed, or failed (with the error) if its body raises."""
+        self._set_stage(name, RUN_RUNNING)
+        try:
+            yield
+        except BaseException as e:
+            self.db.rollback()
+            self._set_stage(name, RUN_FAILED, str(e))
+            raise
+        self._set_stage(name, RUN_COMPLETED)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Record the run completed, or failed with `error`."""
+        if error is not None:
+            self.db.rollback()
+        with self.db.cursor() as cur:
+            cur.execute(
+                "UPDATE pipeline_runs SET status = %s, finished_at = CURRENT_TIMESTAMP, error = %s WHERE run_id = %s",
+                (RUN_FAILED if error is not None else RUN_COMPLETED, str(error) if error is not None else None, self.run_id),
+            )
+        self.db.commit()
+        if error is not None:
+            logger.error("Pipeline run %d failed; resume it with --resume", self.run_id)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="List recent pipeline runs and their stages")
+    parser.add_argument("--limit", type=int, default=RECENT_RUNS, help="runs to list")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        create_pipeline_run_tables(conn)
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT run_id, status, attempts, started_at, finished_at, error FROM pipeline_runs
+                   ORDER BY run_id DESC LIMIT %s""",
+                (args.limit,),
+            )
+            runs = cur.fetchall()
+            for run_id, status, attempts, started_at, finished_at, error in runs:
+                cur.execute(
+                    """SELECT COUNT(*), COUNT(loaded_at) FROM pipeline_run_reports WHERE run_id = %s""",
+                    (run_id,),
+                )
+                reports, loaded = cur.fetchone()
+                print(f"run {run_id}\t{status}\tattempts={attempts}\tstarted={started_at}\tfinished={finished_at}"
+                      f"\treports={loaded}/{reports}" + (f"\terror={error}" if error else ""))
+                cur.execute(
+                    """SELECT stage, status, through_change_seq, error FROM pipeline_run_stages
+                       WHERE run_id = %s ORDER BY started_at, stage""",
+                    (run_id,),
+                )
+                for stage, stage_status, through, stage_error in cur.fetchall():
+                    print(f"  {stage}\t{stage_status}\tthrough_change_seq={through}" + (f"\terror={stage_error}" if stage_error else ""))
+    finally:
+        terminate_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Replay ingestion: re-parse a directory of report PDFs (by default the PDF archive) and upsert them.
+
+Reports are parsed in parallel worker processes; the parent loads incident reports with
+upsert_incidents, which rewrites only rows whose values changed, and case / arrest reports with
+their (equally change-detecting) loaders. The report type comes from the archived URL, or from
+the file name outside the archive; archived reports also get their page fingerprints stored. Use it to apply a parser fix
+(bump PARSER_VERSION) to everything already loaded, or to rebuild a database from the archive.
+
+Only archive objects a current ref points to are replayed: an object superseded by a republished report is
+skipped. Reports are applied oldest first, by the date in their URL or file name.
+
+Run from repo root:
+  python -m src.pipeline.replay                    # every PDF in PDF_ARCHIVE_DIR
+  python -m src.pipeline.replay path/to/pdfs --workers 8 --no-post-process
+"""
+import argparse
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Sequence
+
+from src.config import PDF_ARCHIVE_DIR
+from src.logging_config import setup_logging
+from src.db.connection import create_connection, terminate_connection
+from src.db.schema import (
+    create_incident_table, create_location_table, create_enrichment_tables, create_enrichment_state_table, create_rollup_table,
+    create_feature_table, create_case_table, create_arrest_table, create_report_pages_table,
+)
+from src.db.incidents import upsert_incidents
+from src.db.report_pages import store_fingerprints
+from src.pdf.archive import archived_urls
+from src.pdf.parse_incidents import PARSER_VERSION
+from src.pipeline.ingest import KIND_INCIDENT, REPORT_TYPES, parse_report, report_kind
+from src.pipeline.main import post_process
+
+# Report date in a Norman PD report URL or file name (…/2024-01-15_daily_incident_summary.pdf)
+_DATE_IN_NAME = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+logger = logging.getLogger(__name__)
+
+
+def _report_order(url_or_name: str) -> tuple[str, str]:
+    """Sort key: the report date (undated names first), then the URL or name."""
+    match = _DATE_IN_NAME.search(url_or_name)
+    return match.group(0) if match else "", url_or_name
+
+
+def replay_sources(directory: os.PathLike) -> list[tuple[str, Optional[str]]]:
+    """(path, archived URL or None) of the PDFs under `directory` to replay, oldest report first.
+
+    Archive objects are named by content hash; their refs say which URL (and so which report type) they came from.
+    An object no ref points to any more was superseded by a republished report and is skipped.
+    """
+    root = Path(directory)
+    urls = archived_urls(root)
+    objects = root / "objects"
+    sources, superseded = [], 0
+    for path in root.rglob("*.pdf"):
+        url = urls.get(path.stem)
+        if url is None and objects in path.parents:
+            superseded += 1
+            continue
+        sources.append((str(path), url))
+    if superseded:
+        logger.info("Skipping %d superseded archive objects in %s", superseded, directory)
+    return sorted(sources, key=lambda source: _report_order(source[1] or Path(source[0]).name))
+
+
+def replay_directory(conn, directory: os.PathLike, workers: Optional[int] = None) -> dict[str, int]:
+    """Parse the current PDFs under `directory` in parallel and upsert them in report order; return summed row counts."""
+    sources = replay_sources(directory)
+    paths = [path for path, _ in sources]
+    kinds = [report_kind(url or path) for path, url in sources]
+    logger.info("Replaying %d PDFs from %s (parser version %d)", len(paths), directory, PARSER_VERSION)
+
+    totals = {"new": 0, "updated": 0, "unchanged": 0, "case_rows": 0, "arrest_rows": 0, "failed_reports": 0}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for (path, url), kind, (fingerprints, parsed, error) in zip(sources, kinds, executor.map(parse_report, kinds, paths)):
+            if error is not None:
+                logger.error("Error parsing %s: %s", path, error)
+                totals["failed_reports"] += 1
+                continue
+            if kind != KIND_INCIDENT:
+                totals[f"{kind}_rows"] += REPORT_TYPES[kind].load(conn, parsed)
+                if url:
+                    store_fingerprints(conn, url, fingerprints)
+                continue
+            counts = upsert_incidents(conn, parsed)
+            if url:
+                store_fingerprints(conn, url, fingerprints)
+            for key, n in counts.items():
+                totals[key] += n
+            logger.debug("%s: %d new, %d updated, %d unchanged", path, counts["new"], counts["updated"], counts["unchanged"])
+    return totals
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-parse a directory of report PDFs and upsert changed rows")
+    parser.add_argument("directory", nargs="?", default=PDF_ARCHIVE_DIR, help="directory searched recursively for *.pdf")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--no-post-process", action="store_true", help="skip ranks, enrichment and rollups after loading")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    conn = create_connection()
+    try:
+        create_incident_table(conn)
+        create_location_table(conn)
+        create_enrichment_tables(conn)
+        create_enrichment_state_table(conn)
+        create_rollup_table(conn)
+        create_feature_table(conn)
+        create_case_table(conn)
+        create_arrest_table(conn)
+        create_report_pages_table(conn)
+
+        totals = replay_directory(conn, args.directory, args.workers)
+        logger.info(
+            "Replay summary: new=%d, updated=%d, unchanged=%d, case rows written=%d, arrest rows written=%d, failed reports=%d",
+            totals["new"],
+            totals["updated"],
+            totals["unchanged"],
+            totals["case_rows"],
+            totals["arrest_rows"],
+            totals["failed_reports"],
+        )
+
+        if not args.no_post_process:
+            post_process(conn)
+    finally:
+        terminate_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,7 @@ def run() -> None:
 
     conn = create_connection()
     cur = conn.cursor()
-    cur.execute("SELECT * FROM incidents")
+    cur.execute("SELECT * FROM incidents_enriched")
     incidents = cur.fetchall()
 
     if not incidents:
@@ -0,0 +1,186 @@
+"""
+Per-stage profiling for pipeline runs (`python -m src.pipeline.main --profile`).
+
+Each stage wrapped in `profiler.stage(name)` gets, in the run directory:
+  NN_<stage>.prof         cProfile stats (pstats / snakeviz)
+  NN_<stage>.txt          top functions by cumulative and own time
+  NN_<stage>.alloc.txt    tracemalloc: top allocation sites during the stage, current and peak traced memory
+  NN_<stage>.collapsed    sampled stacks of all threads, "frame;frame;frame count" (flamegraph.pl, speedscope)
+and summary.json with wall time, CPU time and memory per stage.
+
+cProfile, tracemalloc and the sampled stacks only see this process. Work done in child processes (the load stage's
+PDF parser pool) shows up as the stage's child CPU time: the RUSAGE_CHILDREN delta, which counts children reaped
+before the stage ends (pools shut down inside the stage). It is not measured where `resource` is unavailable (Windows).
+
+When profiling is off, NULL_PROFILER.stage() is a shared no-op context manager.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import ContextManager, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src.config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+
+# Rows written to the per-stage text reports
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+logger = logging.getLogger(__name__)
+
+
+def _children_cpu() -> Optional[float]:
+    """User + system CPU seconds of the reaped child processes so far (None where `resource` is unavailable)."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _collapse(frame) -> str:
+    """'outer;...;inner' frame names of a stack, flamegraph collapsed format."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Background thread counting the collapsed stacks of every other thread at a fixed interval."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.stacks[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """Profiles named pipeline stages into a run directory."""
+
+    def __init__(self, run_dir: Path, sample_interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.sample_interval = sample_interval
+        self.stages: list[dict] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        prefix = self.run_dir / f"{len(self.stages) + 1:02d}_{name}"
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        wall, cpu, child_cpu = time.perf_counter(), time.process_time(), _children_cpu()
+        try:
+            with StackSampler(self.sample_interval) as sampler:
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            child_cpu = None if child_cpu is None else _children_cpu() - child_cpu
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self._write_stage(prefix, profile, sampler, before, after, current, peak, child_cpu)
+            self.stages.append({
+                "stage": name,
+                "wall_seconds": round(wall, 3),
+                "cpu_seconds": round(cpu, 3),
+                "child_cpu_seconds": None if child_cpu is None else round(child_cpu, 3),
+                "traced_memory_bytes": current,
+                "peak_memory_bytes": peak,
+                "samples": sum(sampler.stacks.values()),
+            })
+            self._write_summary()
+            logger.info("Profiled stage %s: %.2fs wall, %.2fs CPU, %s child CPU, peak %.1f MiB", name, wall, cpu,
+                        "unmeasured" if child_cpu is None else f"{child_cpu:.2f}s", peak / 2**20)
+
+    def _write_stage(self, prefix: Path, profile: cProfile.Profile, sampler: StackSampler,
+                     before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, current: int, peak: int,
+                     child_cpu: Optional[float]) -> None:
+        profile.dump_stats(f"{prefix}.prof")
+        report = io.StringIO()
+        if child_cpu is None:
+            report.write("child processes: CPU not measured on this platform; functions below are this process only\n")
+        else:
+            report.write(f"child processes: {child_cpu:.3f}s CPU (reaped during the stage), "
+                         "not in the functions below (this process only)\n")
+        stats = pstats.Stats(profile, stream=report)
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+        Path(f"{prefix}.txt").write_text(report.getvalue(), encoding="utf-8")
+
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        lines = [f"traced memory: current {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB", ""]
+        lines += [str(entry) for entry in diff[:TOP_ALLOCATIONS]]
+        Path(f"{prefix}.alloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        sampler.write(Path(f"{prefix}.collapsed"))
+
+    def _write_summary(self) -> None:
+        path = self.run_dir / "summary.json"
+        path.write_text(json.dumps({"stages": self.stages}, indent=2), encoding="utf-8")
+
+
+class NullProfiler:
+    """Profiler used when profiling is off: every stage is the same no-op context."""
+
+    _noop = nullcontext()
+
+    def stage(self, name: str) -> ContextManager[None]:
+        return self._noop
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def create_profiler(run_dir: Optional[str] = None) -> RunProfiler:
+    """RunProfiler writing into run_dir (default: PROFILE_DIR/<timestamp>)."""
+    path = Path(run_dir) if run_dir else Path(PROFILE_DIR) / datetime.now().strftime("%Y%m%d-%H%M%S")
+    logger.info("Profiling enabled; writing stage profiles to %s", path)
+    return RunProfiler(path)
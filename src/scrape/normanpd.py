@@ -1,34 +1,44 @@
-import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import re
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from psycopg2.extensions import connection
 
+from src.config import NORMANPD_REPORTS_URL
+from src.http_client import get_session
+
 logger = logging.getLogger(__name__)
 
-def scrape_normanpd_pdf_urls(db: connection) -> tuple[list[str], list[str], list[str]]:
-    """Scrape Norman PD PDF URLs from the department activity reports page."""
+def scrape_normanpd_pdf_urls(db: connection, recheck_days: int = 0) -> tuple[list[str], list[str], list[str]]:
+    """Scrape Norman PD PDF URLs from the department activity reports page.
+
+    Reports dated after the latest loaded day are returned, plus those of the last `recheck_days`
+    loaded days (to pick up republished corrections).
+    """
     
-    url = "https://www.normanok.gov/public-safety/police-department/crime-prevention-data/department-activity-reports"
+    url = NORMANPD_REPORTS_URL
     
-    response = requests.get(url)
+    response = get_session().get(url)
     incident_pdf_urls = set()
     case_pdf_urls = set()
     arrest_pdf_urls = set()
     
-    # Check if the database has the latest PDF URLs
+    # Check if the database has the latest PDF URLs (each report type against its own table)
     with db.cursor() as cur:
-        cur.execute("SELECT MAX(incident_ts)::date FROM incidents")
-        latest_datetime = cur.fetchone()
-    
-    latest_date_in_db = latest_datetime[0] if latest_datetime else None
+        cur.execute(
+            """SELECT (SELECT MAX(incident_ts)::date FROM incidents),
+                      (SELECT MAX(case_ts)::date FROM cases),
+                      (SELECT MAX(arrest_ts)::date FROM arrests)"""
+        )
+        latest_incident_date, latest_case_date, latest_arrest_date = (
+            day - timedelta(days=recheck_days) if day else None for day in cur.fetchone()
+        )
     
     if response.status_code == 200:
         soup = BeautifulSoup(response.text, 'html.parser')
-        base_url = "https://www.normanok.gov"
+        base_url = url  # report links are site-relative paths
         
         daily_incident_pattern = r'/sites/default/files/documents/\d{4}-\d{2}/\d{4}-\d{2}-\d{2}_daily_incident_summary.pdf'
         daily_case_pattern = r'/sites/default/files/documents/\d{4}-\d{2}/\d{4}-\d{2}-\d{2}_daily_case_summary.pdf'
@@ -40,26 +50,26 @@ def scrape_normanpd_pdf_urls(db: connection) -> tuple[list[str], list[str], list
             if re.search(daily_incident_pattern, href):
                 report_date = re.search(r'\d{4}-\d{2}-\d{2}', href).group(0)
                 report_date = datetime.strptime(report_date, '%Y-%m-%d').date()
-                if not latest_date_in_db or report_date > latest_date_in_db:
+                if not latest_incident_date or report_date > latest_incident_date:
                     incident_pdf_urls.add(urljoin(base_url, href))
                 else:
-                    logger.info("Skipping %s (report date before %s)", href, latest_date_in_db)
+                    logger.info("Skipping %s (report date before %s)", href, latest_incident_date)
             
             if re.search(daily_case_pattern, href):
                 report_date = re.search(r'\d{4}-\d{2}-\d{2}', href).group(0)
                 report_date = datetime.strptime(report_date, '%Y-%m-%d').date()
-                if not latest_date_in_db or report_date > latest_date_in_db:
+                if not latest_case_date or report_date > latest_case_date:
                     case_pdf_urls.add(urljoin(base_url, href))
                 else:
-                    logger.info("Skipping %s (report date before %s)", href, latest_date_in_db)
+                    logger.info("Skipping %s (report date before %s)", href, latest_case_date)
             
             if re.search(daily_arrest_pattern, href):
                 report_date = re.search(r'\d{4}-\d{2}-\d{2}', href).group(0)
                 report_date = datetime.strptime(report_date, '%Y-%m-%d').date()
-                if not latest_date_in_db or report_date > latest_date_in_db:
+                if not latest_arrest_date or report_date > latest_arrest_date:
                     arrest_pdf_urls.add(urljoin(base_url, href))
                 else:
-                    logger.info("Skipping %s (report date before %s)", href, latest_date_in_db)
+                    logger.info("Skipping %s (report date before %s)", href, latest_arrest_date)
     else:
         logger.exception("Error while scraping Norman PD PDF URLs: status %s", response.status_code)
         raise Exception(f"Error while scraping Norman PD PDF URLs: {response.status_code}")
@@ -0,0 +1,234 @@
+"""
+Network-stage simulation: runs the full pipeline (`python -m src.pipeline.main`) against local stub servers
+(src.sim.stubs) and reports end-to-end throughput per scenario.
+
+Every combination of --fetch-workers and --geocoder-workers is a scenario, run in its own work directory
+(PDF archive, Open-Meteo HTTP cache, log) through the phases given with --phases:
+- cold:    empty work directory and database
+- warm:    a fresh database, but the PDF archive and weather cache of the cold phase kept (caching effect)
+- recheck: the warm database again with --recheck-days (conditional GETs; --republish days get new content)
+
+The database is a DuckDB file in the work directory, or, with --database-url postgresql://..., a schema
+(SIM_SCHEMA) dropped and recreated for each fresh database. Other settings (HTTP_RETRIES,
+INGEST_PARSE_WORKERS, BULK_FLUSH_SIZE, ...) pass through from the environment.
+
+Run from repo root:
+  python -m src.sim.harness --days 14 --incidents-per-day 150
+  python -m src.sim.harness --fetch-workers 1,4,8 --site "latency=0.2,jitter=0.1"
+  python -m src.sim.harness --geocoder-workers 1,4,16 --geocoder-rate 100 --nominatim "latency=0.05,rate=50,errors=0.01"
+  python -m src.sim.harness --phases cold,warm,recheck --republish 2 --json sim.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from src.logging_config import setup_logging
+from src.db.backend import backend_for_url
+from src.sim.stubs import ReportSite, Stubs, parse_behavior, start_stubs
+
+PHASES = ("cold", "warm", "recheck")
+# Postgres schema the simulated runs write to (never the pipeline's own tables)
+SIM_SCHEMA = "sim"
+# Stage durations reported per run (others are summed into "other")
+REPORTED_STAGES = ("scrape", "load", "geocode", "weather")
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+logger = logging.getLogger(__name__)
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _with_search_path(url: str, schema: str) -> str:
+    return f"{url}{'&' if '?' in url else '?'}options=-csearch_path%3D{schema}"
+
+
+def fresh_database(work_dir: Path, database_url: Optional[str]) -> str:
+    """An empty database for a run: a new DuckDB file in work_dir, or SIM_SCHEMA recreated on Postgres; return its URL."""
+    if not database_url:
+        path = work_dir / "sim.duckdb"
+        path.unlink(missing_ok=True)
+        Path(f"{path}.wal").unlink(missing_ok=True)
+        return f"duckdb://{path}"
+    conn = backend_for_url(database_url).connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SIM_SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {SIM_SCHEMA}")
+        conn.commit()
+    finally:
+        conn.close()
+    return _with_search_path(database_url, SIM_SCHEMA)
+
+
+def pipeline_env(stubs: Stubs, work_dir: Path, database_url: str, fetch_workers: int, geocoder_workers: int, geocoder_rate: float) -> dict:
+    """Environment of a pipeline run against the stubs."""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")])),
+        "DATABASE_URL": database_url,
+        "NORMANPD_REPORTS_URL": stubs.reports_url,
+        "OPENMETEO_ARCHIVE_URL": stubs.openmeteo_url,
+        "GEOCODER_BACKENDS": f"nominatim {stubs.nominatim.url} {geocoder_rate:g}",
+        "GEOCODER_WORKERS": str(geocoder_workers),
+        "INGEST_FETCH_WORKERS": str(fetch_workers),
+        "PDF_ARCHIVE_DIR": str(work_dir / "pdf_archive"),
+        "LOG_FILE": str(work_dir / "app.log"),
+    })
+    return env
+
+
+def run_pipeline(env: dict, work_dir: Path, recheck_days: int = 0) -> float:
+    """Run the pipeline in a subprocess (work_dir as cwd, so the weather cache lives there); return wall seconds."""
+    args = [sys.executable, "-m", "src.pipeline.main"] + (["--recheck-days", str(recheck_days)] if recheck_days else [])
+    started = time.perf_counter()
+    with open(work_dir / "pipeline.out", "ab") as out:
+        result = subprocess.run(args, cwd=work_dir, env=env, stdout=out, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise Exception(f"Pipeline run failed (exit {result.returncode}); see {work_dir / 'pipeline.out'}")
+    return elapsed
+
+
+def run_stats(database_url: str) -> dict:
+    """Row counts and stage durations of the latest run in a database."""
+    conn = backend_for_url(database_url).connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT (SELECT COUNT(*) FROM incidents),
+                          (SELECT COUNT(*) FROM location WHERE latitude IS NOT NULL),
+                          (SELECT COUNT(*) FROM incident_weather WHERE weather IS NOT NULL)"""
+            )
+            incidents, geocoded, weather = cur.fetchone()
+            cur.execute("SELECT MAX(run_id) FROM pipeline_runs")
+            run_id = cur.fetchone()[0]
+            cur.execute("SELECT COUNT(loaded_at) FROM pipeline_run_reports WHERE run_id = %s", (run_id,))
+            reports = cur.fetchone()[0]
+            cur.execute("SELECT stage, started_at, finished_at FROM pipeline_run_stages WHERE run_id = %s", (run_id,))
+            stages = {stage: (finished - started).total_seconds() for stage, started, finished in cur.fetchall()}
+        conn.rollback()
+    finally:
+        conn.close()
+    seconds = {stage: round(stages.get(stage, 0.0), 2) for stage in REPORTED_STAGES}
+    seconds["other"] = round(sum(v for k, v in stages.items() if k not in REPORTED_STAGES), 2)
+    return {"reports": reports, "incidents": incidents, "geocoded": geocoded, "weather": weather, "stage_seconds": seconds}
+
+
+def _requests(stubs: Stubs, before: dict) -> dict:
+    """Stub responses by status since `before` (a previous snapshot), per stub."""
+    return {
+        server.name: {str(status): n for status, n in sorted((server.snapshot() - before[server.name]).items())}
+        for server in stubs
+    }
+
+
+def run_scenarios(
+    stubs: Stubs,
+    site: ReportSite,
+    work_root: Path,
+    fetch_workers: Sequence[int],
+    geocoder_workers: Sequence[int],
+    phases: Sequence[str] = ("cold", "warm"),
+    geocoder_rate: float = 50,
+    database_url: Optional[str] = None,
+    recheck_days: int = 3,
+    republish: int = 0,
+) -> list[dict]:
+    """Run every (fetch workers, geocoder workers) scenario through the phases; return one result per run."""
+    results = []
+    for fetch, geocode in itertools.product(fetch_workers, geocoder_workers):
+        work_dir = work_root / f"fetch{fetch}-geocode{geocode}"
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+        url = None
+        for phase in phases:
+            if phase == "recheck":
+                if url is None:
+                    raise ValueError("The recheck phase needs a cold or warm phase before it")
+                for day in site.days[-republish:] if republish else ():
+                    site.republish(day)
+            else:
+                url = fresh_database(work_dir, database_url)
+            before = {server.name: server.snapshot() for server in stubs}
+            env = pipeline_env(stubs, work_dir, url, fetch, geocode, geocoder_rate)
+            logger.info("Scenario fetch_workers=%d geocoder_workers=%d: %s run", fetch, geocode, phase)
+            seconds = run_pipeline(env, work_dir, recheck_days if phase == "recheck" else 0)
+            stats = run_stats(url)
+            results.append({
+                "fetch_workers": fetch, "geocoder_workers": geocode, "phase": phase, "seconds": round(seconds, 2),
+                "incidents_per_second": round(stats["incidents"] / seconds, 1) if seconds else 0.0,
+                **stats, "requests": _requests(stubs, before),
+            })
+    return results
+
+
+def print_results(results: list[dict]) -> None:
+    print("fetch\tgeocode\tphase\tseconds\treports\tincidents\tinc/s\tgeocoded\tweather\t"
+          + "\t".join(f"{stage}_s" for stage in (*REPORTED_STAGES, "other")) + "\tsite\tnominatim\topenmeteo")
+    for r in results:
+        requests = ["/".join(f"{status}:{n}" for status, n in r["requests"][name].items()) or "-" for name in ("site", "nominatim", "openmeteo")]
+        print(
+            f"{r['fetch_workers']}\t{r['geocoder_workers']}\t{r['phase']}\t{r['seconds']}\t{r['reports']}\t{r['incidents']}\t"
+            f"{r['incidents_per_second']}\t{r['geocoded']}\t{r['weather']}\t"
+            + "\t".join(str(r["stage_seconds"][stage]) for stage in (*REPORTED_STAGES, "other"))
+            + "\t" + "\t".join(requests)
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the pipeline against local stub servers and report throughput")
+    parser.add_argument("--days", type=int, default=14, help="daily incident reports on the stub site")
+    parser.add_argument("--incidents-per-day", type=int, default=100)
+    parser.add_argument("--addresses", type=int, default=300, help="distinct incident locations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--site", default="", help="reports page + PDF stub behavior, e.g. latency=0.1,jitter=0.05,rate=20,errors=0.01,conditional=1")
+    parser.add_argument("--nominatim", default="", help="Nominatim stub behavior (same keys)")
+    parser.add_argument("--openmeteo", default="", help="Open-Meteo stub behavior (same keys)")
+    parser.add_argument("--geocode-miss-rate", type=float, default=0.02, help="fraction of addresses Nominatim does not find")
+    parser.add_argument("--fetch-workers", type=_int_list, default=[4], help="comma-separated INGEST_FETCH_WORKERS values")
+    parser.add_argument("--geocoder-workers", type=_int_list, default=[4], help="comma-separated GEOCODER_WORKERS values")
+    parser.add_argument("--geocoder-rate", type=float, default=50, help="client-side requests/second to the Nominatim stub")
+    parser.add_argument("--phases", default="cold,warm", help=f"comma-separated phases per scenario ({', '.join(PHASES)})")
+    parser.add_argument("--recheck-days", type=int, default=3, help="--recheck-days of the recheck phase")
+    parser.add_argument("--republish", type=int, default=0, help="days republished with corrections before the recheck phase")
+    parser.add_argument("--database-url", default=None, help=f"Postgres URL (runs in schema {SIM_SCHEMA}); default: a DuckDB file per scenario")
+    parser.add_argument("--work-dir", default="resources/sim", help="scenario work directories")
+    parser.add_argument("--json", default=None, metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+    phases = [p.strip() for p in args.phases.split(",") if p.strip()]
+    if any(p not in PHASES for p in phases):
+        parser.error(f"--phases: expected a comma-separated subset of {', '.join(PHASES)}")
+
+    setup_logging()
+    site = ReportSite(args.days, args.incidents_per_day, args.addresses, args.seed)
+    stubs = start_stubs(
+        site, parse_behavior(args.site), parse_behavior(args.nominatim), parse_behavior(args.openmeteo),
+        args.geocode_miss_rate, args.seed,
+    )
+    logger.info("Stubs: site %s, nominatim %s, openmeteo %s", stubs.site.url, stubs.nominatim.url, stubs.openmeteo.url)
+    try:
+        results = run_scenarios(
+            stubs, site, Path(args.work_dir).resolve(), args.fetch_workers, args.geocoder_workers, phases,
+            args.geocoder_rate, args.database_url, args.recheck_days, args.republish,
+        )
+    finally:
+        stubs.stop()
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Local stub servers for the pipeline's network stages: the Norman PD activity reports page and its daily
+incident summary PDFs, Nominatim search, and the Open-Meteo archive API (FlatBuffers responses, as
+openmeteo_requests expects).
+
+Each stub is a keep-alive ThreadingHTTPServer on 127.0.0.1 with its own StubBehavior:
+- latency (+ uniform jitter) added to every response
+- a server-side rate limit: requests above it get 429 with Retry-After
+- an error rate: that fraction of requests gets 500
+- conditional GET support for PDFs: a matching If-None-Match / If-Modified-Since gets 304 (or, switched
+  off, every fetch downloads the full body again)
+
+Content is generated from a seed, so every run sees the same reports, coordinates and weather codes.
+The pipeline is pointed at the stubs through NORMANPD_REPORTS_URL, GEOCODER_BACKENDS and
+OPENMETEO_ARCHIVE_URL (see src.sim.harness).
+"""
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+import fitz
+import flatbuffers
+import numpy as np
+
+from src.config import TOWN_CENTER
+from src.bench.synth import NATURES, WEATHER_CODES, WEATHER_WEIGHTS, synth_addresses, zipf_cum_weights
+from src.enrich.geocoders import TokenBucket
+
+# Path of the activity reports page on www.normanok.gov (the stub serves it at the same path)
+REPORTS_PATH = "/public-safety/police-department/crime-prevention-data/department-activity-reports"
+INCIDENT_ORI = "OK0140200"
+
+# Report layout: landscape letter pages, column x positions, rows per page (matches extract_incident_pages)
+PAGE_SIZE = (792, 612)
+COLUMN_X = (36, 130, 230, 480, 680)
+COLUMN_TITLES = ("Date / Time", "Incident Number", "Location", "Nature", "Incident ORI")
+ROWS_PER_PAGE = 30
+ROW_HEIGHT = 17
+
+# Geocoded coordinates fall within this many degrees of TOWN_CENTER
+GEOCODE_SPREAD = 0.08
+
+Response = tuple[int, dict, bytes]
+Route = Callable[[str, dict, dict], Response]
+
+
+@dataclass
+class StubBehavior:
+    """How a stub misbehaves: latency, server-side rate limit (requests/second, 0 = none), error rate, 304 support."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    rate_limit: float = 0.0
+    error_rate: float = 0.0
+    conditional: bool = True
+
+
+def parse_behavior(spec: str) -> StubBehavior:
+    """StubBehavior from "latency=0.05,jitter=0.02,rate=10,errors=0.01,conditional=0" (any subset)."""
+    fields = {"latency": "latency", "jitter": "jitter", "rate": "rate_limit", "errors": "error_rate", "conditional": "conditional"}
+    behavior = StubBehavior()
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        if key not in fields or not value:
+            raise ValueError(f"Invalid stub behavior {item!r} (expected {', '.join(f'{k}=...' for k in fields)})")
+        setattr(behavior, fields[key], value not in ("0", "false", "no") if key == "conditional" else float(value))
+    return behavior
+
+
+def _json(status: int, payload) -> Response:
+    return status, {"Content-Type": "application/json"}, json.dumps(payload).encode("utf-8")
+
+
+def _unit(*parts) -> float:
+    """Deterministic number in [0, 1) from the given values."""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+class StubServer:
+    """One stub service on 127.0.0.1: routes requests through its StubBehavior and counts responses by status and connections."""
+
+    def __init__(self, name: str, route: Route, behavior: Optional[StubBehavior] = None, seed: int = 0):
+        self.name = name
+        self.route = route
+        self.behavior = behavior or StubBehavior()
+        self.statuses: Counter = Counter()
+        self.connections = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        rate = self.behavior.rate_limit
+        self._bucket = TokenBucket(rate, burst=rate) if rate > 0 else None
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                status, headers, body = stub.respond(self.path, dict(self.headers.items()))
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path: str, headers: dict) -> Response:
+        """Apply latency, rate limit and error rate, then the route; count the status."""
+        behavior = self.behavior
+        with self._lock:
+            delay = behavior.latency + self._rnd.uniform(0, behavior.jitter)
+            failed = self._rnd.random() < behavior.error_rate
+        if delay:
+            time.sleep(delay)
+        if self._bucket is not None and not self._bucket.try_acquire():
+            status, response_headers, body = _json(429, {"error": True, "reason": "Too many requests"})
+            response_headers["Retry-After"] = "1"
+        elif failed:
+            status, response_headers, body = _json(500, {"error": True, "reason": "Simulated server error"})
+        else:
+            parsed = urlparse(path)
+            query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+            status, response_headers, body = self.route(parsed.path, query, headers)
+        with self._lock:
+            self.statuses[status] += 1
+        return status, response_headers, body
+
+    def snapshot(self) -> Counter:
+        """Responses so far, by status."""
+        with self._lock:
+            return Counter(self.statuses)
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"stub-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def render_incident_report(rows: list[list[str]], generated: str) -> bytes:
+    """A daily incident summary PDF in the layout the parser expects: column titles and two title lines on
+    the first page, one text line per cell, and a generated-at footer on the last page."""
+    doc = fitz.open()
+    pages = [rows[i:i + ROWS_PER_PAGE] for i in range(0, len(rows), ROWS_PER_PAGE)] or [[]]
+    for number, chunk in enumerate(pages):
+        page = doc.new_page(width=PAGE_SIZE[0], height=PAGE_SIZE[1])
+        if number == 0:
+            for x, title in zip(COLUMN_X, COLUMN_TITLES):
+                page.insert_text((x, 40), title, fontsize=9)
+        for i, row in enumerate(chunk):
+            for x, cell in zip(COLUMN_X, row):
+                if cell:
+                    page.insert_text((x, 60 + i * ROW_HEIGHT), cell, fontsize=8)
+        if number == 0:
+            page.insert_text((36, 580), "NORMAN POLICE DEPARTMENT", fontsize=9)
+            page.insert_text((36, 596), "Daily Incident Summary (Public)", fontsize=9)
+        elif number == len(pages) - 1:
+            page.insert_text((600, 596), generated, fontsize=9)
+    return doc.tobytes(garbage=3, deflate=True)
+
+
+def _report_path(day: date) -> str:
+    return f"/sites/default/files/documents/{day:%Y-%m}/{day:%Y-%m-%d}_daily_incident_summary.pdf"
+
+
+class ReportSite:
+    """The activity reports page and a daily incident summary per day, generated from a seed."""
+
+    def __init__(self, days: int = 14, incidents_per_day: int = 100, addresses: int = 300, seed: int = 0, end: Optional[date] = None):
+        self.end = end or date.today() - timedelta(days=1)
+        self.days = [self.end - timedelta(days=n) for n in range(days - 1, -1, -1)]
+        self.incidents_per_day = incidents_per_day
+        self.seed = seed
+        rnd = random.Random(seed)
+        self.addresses = synth_addresses(addresses, rnd)
+        self._location_weights = zipf_cum_weights(len(self.addresses), 1.1)
+        self._nature_weights = zipf_cum_weights(len(NATURES), 1.3)
+        # Answer conditional GETs with 304 when the report is unchanged (start_stubs sets it from the site's behavior)
+        self.conditional = True
+        self._revisions: Counter = Counter()
+        self._rendered: dict[tuple[date, int], tuple[bytes, str, str]] = {}
+        self._lock = threading.Lock()
+
+    def rows(self, day: date) -> list[list[str]]:
+        """The day's report rows: date/time, incident number, location, nature, ORI (EMS companions with ORI EMSSTAT)."""
+        rnd = random.Random(f"{self.seed}-{day}")
+        first = 1 + sum(1 for d in self.days if d < day and d.year == day.year) * self.incidents_per_day * 2
+        minutes = sorted(rnd.randrange(24 * 60) for _ in range(self.incidents_per_day))
+        rows = []
+        for minute in minutes:
+            stamp = f"{day.month}/{day.day}/{day.year} {minute // 60}:{minute % 60:02d}"
+            location = rnd.choices(self.addresses, cum_weights=self._location_weights)[0]
+            nature = rnd.choices(NATURES, cum_weights=self._nature_weights)[0]
+            if rnd.random() < 0.02:  # no location / nature in the report
+                location = nature = ""
+            rows.append([stamp, f"{day.year}-{first + len(rows):08d}", location, nature, INCIDENT_ORI])
+            if rnd.random() < 0.06:
+                rows.append([stamp, f"{day.year}-{first + len(rows):08d}", location, nature, "EMSSTAT"])
+        return rows
+
+    def republish(self, day: date) -> None:
+        """Publish a corrected report for a day (new content and ETag): its last incident's nature changes."""
+        with self._lock:
+            self._revisions[day] += 1
+
+    def report(self, day: date) -> tuple[bytes, str, str]:
+        """(PDF bytes, ETag, Last-Modified) of a day's current report."""
+        with self._lock:
+            revision = self._revisions[day]
+            rendered = self._rendered.get((day, revision))
+        if rendered is None:
+            rendered = self._render(day, revision)
+            with self._lock:
+                self._rendered[(day, revision)] = rendered
+        return rendered
+
+    def _render(self, day: date, revision: int) -> tuple[bytes, str, str]:
+        rows = self.rows(day)
+        if revision and rows:
+            rows[-1][3] = f"{rows[-1][3] or 'Follow Up'} (Corrected {revision})"
+        published = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(days=1, hours=5, minutes=revision)
+        body = render_incident_report(rows, f"{published.month}/{published.day}/{published.year} {published.hour}:{published.minute:02d}")
+        return body, f'"{hashlib.sha256(body).hexdigest()[:16]}"', format_datetime(published, usegmt=True)
+
+    def page(self) -> bytes:
+        links = "\n".join(
+            f'<li><a href="{_report_path(day)}">{day:%Y-%m-%d} Daily Incident Summary</a></li>' for day in reversed(self.days)
+        )
+        return f"<html><body><h1>Department Activity Reports</h1><ul>\n{links}\n</ul></body></html>".encode("utf-8")
+
+    def route(self, path: str, query: dict, headers: dict) -> Response:
+        if path == REPORTS_PATH:
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, self.page()
+        for day in self.days:
+            if path == _report_path(day):
+                return self._serve_report(day, headers)
+        return 404, {"Content-Type": "text/plain"}, b"Not found"
+
+    def _serve_report(self, day: date, headers: dict) -> Response:
+        body, etag, last_modified = self.report(day)
+        validators = {"ETag": etag, "Last-Modified": last_modified}
+        if_none_match = headers.get("If-None-Match")
+        if self.conditional and (if_none_match == etag or (if_none_match is None and headers.get("If-Modified-Since") == last_modified)):
+            return 304, validators, b""
+        return 200, {"Content-Type": "application/pdf", **validators}, body
+
+
+def nominatim_route(miss_rate: float = 0.0, seed: int = 0) -> Route:
+    """Nominatim /search: a deterministic point near TOWN_CENTER per query; `miss_rate` of queries find nothing."""
+
+    def route(path: str, query: dict, headers: dict) -> Response:
+        if path != "/search":
+            return 404, {"Content-Type": "text/plain"}, b"Not found"
+        q = query.get("q", "")
+        if _unit(seed, "miss", q) < miss_rate:
+            return _json(200, [])
+        latitude = TOWN_CENTER[0] + (_unit(seed, "lat", q) * 2 - 1) * GEOCODE_SPREAD
+        longitude = TOWN_CENTER[1] + (_unit(seed, "lon", q) * 2 - 1) * GEOCODE_SPREAD
+        return _json(200, [{
+            "place_id": int(_unit(seed, "id", q) * 1e9), "lat": f"{latitude:.7f}", "lon": f"{longitude:.7f}",
+            "display_name": f"{q}, Norman, Cleveland County, Oklahoma, United States", "class": "place", "type": "house",
+        }])
+
+    return route
+
+
+def encode_hourly_weather(latitude: float, longitude: float, start: datetime, codes: list[float]) -> bytes:
+    """One length-prefixed WeatherApiResponse FlatBuffer with an hourly weather_code variable."""
+    builder = flatbuffers.Builder(256)
+    values = builder.CreateNumpyVector(np.asarray(codes, dtype=np.float32))
+    # VariableWithValues: variable (slot 0), values (slot 3)
+    builder.StartObject(4)
+    builder.PrependUOffsetTRelativeSlot(3, values, 0)
+    builder.PrependUint8Slot(0, 1, 0)
+    variable = builder.EndObject()
+    builder.StartVector(4, 1, 4)
+    builder.PrependUOffsetTRelative(variable)
+    variables = builder.EndVector()
+    # VariablesWithTime: time, time_end, interval, variables (slots 0-3)
+    builder.StartObject(4)
+    begin = int(start.timestamp())
+    builder.PrependInt64Slot(0, begin, 0)
+    builder.PrependInt64Slot(1, begin + 3600 * len(codes), 0)
+    builder.PrependInt32Slot(2, 3600, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables, 0)
+    hourly = builder.EndObject()
+    # WeatherApiResponse: latitude (slot 0), longitude (slot 1), hourly (slot 11)
+    builder.StartObject(12)
+    builder.PrependFloat32Slot(0, latitude, 0.0)
+    builder.PrependFloat32Slot(1, longitude, 0.0)
+    builder.PrependUOffsetTRelativeSlot(11, hourly, 0)
+    builder.Finish(builder.EndObject())
+    message = bytes(builder.Output())
+    return len(message).to_bytes(4, "little") + message
+
+
+def openmeteo_route(seed: int = 0) -> Route:
+    """Open-Meteo /v1/archive: 24 hourly weather codes per (cell, day), drawn with Norman's rough frequencies."""
+    cum_weights = list(itertools.accumulate(WEATHER_WEIGHTS))
+
+    def route(path: str, query: dict, headers: dict) -> Response:
+        if path != "/v1/archive":
+            return _json(404, {"error": True, "reason": "Not found"})
+        try:
+            latitude, longitude = float(query["latitude"]), float(query["longitude"])
+            day = date.fromisoformat(query["start_date"])
+        except (KeyError, ValueError) as e:
+            return _json(400, {"error": True, "reason": f"Invalid request: {e}"})
+        rnd = random.Random(f"{seed}-{latitude:.2f}-{longitude:.2f}-{day}")
+        codes = [float(code) for code in rnd.choices(WEATHER_CODES, cum_weights=cum_weights, k=24)]
+        start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        return 200, {"Content-Type": "application/octet-stream"}, encode_hourly_weather(latitude, longitude, start, codes)
+
+    return route
+
+
+class Stubs(NamedTuple):
+    site: StubServer
+    nominatim: StubServer
+    openmeteo: StubServer
+
+    @property
+    def reports_url(self) -> str:
+        return self.site.url + REPORTS_PATH
+
+    @property
+    def openmeteo_url(self) -> str:
+        return self.openmeteo.url + "/v1/archive"
+
+    def stop(self) -> None:
+        for server in self:
+            server.stop()
+
+
+def start_stubs(
+    site: ReportSite,
+    site_behavior: Optional[StubBehavior] = None,
+    nominatim_behavior: Optional[StubBehavior] = None,
+    openmeteo_behavior: Optional[StubBehavior] = None,
+    geocode_miss_rate: float = 0.0,
+    seed: int = 0,
+) -> Stubs:
+    """Start the reports site, Nominatim and Open-Meteo stubs."""
+    site_behavior = site_behavior or StubBehavior()
+    site.conditional = site_behavior.conditional
+    return Stubs(
+        StubServer("site", site.route, site_behavior, seed).start(),
+        StubServer("nominatim", nominatim_route(geocode_miss_rate, seed), nominatim_behavior, seed + 1).start(),
+        StubServer("openmeteo", openmeteo_route(seed), openmeteo_behavior, seed + 2).start(),
+    )
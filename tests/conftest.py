@@ -0,0 +1,120 @@
+"""
+Shared fixtures for the test suite.
+
+DuckDB tests get their connections from `duckdb_conn` (embedded, no server), and tests that need an HTTP
+server start a src.sim.stubs.StubServer with `stub_server` (127.0.0.1, port 0). Tests marked `postgres` run
+against the server named by a postgresql:// DATABASE_URL or, without one, a throwaway cluster started with the
+initdb and pg_ctl found on PATH (or in PG_BIN), each in a scratch schema of its own (dropped afterwards); with
+neither they are skipped.
+"""
+import os
+import shutil
+import socket
+import subprocess
+import uuid
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def postgres_server(tmp_path_factory):
+    """URL of a Postgres server: DATABASE_URL if it is postgresql://, else a throwaway cluster stopped after the session."""
+    url = os.environ.get("DATABASE_URL", "")
+    if url.startswith(("postgresql://", "postgres://")):
+        yield url
+        return
+    initdb, pg_ctl = (shutil.which(tool, path=os.environ.get("PG_BIN")) for tool in ("initdb", "pg_ctl"))
+    if not (initdb and pg_ctl):
+        pytest.skip("needs a postgresql:// DATABASE_URL, or initdb and pg_ctl on PATH (or in PG_BIN)")
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        pytest.skip("initdb refuses to run as root; set a postgresql:// DATABASE_URL instead")
+    data = tmp_path_factory.mktemp("pgdata")
+    port = _free_port()
+    subprocess.run([initdb, "-D", str(data), "-U", "postgres", "-A", "trust", "-E", "UTF8", "--no-sync"], check=True, capture_output=True)
+    subprocess.run(
+        [pg_ctl, "-D", str(data), "-l", str(data / "server.log"), "-w", "-o",
+         f"-p {port} -k {data} -c listen_addresses=127.0.0.1 -c fsync=off", "start"],
+        check=True, capture_output=True,
+    )
+    try:
+        yield f"postgresql://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run([pg_ctl, "-D", str(data), "-m", "immediate", "-w", "stop"], capture_output=True)
+
+
+@pytest.fixture
+def postgres_url(postgres_server, monkeypatch):
+    """DATABASE_URL of a fresh scratch schema on the test Postgres server (see postgres_server)."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    import psycopg2
+
+    url = postgres_server
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {schema}")
+        scoped = f"{url}{'&' if '?' in url else '?'}options=-csearch_path%3D{schema}"
+        monkeypatch.setenv("DATABASE_URL", scoped)
+        yield scoped
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def duckdb_conn(monkeypatch):
+    """Open embedded DuckDB connections with src.db.schema tables created; all are closed after the test.
+
+    duckdb_conn("incident", "location", "enrichment") runs create_incident_table, create_location_table and
+    create_enrichment_tables (create_<name>_table or create_<name>_tables) on an in-memory database, or on the
+    file `path`. DATABASE_URL points at it, so code opening its own connection to a file database sees the same data.
+    """
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    pytest.importorskip("duckdb", reason="duckdb required for the embedded backend; install from requirements.txt")
+    from src.db import schema
+    from src.db.connection import create_connection, terminate_connection
+
+    opened = []
+
+    def connect(*tables, path=None):
+        monkeypatch.setenv("DATABASE_URL", f"duckdb://{path}" if path else "duckdb:///:memory:")
+        conn = create_connection()
+        opened.append(conn)
+        for table in tables:
+            create = getattr(schema, f"create_{table}_table", None) or getattr(schema, f"create_{table}_tables")
+            create(conn)
+        return conn
+
+    yield connect
+    for conn in opened:
+        terminate_connection(conn)
+
+
+@pytest.fixture
+def stub_server():
+    """Start src.sim.stubs.StubServer instances on 127.0.0.1 (port 0); all are stopped after the test.
+
+    stub_server(route) serves route(path, query, headers) -> (status, headers, body) at the returned server's url.
+    """
+    pytest.importorskip("fitz", reason="PyMuPDF required by src.sim.stubs; install from requirements.txt")
+    from src.sim.stubs import StubServer
+
+    started = []
+
+    def start(route, behavior=None, name="stub"):
+        server = StubServer(name, route, behavior).start()
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.stop()
@@ -0,0 +1,41 @@
+"""
+Tests for the read-only query API, src.api: response cache and keyset cursors (no DB).
+Run from repo root: python -m pytest tests/test_api.py -v
+"""
+import pytest
+
+
+# --- Query API (cache + keyset cursor, no DB) ---
+
+def test_response_cache_lru_and_invalidation():
+    """LRU evicts the oldest entry; invalidation drops entries and rejects puts from older generations."""
+    from src.api.cache import ResponseCache
+
+    cache = ResponseCache(max_entries=2)
+    gen = cache.generation
+    cache.put("a", b"1", gen)
+    cache.put("b", b"2", gen)
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3", gen)
+    assert cache.get("b") is None and cache.get("a") == b"1"
+
+    cache.invalidate()
+    assert cache.get("a") is None
+    cache.put("a", b"stale", gen)  # computed before the batch was committed
+    assert cache.get("a") is None
+
+
+def test_query_api_cursor_round_trip_and_param_validation():
+    """Keyset cursors round-trip; bad query parameters raise ValueError (HTTP 400)."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from datetime import datetime
+    from src.api.queries import decode_cursor, encode_cursor, parse_incident_params
+
+    ts = datetime(2026, 1, 2, 13, 45)
+    assert decode_cursor(encode_cursor(ts, "2026-00000205")) == (ts, "2026-00000205")
+
+    kwargs = parse_incident_params({"nature": "Larceny", "side_of_town": "NE", "limit": "5"})
+    assert kwargs == {"nature": "Larceny", "side_of_town": "NE", "limit": 5}
+    for bad in ({"side_of_town": "UP"}, {"limit": "0"}, {"after": "not-a-cursor"}, {"order": "asc"}):
+        with pytest.raises(ValueError):
+            parse_incident_params(bad)
@@ -0,0 +1,36 @@
+"""
+Tests for the content-addressed PDF archive, src.pdf.archive (local stub server, no live network).
+Run from repo root: python -m pytest tests/test_archive.py -v
+"""
+import pytest
+
+# Require project deps so src.pdf (fitz) can be imported
+pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+
+
+# --- PDF archive (local server, no live network) ---
+
+def test_pdf_archive_serves_from_disk_and_revalidates(tmp_path, stub_server):
+    """A second fetch is served from the archive; refresh sends a conditional GET and keeps the copy on 304."""
+    from src.http_client import build_session
+    from src.pdf.archive import archive_report, read_ref
+
+    requests_seen = []
+
+    def route(path, query, headers):
+        requests_seen.append(headers.get("If-None-Match"))
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {}, b""
+        return 200, {"ETag": '"v1"'}, b"%PDF-1.4 report"
+
+    server = stub_server(route)
+    session = build_session(retries=0)
+    url = f"{server.url}/2024-01-15_daily_incident_summary.pdf"
+    first = archive_report(url, archive_dir=tmp_path, session=session)
+    second = archive_report(url, archive_dir=tmp_path, session=session)
+    refreshed = archive_report(url, refresh=True, archive_dir=tmp_path, session=session)
+
+    assert first == second == refreshed
+    assert first.read_bytes() == b"%PDF-1.4 report"
+    assert requests_seen == [None, '"v1"']
+    assert read_ref(url, tmp_path)["etag"] == '"v1"'
@@ -0,0 +1,41 @@
+"""
+Tests for the pluggable storage backends, src.db.backend (embedded DuckDB, no server).
+Run from repo root: python -m pytest tests/test_backend.py -v
+"""
+
+
+# --- Storage backends (embedded DuckDB, no server) ---
+
+def test_duckdb_backend_runs_load_upsert_and_rollups(duckdb_conn):
+    """A duckdb:// DATABASE_URL gives an embedded database the load, upsert and rollup code runs on unchanged."""
+    from src.db.backend import DUCKDB, backend_for
+    from src.db.incidents import populate_incidents, upsert_incidents
+    from src.db.rollups import refresh_rollups, rollup_counts
+
+    incidents = [
+        [["1/2/2026 0:03", "1/2/2026 0:03", "1/2/2026 1:10"]],
+        [["2026-00000001", "2026-00000002", "2026-00000003"]],
+        [["1200 W MAIN ST", "1200 W MAIN ST", "101 E GRAY ST"]],
+        [["Alarm", "Medical", "Larceny"]],
+        [["OK0140200", "EMSSTAT", "OK0140200"]],
+    ]
+    conn = duckdb_conn("incident", "location", "enrichment", "enrichment_state", "rollup")
+    assert backend_for(conn) is DUCKDB
+    assert populate_incidents(conn, incidents) == 3
+    assert populate_incidents(conn, incidents) == 0
+
+    incidents[3][0][2] = "Burglary"
+    assert upsert_incidents(conn, incidents) == {"new": 0, "updated": 1, "unchanged": 2}
+    with conn.cursor() as cur:
+        cur.execute("SELECT incident_num, emsstat FROM incidents WHERE location = %s ORDER BY 1", ("1200 W MAIN ST",))
+        assert cur.fetchall() == [("2026-00000001", 1), ("2026-00000002", 1)]
+
+    assert refresh_rollups(conn) == 1
+    assert rollup_counts(conn, ["nature"]) == [("Alarm", 1), ("Burglary", 1), ("Medical", 1)]
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM incidents")
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM incidents")
+        assert cur.fetchone() == (3,)
@@ -0,0 +1,76 @@
+"""
+Tests for beat polygons, src.geo.polygons and src.enrich.beats (GeoJSON layer, embedded DuckDB).
+Run from repo root: python -m pytest tests/test_beats.py -v
+"""
+
+
+# --- Beat polygons (GeoJSON layer, grid index, embedded DuckDB) ---
+
+def _beats_geojson(path, east_name="East"):
+    """Two beats: West (a square with a hole) and East (two squares, as a MultiPolygon)."""
+    import json
+
+    square = lambda x0, y0, x1, y1: [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+    features = [
+        {"type": "Feature", "properties": {"name": "West"},
+         "geometry": {"type": "Polygon", "coordinates": [square(-97.50, 35.20, -97.45, 35.25), square(-97.48, 35.22, -97.47, 35.23)]}},
+        {"type": "Feature", "properties": {"name": east_name},
+         "geometry": {"type": "MultiPolygon", "coordinates": [[square(-97.45, 35.20, -97.40, 35.25)], [square(-97.38, 35.20, -97.37, 35.21)]]}},
+    ]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8")
+    return str(path)
+
+
+def test_polygon_grid_index_agrees_with_ray_casting(tmp_path):
+    """Interior cells answer directly, boundary cells fall back to ray casting; holes and MultiPolygon parts count."""
+    import random
+    from src.geo.polygons import GridIndex, contains, load_polygons
+
+    polygons = load_polygons(_beats_geojson(tmp_path / "beats.geojson"))
+    index = GridIndex(polygons, grid_size=32)
+    assert index.lookup(35.21, -97.49) == "West"
+    assert index.lookup(35.225, -97.475) is None  # in the hole
+    assert index.lookup(35.205, -97.375) == "East"
+    assert index.lookup(35.30, -97.49) is None
+    rng = random.Random(7)
+    for _ in range(2000):
+        lat, lon = rng.uniform(35.19, 35.26), rng.uniform(-97.51, -97.36)
+        expected = next((p.name for p in polygons if contains(p, lon, lat)), None)
+        assert index.lookup(lat, lon) == expected
+
+
+def test_beats_are_assigned_once_per_location_and_again_when_polygons_change(tmp_path, duckdb_conn):
+    """Only locations not yet assigned with the current layer are looked at; changed beats go to the change feed."""
+    from src.db.changes import read_changes
+    from src.db.incidents import populate_incidents
+    from src.enrich.beats import assign_beats
+
+    path = _beats_geojson(tmp_path / "beats.geojson")
+    incidents = [
+        [["1/2/2026 0:03", "1/2/2026 1:10"]], [["2026-00000001", "2026-00000002"]],
+        [["WEST ST", "EAST ST"]], [["Alarm", "Alarm"]], [["OK0140200", "OK0140200"]],
+    ]
+    conn = duckdb_conn("incident", "location", "enrichment")
+    populate_incidents(conn, incidents)
+    with conn.cursor() as cur:
+        for loc, lat, lon in [("WEST ST", 35.21, -97.49), ("EAST ST", 35.21, -97.42), ("FAR RD", 36.0, -97.0), ("UNKNOWN", None, None)]:
+            cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s)", (loc, lat, lon))
+    conn.commit()
+    seen = read_changes(conn)[-1].seq
+
+    assert assign_beats(conn, path) == 3
+    assert assign_beats(conn, path) == 0
+    with conn.cursor() as cur:
+        cur.execute("SELECT incident_num, beat FROM incidents_enriched ORDER BY 1")
+        assert cur.fetchall() == [("2026-00000001", "West"), ("2026-00000002", "East")]
+        cur.execute("SELECT beat FROM location WHERE loc = 'FAR RD'")
+        assert cur.fetchone() == (None,)
+    changes = read_changes(conn, after=seen)
+    assert sorted((c.kind, c.incident_num) for c in changes) == [("beat", "2026-00000001"), ("beat", "2026-00000002")]
+
+    _beats_geojson(tmp_path / "beats.geojson", east_name="Downtown")
+    assert assign_beats(conn, path) == 3
+    with conn.cursor() as cur:
+        cur.execute("SELECT beat FROM incidents_enriched ORDER BY incident_num")
+        assert [row[0] for row in cur.fetchall()] == ["West", "Downtown"]
+    assert [(c.kind, c.incident_num) for c in read_changes(conn, after=changes[-1].seq)] == [("beat", "2026-00000002")]
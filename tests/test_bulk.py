@@ -0,0 +1,32 @@
+"""
+Tests for the bulk write-back layer, src.db.bulk (mocked DB).
+Run from repo root: python -m pytest tests/test_bulk.py -v
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+
+# --- Bulk write-back (mocked DB) ---
+
+def test_bulk_writer_copies_escaped_rows_and_applies_once_per_flush():
+    """Rows are COPYed in text format (NULLs, tabs, backslashes escaped) and applied with one statement per flush."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.db.bulk import BulkWriter
+
+    db = MagicMock()
+    cur = db.cursor.return_value.__enter__.return_value
+    cur.rowcount = 2
+    copied = []
+    cur.copy_expert.side_effect = lambda sql, buffer: copied.append(buffer.read().decode("utf-8"))
+
+    with BulkWriter(db, "t", [("loc", "text"), ("n", "integer")], "UPDATE x SET n = b.n FROM {table} b", flush_size=2) as writer:
+        writer.add("A\tB", None)
+        writer.add("C\\D", 3)
+        writer.add("E", 4)
+
+    assert copied == ["A\\tB\t\\N\nC\\\\D\t3\n", "E\t4\n"]
+    applied = [c for c in cur.execute.call_args_list if c[0][0].startswith("UPDATE")]
+    assert [c[0][0] for c in applied] == ["UPDATE x SET n = b.n FROM bulk_t b"] * 2
+    assert writer.rows_written == 4
+    db.commit.assert_not_called()
@@ -0,0 +1,43 @@
+"""
+Tests for warm-cache bundles, src.enrich.cache_bundle (embedded DuckDB, local stub server).
+Run from repo root: python -m pytest tests/test_cache_bundle.py -v
+"""
+
+
+# --- Warm-cache bundles (embedded DuckDB, local server) ---
+
+def test_cache_bundle_round_trips_geocodes_and_cached_weather_responses(tmp_path, monkeypatch, duckdb_conn, stub_server):
+    """Export then import into an empty database and cache: negative geocodes survive and weather is served offline."""
+    from src.enrich import weather
+    from src.enrich.cache_bundle import export_bundle, import_bundle
+
+    server = stub_server(lambda path, query, headers: (200, {}, b"hourly weather codes"))
+    url = f"{server.url}/v1/archive?latitude=35.22&longitude=-97.44"
+    monkeypatch.setattr(weather, "_cache_session", weather.CachedSessionWithTimeout(str(tmp_path / "warm"), expire_after=-1))
+    assert weather._cache_session.get(url).from_cache is False
+    server.stop()
+
+    bundle = str(tmp_path / "bundle.jsonl.gz")
+    conn = duckdb_conn("location")
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s)", ("101 E GRAY ST", 35.22, -97.44))
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, NULL, NULL)", ("NOWHERE RD",))
+    conn.commit()
+    assert export_bundle(conn, bundle)["locations"] == 2
+
+    monkeypatch.setattr(weather, "_cache_session", weather.CachedSessionWithTimeout(str(tmp_path / "cold"), expire_after=-1))
+    conn = duckdb_conn()
+    assert import_bundle(conn, bundle) == {"locations": 2, "locations_added": 2, "weather": 1, "weather_added": 1}
+    with conn.cursor() as cur:
+        cur.execute("SELECT loc, latitude IS NULL, geohash IS NULL FROM location ORDER BY loc")
+        assert cur.fetchall() == [("101 E GRAY ST", False, False), ("NOWHERE RD", True, True)]
+    # Entries already present are kept: a second import adds nothing and leaves a fresher local response alone
+    key = next(iter(weather._cache_session.cache.responses.keys()))
+    fresher = weather._cache_session.cache.responses[key]
+    fresher._content = b"fresher local codes"
+    weather._cache_session.cache.responses[key] = fresher
+    assert import_bundle(conn, bundle) == {"locations": 2, "locations_added": 0, "weather": 1, "weather_added": 0}
+    assert weather._cache_session.cache.responses[key].content == b"fresher local codes"
+    # The server is gone: only the imported cache entry can answer
+    response = weather._cache_session.get(url)
+    assert response.from_cache and response.content == b"fresher local codes"
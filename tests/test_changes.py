@@ -0,0 +1,90 @@
+"""
+Tests for the durable change feed, src.db.changes (embedded DuckDB, no network).
+Tests marked postgres run in a scratch schema (see conftest.py).
+Run from repo root: python -m pytest tests/test_changes.py -v
+"""
+import pytest
+
+
+# --- Change feed (embedded DuckDB, no network) ---
+
+def test_change_feed_logs_new_updated_and_enriched_incidents_in_order(monkeypatch, duckdb_conn):
+    """Loader and enrichers log the incidents each batch touched; a reader resumes from the last seq it saw."""
+    from src.db.changes import read_changes
+    from src.db.incidents import populate_incidents, upsert_incidents
+    from src.enrich import geography, weather
+
+    incidents = [
+        [["1/2/2026 0:03", "1/2/2026 1:10"]],
+        [["2026-00000001", "2026-00000002"]],
+        [["101 E GRAY ST", "101 E GRAY ST"]],
+        [["Alarm", "Larceny"]],
+        [["OK0140200", "OK0140200"]],
+    ]
+    monkeypatch.setattr(weather, "fetch_hourly_weather_codes", lambda latitude, longitude, date_str: list(range(24)))
+    conn = duckdb_conn("incident", "location", "enrichment", "enrichment_state", "rollup")
+    assert populate_incidents(conn, incidents) == 2
+    assert populate_incidents(conn, incidents) == 0  # a re-run logs nothing
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s)", ("101 E GRAY ST", 35.22, -97.44))
+    conn.commit()
+    loaded = read_changes(conn)
+    assert [(c.kind, c.incident_num) for c in loaded] == [("new", "2026-00000001"), ("new", "2026-00000002")]
+
+    # A republished report: one new incident, one corrected nature
+    republished = [
+        [["1/2/2026 0:03", "1/2/2026 1:10", "1/2/2026 2:20"]],
+        [["2026-00000001", "2026-00000002", "2026-00000003"]],
+        [["101 E GRAY ST", "101 E GRAY ST", "101 E GRAY ST"]],
+        [["Alarm", "Burglary", "Alarm"]],
+        [["OK0140200", "OK0140200", "OK0140200"]],
+    ]
+    assert upsert_incidents(conn, republished) == {"new": 1, "updated": 1, "unchanged": 1}
+    weather.get_weather(conn)
+    geography.side_of_town(conn)
+
+    after = read_changes(conn, after=loaded[-1].seq)
+    assert [c.seq for c in after] == sorted(c.seq for c in after) and after[0].seq > loaded[-1].seq
+    assert [(c.kind, c.incident_num) for c in after[:2]] == [("new", "2026-00000003"), ("updated", "2026-00000002")]
+    assert {(c.kind, c.incident_num) for c in after[2:]} == {
+        (kind, f"2026-0000000{n}") for kind in ("weather", "side_of_town") for n in (1, 2, 3)
+    }
+    assert read_changes(conn, after=after[-1].seq) == []
+    assert len(read_changes(conn, limit=3)) == 3
+
+
+# --- Following the feed (Postgres LISTEN/NOTIFY, scratch schema) ---
+
+@pytest.mark.postgres
+def test_follower_wakes_on_the_batch_notification_instead_of_its_poll_timeout(postgres_url):
+    """A follower blocked on LISTEN sees a committed batch right away, well before its wait runs out."""
+    import threading
+    import time
+    from src.db.changes import follow_changes
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.incidents import populate_incidents
+    from src.db.schema import create_incident_table
+
+    conn = create_connection()
+    try:
+        create_incident_table(conn)
+        stop = threading.Event()
+        pages = []
+
+        def follow():
+            for page in follow_changes(wait=30, stop=stop):
+                pages.append((time.monotonic(), [(c.kind, c.incident_num) for c in page]))
+                stop.set()
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        time.sleep(0.5)  # the follower has read the empty feed and waits on LISTEN
+        assert not pages
+        populate_incidents(conn, [[["1/2/2026 0:03"]], [["2026-00000001"]], [["101 E GRAY ST"]], [["Alarm"]], [["OK0140200"]]])
+        committed = time.monotonic()
+        follower.join(10)
+        assert not follower.is_alive()
+        assert pages[0][1] == [("new", "2026-00000001")]
+        assert pages[0][0] - committed < 5
+    finally:
+        terminate_connection(conn)
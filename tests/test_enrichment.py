@@ -0,0 +1,150 @@
+"""
+Tests for incremental enrichment, src.db.enrichment: change_seq windows, stage watermarks and checkpoints.
+Embedded DuckDB tests need no server; tests marked postgres run in a scratch schema (see conftest.py).
+Run from repo root: python -m pytest tests/test_enrichment.py -v
+"""
+import pytest
+
+
+# --- Enrichment windows (embedded DuckDB; Postgres for concurrent writers) ---
+
+def test_enrichment_window_skips_processed_rows_and_retries_failed_ones(monkeypatch, duckdb_conn):
+    """Only rows above the watermark are looked at; a failed lookup or an ungeocoded location holds it until retried."""
+    from src.db.enrichment import STAGE_WEATHER, pending_window
+    from src.db.incidents import populate_incidents
+    from src.enrich import weather
+
+    def incidents(rows):
+        return [[[f"{day} 10:00" for day, _, _ in rows]], [[num for _, num, _ in rows]], [[loc for _, _, loc in rows]],
+                [["Alarm"] * len(rows)], [["OK0140200"] * len(rows)]]
+
+    fetched, failing = [], {"2026-01-05"}
+
+    def fake_codes(latitude, longitude, date_str):
+        fetched.append(date_str)
+        if date_str in failing:
+            failing.discard(date_str)
+            raise ConnectionError("Open-Meteo unavailable")
+        return [None] * 24 if date_str == "2026-01-01" else list(range(24))
+
+    def weather_by_num():
+        with conn.cursor() as cur:
+            cur.execute("SELECT incident_num, weather FROM incidents_enriched ORDER BY incident_num")
+            return dict(cur.fetchall())
+
+    monkeypatch.setattr(weather, "fetch_hourly_weather_codes", fake_codes)
+    conn = duckdb_conn("incident", "location", "enrichment", "enrichment_state", "rollup")
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s)", ("101 E GRAY ST", 35.22, -97.44))
+    conn.commit()
+    populate_incidents(conn, incidents([("1/1/2026", "2026-00000001", "101 E GRAY ST"), ("1/2/2026", "2026-00000002", "101 E GRAY ST")]))
+    weather.get_weather(conn)
+    assert fetched == ["2026-01-01", "2026-01-02"]
+    assert pending_window(conn, STAGE_WEATHER) == (2, 2)
+
+    # 1/1 had no data (final): it is below the watermark and not looked up again. 1/5 fails, 1/6 is not geocoded yet.
+    populate_incidents(conn, incidents([
+        ("1/4/2026", "2026-00000004", "101 E GRAY ST"),
+        ("1/5/2026", "2026-00000005", "101 E GRAY ST"),
+        ("1/6/2026", "2026-00000006", "225 N WEBSTER AVE"),
+    ]))
+    fetched.clear()
+    weather.get_weather(conn)
+    assert fetched == ["2026-01-04", "2026-01-05"]
+    assert weather_by_num() == {"2026-00000001": None, "2026-00000002": 10, "2026-00000004": 10, "2026-00000005": None, "2026-00000006": None}
+    assert pending_window(conn, STAGE_WEATHER) == (3, 5)
+
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s)", ("225 N WEBSTER AVE", 35.22, -97.44))
+    conn.commit()
+    fetched.clear()
+    weather.get_weather(conn)
+    assert fetched == ["2026-01-05", "2026-01-06"]
+    assert weather_by_num()["2026-00000005"] == 10 and weather_by_num()["2026-00000006"] == 10
+    assert pending_window(conn, STAGE_WEATHER) == (5, 5)
+
+    fetched.clear()
+    weather.get_weather(conn)
+    assert fetched == []
+    assert pending_window(conn, STAGE_WEATHER) == (5, 5)
+
+
+@pytest.mark.postgres
+def test_pending_window_waits_for_writers_holding_a_lower_change_seq(postgres_url):
+    """A row whose change_seq was drawn before the window is read, but committed after, still falls inside the window."""
+    import threading
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.enrichment import STAGE_WEATHER, lock_change_seq, pending_window
+    from src.db.schema import create_enrichment_state_table, create_incident_table
+
+    writer, stage = create_connection(), create_connection()
+    try:
+        create_incident_table(writer)
+        create_enrichment_state_table(writer)
+        with writer.cursor() as cur:
+            lock_change_seq(cur)
+            cur.execute("INSERT INTO incidents (incident_num, incident_ts, location) VALUES ('2026-00000001', '2026-01-02 10:00', '101 E GRAY ST')")
+        with stage.cursor() as cur:
+            lock_change_seq(cur)
+            cur.execute("INSERT INTO incidents (incident_num, incident_ts, location) VALUES ('2026-00000002', '2026-01-02 11:00', '101 E GRAY ST')")
+        stage.commit()
+
+        windows = []
+        reader = threading.Thread(target=lambda: windows.append(pending_window(stage, STAGE_WEATHER)))
+        reader.start()
+        reader.join(0.3)
+        assert reader.is_alive() and not windows  # seq 1 is drawn but uncommitted; MAX alone would say 2
+        writer.commit()
+        reader.join(5)
+        assert windows == [(0, 2)]
+        with writer.cursor() as cur:
+            cur.execute("SELECT incident_num FROM incidents WHERE change_seq <= 2 ORDER BY change_seq")
+            assert [num for num, in cur.fetchall()] == ["2026-00000001", "2026-00000002"]
+        writer.commit()
+    finally:
+        terminate_connection(writer)
+        terminate_connection(stage)
+
+
+# --- Checkpointed enrichment (embedded DuckDB, no network) ---
+
+def test_weather_checkpoints_let_an_interrupted_run_resume(monkeypatch, duckdb_conn):
+    """A crash mid-stage keeps the committed batches; the next run fetches only what was not checkpointed."""
+    from src.db.incidents import populate_incidents
+    import functools
+    from src.enrich import weather
+
+    class Crash(BaseException):
+        pass
+
+    times = [f"1/2/2026 {h}:00" for h in range(5)]
+    incidents = [[times], [[f"2026-0000000{i}" for i in range(5)]], [["101 E GRAY ST"] * 5], [["Alarm"] * 5], [["OK0140200"] * 5]]
+    fetched, crash_after = [], [3]
+
+    def fake_codes(latitude, longitude, date_str):
+        if len(fetched) == crash_after[0]:
+            crash_after[0] = None
+            raise Crash()
+        fetched.append(date_str)
+        return list(range(24))
+
+    monkeypatch.setattr(weather, "fetch_hourly_weather_codes", fake_codes)
+    monkeypatch.setattr(weather, "StageCheckpoint", functools.partial(weather.StageCheckpoint, every=2))
+    conn = duckdb_conn("incident", "location", "enrichment", "enrichment_state", "rollup")
+    populate_incidents(conn, incidents)
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s)", ("101 E GRAY ST", 35.22, -97.44))
+    conn.commit()
+
+    with pytest.raises(Crash):
+        weather.get_weather(conn)
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute("SELECT time_of_day, weather FROM incidents_enriched ORDER BY 1")
+        assert cur.fetchall() == [(0, 0), (1, 1), (2, None), (3, None), (4, None)]
+
+    weather.get_weather(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT weather FROM incidents_enriched ORDER BY time_of_day")
+        assert [row[0] for row in cur.fetchall()] == [0, 1, 2, 3, 4]
+    assert len(fetched) == 3 + 3  # the third pair was lost with the crash and is fetched again
@@ -0,0 +1,124 @@
+"""
+Tests for the rolling-window incident features, src.db.features, and their refresh in the queue worker.
+Tests marked postgres run in a scratch schema (see conftest.py).
+Run from repo root: python -m pytest tests/test_features.py -v
+"""
+import pytest
+
+
+# --- Rolling-window features (no DB) ---
+
+def test_window_counts_exclude_same_minute_and_split_by_nature():
+    """Prior counts cover [ts - N days, ts); ties at ts are not 'before'; the nature window counts one nature only."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from datetime import datetime
+    from src.db.features import window_counts
+
+    history = [
+        ("a", datetime(2026, 1, 1, 8, 0), "Alarm"),
+        ("b", datetime(2026, 3, 1, 8, 0), "Alarm"),
+        ("c", datetime(2026, 3, 25, 8, 0), "Larceny"),
+        ("d", datetime(2026, 3, 28, 8, 0), "Alarm"),
+        ("e", datetime(2026, 3, 31, 8, 0), "Alarm"),
+        ("f", datetime(2026, 3, 31, 8, 0), "Larceny"),
+    ]
+    assert window_counts(history, datetime(2026, 3, 25)) == [
+        ("c", datetime(2026, 3, 25, 8, 0), 0, 1, 2, 0),
+        ("d", datetime(2026, 3, 28, 8, 0), 1, 2, 3, 1),
+        ("e", datetime(2026, 3, 31, 8, 0), 2, 3, 4, 2),
+        ("f", datetime(2026, 3, 31, 8, 0), 2, 3, 4, 1),
+    ]
+
+
+# --- Features refresh in the worker (Postgres, scratch schema) ---
+
+@pytest.mark.postgres
+def test_worker_features_refresh_runs_one_at_a_time_in_one_transaction(postgres_url, monkeypatch):
+    """Two ranks jobs do not refresh features concurrently, and a job that fails midway leaves the watermark alone."""
+    import threading
+    from src.db import features
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.enrichment import STAGE_FEATURES, pending_window, stage_lock
+    from src.db.incidents import populate_incidents
+    from src.db.schema import create_enrichment_state_table, create_feature_table, create_incident_table
+
+    first, second = create_connection(), create_connection()
+    try:
+        for create in (create_incident_table, create_enrichment_state_table, create_feature_table):
+            create(first)
+        populate_incidents(first, [[[f"1/2/2026 {h}:00" for h in range(3)]], [[f"2026-0000000{i}" for i in range(3)]],
+                                   [["101 E GRAY ST", "225 N WEBSTER AVE", "1 MAIN ST"]], [["Alarm"] * 3], [["OK0140200"] * 3]])
+
+        entered = []
+
+        def other_job():
+            with stage_lock(second, STAGE_FEATURES):
+                entered.append(True)
+
+        with stage_lock(first, STAGE_FEATURES):
+            other = threading.Thread(target=other_job)
+            other.start()
+            other.join(0.3)
+            assert other.is_alive() and not entered
+        other.join(5)
+        assert entered == [True]
+
+        history = features.window_counts
+        calls = []
+
+        def failing_counts(rows, since):
+            calls.append(since)
+            if len(calls) == 2:
+                raise RuntimeError("worker died")
+            return history(rows, since)
+
+        monkeypatch.setattr(features, "window_counts", failing_counts)
+        with pytest.raises(Exception, match="worker died"):
+            with stage_lock(first, STAGE_FEATURES):
+                features.refresh_features(first, checkpoint_every=None)
+        assert pending_window(first, STAGE_FEATURES) == (0, 3)
+        monkeypatch.setattr(features, "window_counts", history)
+        with stage_lock(first, STAGE_FEATURES):
+            assert features.refresh_features(first, checkpoint_every=None) == 3
+        assert pending_window(first, STAGE_FEATURES) == (3, 3)
+    finally:
+        terminate_connection(first)
+        terminate_connection(second)
+
+
+@pytest.mark.postgres
+def test_batch_features_stage_waits_for_a_worker_holding_the_stage_lock(postgres_url, monkeypatch):
+    """post_process refreshes features under the same stage lock as the worker's ranks job."""
+    pytest.importorskip("fitz", reason="PyMuPDF required by src.pipeline; install from requirements.txt")
+    import threading
+    from src.pipeline import main
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.enrichment import STAGE_FEATURES, pending_window, stage_lock
+    from src.db.incidents import populate_incidents
+    from src.db.schema import (
+        create_enrichment_state_table, create_enrichment_tables, create_feature_table, create_incident_table,
+        create_location_table,
+    )
+
+    for stage in ("update_ranks_incidents", "get_location", "get_weather", "side_of_town", "assign_beats", "refresh_rollups"):
+        monkeypatch.setattr(main, stage, lambda conn: None)
+    batch, worker = create_connection(), create_connection()
+    try:
+        for create in (create_incident_table, create_location_table, create_enrichment_tables,
+                       create_enrichment_state_table, create_feature_table):
+            create(batch)
+        populate_incidents(batch, [[[f"1/2/2026 {h}:00" for h in range(3)]], [[f"2026-0000000{i}" for i in range(3)]],
+                                   [["101 E GRAY ST", "225 N WEBSTER AVE", "1 MAIN ST"]], [["Alarm"] * 3], [["OK0140200"] * 3]])
+
+        run = threading.Thread(target=main.post_process, args=(batch,))
+        with stage_lock(worker, STAGE_FEATURES):
+            run.start()
+            run.join(0.5)
+            assert run.is_alive()
+            assert pending_window(worker, STAGE_FEATURES) == (0, 3)
+        run.join(10)
+        assert not run.is_alive()
+        assert pending_window(worker, STAGE_FEATURES) == (3, 3)
+    finally:
+        terminate_connection(batch)
+        terminate_connection(worker)
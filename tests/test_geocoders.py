@@ -0,0 +1,87 @@
+"""
+Tests for the concurrent geocoder pool, src.enrich.geocoders (local stub servers, no live network).
+Run from repo root: python -m pytest tests/test_geocoders.py -v
+"""
+import pytest
+
+
+# --- Geocoder pool (local stub servers, no live network) ---
+
+def test_token_bucket_rate_and_burst():
+    """A bucket hands out `burst` tokens at once, then one per 1/rate seconds."""
+    from src.enrich.geocoders import TokenBucket
+
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.wait_time() == pytest.approx(0.5)
+    now[0] += 0.5
+    assert bucket.try_acquire() and not bucket.try_acquire()
+
+
+def test_geocoder_pool_spreads_load_and_routes_around_failures(stub_server):
+    """Queries are spread over Nominatim and Photon stubs; a dead backend is skipped after its first failure."""
+    import json
+    from src.enrich.geocoders import GeocoderPool, build_backend
+
+    hits = {"/search": 0, "/api": 0}
+
+    def route(path, query, headers):
+        hits[path] += 1
+        if path == "/search":  # Nominatim
+            body = [{"lat": "35.22", "lon": "-97.44", "display_name": "Norman", "place_id": 1}]
+        else:  # Photon
+            body = {"type": "FeatureCollection", "features": [{"type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [-97.44, 35.22]}, "properties": {"name": "Norman"}}]}
+        return 200, {"Content-Type": "application/json"}, json.dumps(body).encode()
+
+    server = stub_server(route)
+    dead = stub_server(route)
+    dead.stop()  # nothing listens there any more
+    pool = GeocoderPool([
+        build_backend("nominatim", dead.url, rate=50, timeout=2),
+        build_backend("nominatim", server.url, rate=50),
+        build_backend("photon", server.url, rate=50),
+    ], max_workers=4)
+    results = list(pool.map(pool.geocode, [f"{i} MAIN ST" for i in range(20)]))
+
+    assert all(r is not None and round(r.latitude, 2) == 35.22 for r in results)
+    assert hits["/search"] > 0 and hits["/api"] > 0
+    assert hits["/search"] + hits["/api"] == 20
+    assert pool.backends[0].failures >= 1 and pool.backends[0].requests <= 4
+
+
+def test_geocoder_pool_waits_out_the_cooldown_when_every_backend_is_down(stub_server, monkeypatch):
+    """With its only backend failing, a query sleeps until the cool-down ends and retries, up to max_wait."""
+    import json
+    import time
+    from src.enrich import geocoders
+    from src.enrich.geocoders import GeocoderPool, NoGeocoderAvailable, build_backend
+
+    monkeypatch.setattr(geocoders, "BACKEND_COOLDOWN", 0.1)
+    failing = {"left": 2}
+
+    def route(path, query, headers):
+        if failing["left"]:
+            failing["left"] -= 1
+            return 500, {"Content-Type": "text/plain"}, b"upstream down"
+        body = [{"lat": "35.22", "lon": "-97.44", "display_name": "Norman", "place_id": 1}]
+        return 200, {"Content-Type": "application/json"}, json.dumps(body).encode()
+
+    server = stub_server(route)
+    pool = GeocoderPool([build_backend("nominatim", server.url, rate=50)], max_wait=5)
+    started = time.monotonic()
+    result = pool.geocode("100 MAIN ST")
+    assert round(result.latitude, 2) == 35.22
+    # Cool-downs of 0.1 s and 0.2 s were slept through before the third request
+    assert time.monotonic() - started >= 0.3
+    assert server.statuses == {500: 2, 200: 1}
+    assert pool.backends[0].failures == 0
+
+    failing["left"] = 100
+    pool.max_wait = 0.5
+    with pytest.raises(NoGeocoderAvailable, match="within 0.5s"):
+        pool.geocode("200 MAIN ST")
+    # 0.1 + 0.2 s of cool-down fit in the deadline, the next 0.4 s does not
+    assert server.statuses[500] == 2 + 3
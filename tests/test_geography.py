@@ -0,0 +1,20 @@
+"""
+Tests for side-of-town bearings, src.enrich.geography (pure functions, no DB).
+Run from repo root: python -m pytest tests/test_geography.py -v
+"""
+import pytest
+
+
+# --- Side of town (pure bearing math) ---
+
+def test_compass_direction_cardinal_points():
+    """Points due north/east/south/west of the town center map to N/E/S/W."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.enrich.geography import compass_direction
+
+    center = (35.2226, -97.4395)
+    assert compass_direction(35.30, -97.4395, center) == "N"
+    assert compass_direction(35.2226, -97.35, center) == "E"
+    assert compass_direction(35.15, -97.4395, center) == "S"
+    assert compass_direction(35.2226, -97.50, center) == "W"
+    assert compass_direction(35.30, -97.35, center) == "NE"
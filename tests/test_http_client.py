@@ -0,0 +1,30 @@
+"""
+Tests for the shared keep-alive HTTP client, src.http_client (local stub server, no live network).
+Run from repo root: python -m pytest tests/test_http_client.py -v
+"""
+import io
+
+
+# --- Shared HTTP client (local server, no live network) ---
+
+def test_http_client_shared_session_is_singleton():
+    """get_session returns one shared session with retrying adapters mounted."""
+    from src.http_client import get_session
+
+    session = get_session()
+    assert get_session() is session
+    assert session.get_adapter("https://example.com").max_retries.total > 0
+
+
+def test_http_client_reuses_connections(stub_server):
+    """Several downloads from one host go over a single keep-alive connection."""
+    from src.http_client import build_session, stream_to
+
+    server = stub_server(lambda path, query, headers: (200, {}, b"%PDF-1.4 " + path.encode()))
+    session = build_session(retries=0)
+    for i in range(5):
+        out = io.BytesIO()
+        stream_to(f"{server.url}/{i}.pdf", out, session=session)
+        assert out.getvalue() == f"%PDF-1.4 /{i}.pdf".encode()
+
+    assert server.connections == 1
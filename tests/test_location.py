@@ -0,0 +1,46 @@
+"""
+Tests for geocoding locations, src.db.location (embedded DuckDB, no network).
+Run from repo root: python -m pytest tests/test_location.py -v
+"""
+import pytest
+
+
+# --- Geocode errors (embedded DuckDB, no network) ---
+
+def test_geocode_errors_are_retried_by_the_next_run(monkeypatch, duckdb_conn):
+    """An address whose geocode errored (e.g. no backend available) is not cached and keeps the watermark below it."""
+    from src.db import location
+    from src.db.enrichment import STAGE_GEOCODE, pending_window
+    from src.db.incidents import populate_incidents
+    from src.enrich.geocoders import NoGeocoderAvailable
+
+    addresses = ["101 E GRAY ST", "225 N WEBSTER AVE", "1 MAIN ST"]
+    geocoded, unavailable = [], {"225 N WEBSTER AVE"}
+
+    def fake_geocode(address):
+        geocoded.append(address)
+        if address in unavailable:
+            unavailable.discard(address)
+            raise NoGeocoderAvailable(address)
+        return None if address == "1 MAIN ST" else (35.22, -97.44)
+
+    class Pool:
+        def map(self, fn, items):
+            return [fn(item) for item in items]
+
+    monkeypatch.setattr(location, "geocode_address", fake_geocode)
+    monkeypatch.setattr(location, "get_geocoder_pool", Pool)
+    conn = duckdb_conn("incident", "location", "enrichment_state")
+    populate_incidents(conn, [[[f"1/2/2026 {h}:00" for h in range(3)]], [[f"2026-0000000{i}" for i in range(3)]],
+                              [addresses], [["Alarm"] * 3], [["OK0140200"] * 3]])
+    location.get_location(conn)
+    assert geocoded == addresses
+    assert pending_window(conn, STAGE_GEOCODE) == (1, 3)
+    with conn.cursor() as cur:
+        cur.execute("SELECT loc, latitude FROM location ORDER BY loc")
+        assert cur.fetchall() == [("1 MAIN ST", None), ("101 E GRAY ST", pytest.approx(35.22))]
+
+    geocoded.clear()
+    location.get_location(conn)
+    assert geocoded == ["225 N WEBSTER AVE"]
+    assert pending_window(conn, STAGE_GEOCODE) == (3, 3)
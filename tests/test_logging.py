@@ -0,0 +1,32 @@
+"""
+Tests for queue-based logging, src.logging_config: per-call-site rate limit and JSON lines.
+Run from repo root: python -m pytest tests/test_logging.py -v
+"""
+
+
+# --- Logging (rate limit, JSON lines) ---
+
+def test_rate_limit_filter_caps_each_call_site_and_reports_suppressed():
+    """Per-item INFO records are capped per call site and window; warnings always pass; JSON keeps extra fields."""
+    import json
+    import logging
+    from src.logging_config import JsonFormatter, RateLimitFilter
+
+    now = [0.0]
+    rate_limit = RateLimitFilter(limit=2, window=60, clock=lambda: now[0])
+
+    def record(msg, level=logging.INFO, **extra):
+        rec = logging.LogRecord("src.db.location", level, __file__, 1, msg, ("101 E GRAY ST",), None)
+        rec.__dict__.update(extra)
+        return rec
+
+    assert [rate_limit.filter(record("Location %s cached")) for _ in range(4)] == [True, True, False, False]
+    assert rate_limit.filter(record("Cache hit for %s"))
+    assert rate_limit.filter(record("Location %s cached", logging.WARNING))
+    now[0] = 61.0
+    passed = record("Location %s cached", stage="geocode")
+    assert rate_limit.filter(passed) and passed.suppressed == 2
+
+    entry = json.loads(JsonFormatter().format(passed))
+    assert entry["message"] == "Location 101 E GRAY ST cached"
+    assert (entry["level"], entry["logger"], entry["stage"], entry["suppressed"]) == ("INFO", "src.db.location", "geocode", 2)
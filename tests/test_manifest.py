@@ -0,0 +1,62 @@
+"""
+Tests for the run manifest and --resume, src.pipeline.manifest (embedded DuckDB file, no network).
+Run from repo root: python -m pytest tests/test_manifest.py -v
+"""
+import pytest
+
+# Require project deps so src.pdf (fitz) can be imported
+pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+
+
+# --- Run manifest and --resume (embedded DuckDB file, no network) ---
+
+def test_resume_skips_loaded_reports_and_completed_stages(monkeypatch, tmp_path, duckdb_conn):
+    """A run that dies in geocoding resumes without re-scraping, re-loading reports or re-running ranks."""
+    from src.pipeline import main
+
+    urls = [f"https://www.normanok.gov/sites/default/files/documents/2026-01/2026-01-0{day}_daily_incident_summary.pdf" for day in (1, 2, 3)]
+    calls = {"scrape": 0, "loaded": [], "stages": []}
+
+    def scrape(conn, recheck_days):
+        calls["scrape"] += 1
+        return urls, [], []
+
+    def ingest(conn, pending, refresh=False, on_loaded=None):
+        for url in pending:
+            calls["loaded"].append(url)
+            on_loaded(url)
+        return {main.KIND_INCIDENT: {"reports": len(pending), "pages": 0, "changed_pages": 0, "extracted": 0, "loaded": 0}}
+
+    def stage(name, fail=False):
+        def step(conn):
+            calls["stages"].append(name)
+            if fail and calls["stages"].count(name) == 1:
+                raise RuntimeError("geocoder unreachable")
+        return step
+
+    monkeypatch.setenv("DATABASE_URL", f"duckdb://{tmp_path / 'runs.duckdb'}")
+    monkeypatch.setattr(main, "scrape_normanpd_pdf_urls", scrape)
+    monkeypatch.setattr(main, "ingest_reports", ingest)
+    for name, attr in [("ranks", "update_ranks_incidents"), ("weather", "get_weather"), ("side_of_town", "side_of_town"),
+                       ("beats", "assign_beats"), ("rollups", "refresh_rollups"), ("features", "refresh_features")]:
+        monkeypatch.setattr(main, attr, stage(name))
+    monkeypatch.setattr(main, "get_location", stage("geocode", fail=True))
+
+    with pytest.raises(RuntimeError):
+        main.run()
+    assert calls == {"scrape": 1, "loaded": urls, "stages": ["ranks", "geocode"]}
+
+    main.run(resume=True)
+    assert calls["scrape"] == 1 and calls["loaded"] == urls
+    assert calls["stages"] == ["ranks", "geocode", "geocode", "weather", "side_of_town", "beats", "rollups", "features"]
+
+    main.run(resume=True)  # nothing left to resume: a new run
+    assert calls["scrape"] == 2
+
+    conn = duckdb_conn(path=tmp_path / "runs.duckdb")
+    with conn.cursor() as cur:
+        cur.execute("SELECT run_id, status, attempts FROM pipeline_runs ORDER BY run_id")
+        assert [tuple(row) for row in cur.fetchall()] == [(1, "completed", 2), (2, "completed", 1)]
+        cur.execute("SELECT stage, status FROM pipeline_run_stages WHERE run_id = 1 ORDER BY started_at, stage")
+        stages = dict(cur.fetchall())
+    assert set(stages.values()) == {"completed"} and len(stages) == 9
@@ -59,24 +59,28 @@ def test_report_date_regex_malformed_url():
 
 # --- fetchincidents (mocked network) ---
 
-def test_fetchincidents_returns_bytes_io():
-    """fetchincidents returns a BytesIO containing the response body."""
+def test_fetchincidents_returns_archived_path(tmp_path):
+    """fetchincidents returns the path of the archived PDF holding the streamed response body."""
     fake_pdf = b"%PDF-1.4 fake content"
-    with patch("src.pdf.fetch_incidents.urlopen") as mock_urlopen:
-        mock_resp = MagicMock()
-        mock_resp.read.return_value = fake_pdf
-        mock_urlopen.return_value = mock_resp
+    response = MagicMock(status_code=200, headers={})
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [fake_pdf[:8], fake_pdf[8:]]
+    with patch("src.pdf.archive.PDF_ARCHIVE_DIR", str(tmp_path)), \
+         patch("src.pdf.archive.get_session") as mock_get_session:
+        mock_get_session.return_value.get.return_value = response
 
         result = fetchincidents("https://example.com/test.pdf")
 
-    assert isinstance(result, io.BytesIO)
-    assert result.read() == fake_pdf
+    assert result.parent.parent == tmp_path / "objects"
+    assert result.read_bytes() == fake_pdf
+    assert not any((tmp_path / "tmp").iterdir())
 
 
-def test_fetchincidents_raises_on_network_error():
-    """fetchincidents raises when urlopen fails."""
-    with patch("src.pdf.fetch_incidents.urlopen") as mock_urlopen:
-        mock_urlopen.side_effect = OSError("Connection refused")
+def test_fetchincidents_raises_on_network_error(tmp_path):
+    """fetchincidents raises when the HTTP request fails."""
+    with patch("src.pdf.archive.PDF_ARCHIVE_DIR", str(tmp_path)), \
+         patch("src.pdf.archive.get_session") as mock_get_session:
+        mock_get_session.return_value.get.side_effect = OSError("Connection refused")
 
         with pytest.raises(Exception) as exc_info:
             fetchincidents("https://example.com/test.pdf")
@@ -0,0 +1,49 @@
+"""
+Tests for the query-plan regression suite, src.bench.plans (canned EXPLAIN output, no DB).
+Run from repo root: python -m pytest tests/test_plans.py -v
+"""
+import pytest
+
+
+# --- Query-plan regression suite (canned EXPLAIN output, no DB) ---
+
+def test_plan_compare_flags_shape_changes_and_slowdowns_beyond_tolerance():
+    """A different plan shape or a median past tolerance (and the ms floor) is a regression; noise is not."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.bench.plans import compare, plan_shape
+
+    index_plan = {"Node Type": "Aggregate", "Strategy": "Hashed", "Plans": [
+        {"Node Type": "Index Scan", "Relation Name": "incidents", "Index Name": "idx_incidents_change_seq"}]}
+    seq_plan = {"Node Type": "Aggregate", "Strategy": "Hashed", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "incidents"}]}
+    assert plan_shape(index_plan) == "Aggregate[Hashed](Index Scan[incidents][idx_incidents_change_seq])"
+
+    baseline = {"queries": {
+        "pending": {"shape": plan_shape(index_plan), "median_ms": 2.0},
+        "rebuild": {"shape": "Result", "median_ms": 100.0},
+    }}
+    noisy = {"queries": {
+        "pending": {"shape": plan_shape(index_plan), "median_ms": 5.0},  # +150% but under the ms floor
+        "rebuild": {"shape": "Result", "median_ms": 140.0},
+    }}
+    assert compare(noisy, baseline, tolerance=0.5) == []
+
+    regressed = {"queries": {
+        "pending": {"shape": plan_shape(seq_plan), "median_ms": 2.0},
+        "rebuild": {"shape": "Result", "median_ms": 160.0},
+    }}
+    problems = compare(regressed, baseline, tolerance=0.5)
+    assert len(problems) == 2
+    assert problems[0].startswith("pending: plan changed") and "Seq Scan[incidents]" in problems[0]
+    assert problems[1].startswith("rebuild: 160.0 ms")
+
+
+def test_suite_names_are_unique_and_cover_the_write_and_read_paths():
+    """Every query has its own baseline key, and the upsert, sketch, change-log and spatial SQL are benched."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.bench.plans import QUERIES
+
+    names = [q.name for q in QUERIES]
+    assert len(names) == len(set(names))
+    assert {"stale_location_ranks", "stale_nature_ranks", "upsert_incidents", "sketch_days", "sketch_upsert",
+            "log_changes", "read_changes", "incidents_within_radius", "incidents_in_bbox"} <= set(names)
@@ -0,0 +1,50 @@
+"""
+Tests for --profile mode, src.profiling.
+Run from repo root: python -m pytest tests/test_profiling.py -v
+"""
+import pytest
+
+
+# --- Profiling mode ---
+
+def test_run_profiler_writes_stage_artifacts(tmp_path):
+    """A profiled stage leaves pstats, allocation, collapsed-stack and summary files; the null profiler is a no-op."""
+    import json
+    import time
+    from src.profiling import NULL_PROFILER, RunProfiler
+
+    profiler = RunProfiler(tmp_path, sample_interval=0.001)
+    with profiler.stage("busy"):
+        deadline = time.perf_counter() + 0.05
+        blocks = []
+        while time.perf_counter() < deadline:
+            blocks.append(bytearray(1024))
+
+    for suffix in (".prof", ".txt", ".alloc.txt", ".collapsed"):
+        assert (tmp_path / f"01_busy{suffix}").stat().st_size > 0
+    assert "test_run_profiler_writes_stage_artifacts" in (tmp_path / "01_busy.collapsed").read_text()
+    summary = json.loads((tmp_path / "summary.json").read_text())
+    assert summary["stages"][0]["stage"] == "busy" and summary["stages"][0]["peak_memory_bytes"] > 0
+
+    with NULL_PROFILER.stage("a"), NULL_PROFILER.stage("b"):
+        pass
+    assert NULL_PROFILER.stage("a") is NULL_PROFILER.stage("b")
+
+
+def test_run_profiler_reports_child_process_cpu(tmp_path):
+    """CPU burnt by a child process reaped during the stage is in the summary and the text report."""
+    import json
+    import subprocess
+    import sys
+    pytest.importorskip("resource", reason="child CPU is measured with resource.getrusage (not on Windows)")
+    from src.profiling import RunProfiler
+
+    profiler = RunProfiler(tmp_path, sample_interval=0.01)
+    with profiler.stage("spawn"):
+        subprocess.run([sys.executable, "-c", "import time\nt = time.process_time()\nwhile time.process_time() - t < 0.3: pass"],
+                       check=True)
+
+    stage = json.loads((tmp_path / "summary.json").read_text())["stages"][0]
+    assert stage["child_cpu_seconds"] >= 0.25
+    assert stage["cpu_seconds"] < stage["child_cpu_seconds"]
+    assert (tmp_path / "01_spawn.txt").read_text().startswith("child processes: ")
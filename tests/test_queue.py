@@ -0,0 +1,209 @@
+"""
+Tests for the Postgres-backed work queue, src.jobs.queue: retry backoff, SKIP LOCKED claiming and lease expiry.
+Tests marked postgres run in a scratch schema (see conftest.py).
+Run from repo root: python -m pytest tests/test_queue.py -v
+"""
+import pytest
+
+
+# --- Work queue retry policy ---
+
+def test_job_retry_delay_backs_off_exponentially_with_cap():
+    """Retry delay doubles per failed attempt and is capped."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.jobs.queue import MAX_RETRY_DELAY, retry_delay
+
+    assert retry_delay(1, base=30) == 30
+    assert retry_delay(2, base=30) == 60
+    assert retry_delay(4, base=30) == 240
+    assert retry_delay(50, base=30) == MAX_RETRY_DELAY
+
+
+# --- Work queue on Postgres (marked postgres; scratch schema) ---
+
+@pytest.mark.postgres
+def test_concurrent_workers_never_claim_the_same_job(postgres_url):
+    """Workers racing on the queue each lease distinct jobs (FOR UPDATE SKIP LOCKED) and together drain it."""
+    import threading
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.schema import create_job_tables
+    from src.jobs.queue import claim_job, enqueue_jobs
+
+    conn = create_connection()
+    create_job_tables(conn)
+    enqueue_jobs(conn, "test", [f"key-{i}" for i in range(40)])
+    conn.commit()
+    terminate_connection(conn)
+
+    claimed: dict[str, list[int]] = {}
+    start = threading.Barrier(4)
+
+    def work(worker_id):
+        db = create_connection()
+        try:
+            start.wait()
+            while (job := claim_job(db, worker_id, ["test"])) is not None:
+                claimed[worker_id].append(job.id)
+        finally:
+            terminate_connection(db)
+
+    threads = []
+    for n in range(4):
+        claimed[f"worker-{n}"] = []
+        threads.append(threading.Thread(target=work, args=(f"worker-{n}",)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ids = [job_id for jobs in claimed.values() for job_id in jobs]
+    assert len(ids) == 40 and len(set(ids)) == 40
+
+
+@pytest.mark.postgres
+def test_expired_lease_is_reclaimed_and_fails_after_max_attempts(postgres_url, monkeypatch):
+    """A job whose worker let the lease lapse goes to the next worker; the stale worker can no longer complete it."""
+    import time
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.schema import create_job_tables
+    from src.jobs import queue
+
+    monkeypatch.setattr(queue, "JOB_MAX_ATTEMPTS", 2)
+    conn = create_connection()
+    try:
+        create_job_tables(conn)
+        queue.enqueue_jobs(conn, "test", ["key"])
+        conn.commit()
+
+        first = queue.claim_job(conn, "crashed", ["test"], lease_seconds=0)
+        assert first.attempts == 1
+        time.sleep(0.01)
+        second = queue.claim_job(conn, "alive", ["test"], lease_seconds=0)
+        assert (second.id, second.attempts) == (first.id, 2)
+        queue.complete_job(conn, first, "crashed")
+        with conn.cursor() as cur:
+            cur.execute("SELECT status, leased_by FROM jobs WHERE id = %s", (first.id,))
+            assert cur.fetchone() == ("running", "alive")
+        conn.commit()
+
+        time.sleep(0.01)
+        assert queue.claim_job(conn, "next", ["test"]) is None
+        with conn.cursor() as cur:
+            cur.execute("SELECT status, attempts, last_error FROM jobs WHERE id = %s", (first.id,))
+            assert cur.fetchone() == ("failed", 2, "lease expired")
+        conn.commit()
+    finally:
+        terminate_connection(conn)
+
+
+@pytest.mark.postgres
+def test_failed_job_is_retried_after_backoff_until_attempts_run_out(postgres_url, monkeypatch):
+    """fail_job schedules the retry retry_delay(attempts) out; the job is not claimable before then."""
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.schema import create_job_tables
+    from src.jobs import queue
+
+    monkeypatch.setattr(queue, "JOB_MAX_ATTEMPTS", 2)
+    conn = create_connection()
+    try:
+        create_job_tables(conn)
+        queue.enqueue_jobs(conn, "test", ["key"])
+        conn.commit()
+
+        job = queue.claim_job(conn, "w", ["test"])
+        queue.fail_job(conn, job, "w", ValueError("boom"))
+        with conn.cursor() as cur:
+            cur.execute("SELECT status, EXTRACT(EPOCH FROM run_after - updated_at), last_error FROM jobs WHERE id = %s", (job.id,))
+            status, delay, error = cur.fetchone()
+        conn.commit()
+        assert (status, float(delay), error) == ("pending", queue.retry_delay(1), "boom")
+        assert queue.claim_job(conn, "w", ["test"]) is None
+
+        with conn.cursor() as cur:
+            cur.execute("UPDATE jobs SET run_after = NOW() - INTERVAL '1 second' WHERE id = %s", (job.id,))
+        conn.commit()
+        retry = queue.claim_job(conn, "w", ["test"])
+        assert (retry.id, retry.attempts) == (job.id, 2)
+        queue.fail_job(conn, retry, "w", ValueError("boom again"))
+        with conn.cursor() as cur:
+            cur.execute("SELECT status, last_error FROM jobs WHERE id = %s", (job.id,))
+            assert cur.fetchone() == ("failed", "boom again")
+        conn.commit()
+    finally:
+        terminate_connection(conn)
+
+
+# --- Worker jobs on Postgres (stub report site; marked postgres) ---
+
+@pytest.mark.postgres
+def test_retried_fetch_requeues_its_followups_and_watermarks_stop_below_unfinished_rows(postgres_url, tmp_path, monkeypatch):
+    """A fetch whose follow-ups failed queues them on retry; the watermarks job moves each stage up to its unfinished rows."""
+    pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.enrichment import STAGE_GEOCODE, STAGE_ROLLUP, STAGE_WEATHER, pending_window
+    from src.db.report_pages import load_fingerprints
+    from src.jobs import worker
+    from src.jobs.queue import claim_job, complete_job, enqueue_jobs, fail_job, job_counts
+    from src.sim.stubs import ReportSite, start_stubs
+
+    monkeypatch.setattr("src.pdf.archive.PDF_ARCHIVE_DIR", str(tmp_path))
+    site = ReportSite(days=1, incidents_per_day=12, addresses=6)
+    stubs = start_stubs(site)
+    conn = create_connection()
+    try:
+        day = site.days[0]
+        url = f"{stubs.site.url}/sites/default/files/documents/{day:%Y-%m}/{day:%Y-%m-%d}_daily_incident_summary.pdf"
+        worker.ensure_schema(conn)
+        enqueue_jobs(conn, worker.KIND_FETCH, [url], worker.PRIORITIES[worker.KIND_FETCH])
+        conn.commit()
+
+        def broken(db, addresses):
+            raise RuntimeError("geocode queue unavailable")
+
+        job = claim_job(conn, "w", [worker.KIND_FETCH])
+        with monkeypatch.context() as m:
+            m.setattr(worker, "_enqueue_followups", broken)
+            with pytest.raises(RuntimeError):
+                worker.handle_fetch(conn, job)
+        conn.rollback()
+        fail_job(conn, job, "w", RuntimeError("geocode queue unavailable"))
+        assert load_fingerprints(conn, [url]) == {}
+
+        with conn.cursor() as cur:
+            cur.execute("UPDATE jobs SET run_after = NOW() WHERE id = %s", (job.id,))
+        conn.commit()
+        job = claim_job(conn, "w", [worker.KIND_FETCH])
+        worker.handle_fetch(conn, job)
+        complete_job(conn, job, "w")
+        counts = job_counts(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT location FROM incidents ORDER BY 1")
+            addresses = [row[0] for row in cur.fetchall()]
+        assert counts[(worker.KIND_GEOCODE, "pending")] == len(addresses)
+        assert counts[(worker.KIND_RANKS, "pending")] == counts[(worker.KIND_WATERMARKS, "pending")] == 1
+        assert len(load_fingerprints(conn, [url])[url]) >= 1
+
+        # Unchanged on a second fetch: nothing is parsed or queued again
+        worker.handle_fetch(conn, job)
+        assert job_counts(conn) == counts
+
+        # One address still waits for its geocode job; the others were not found (no weather to fetch)
+        waiting = addresses[-1]
+        with conn.cursor() as cur:
+            cur.executemany("INSERT INTO location (loc) VALUES (%s)", [(a,) for a in addresses[:-1]])
+            cur.execute("SELECT MIN(change_seq) FROM incidents WHERE location = %s", (waiting,))
+            first_waiting = cur.fetchone()[0]
+            cur.execute("SELECT MAX(change_seq) FROM incidents")
+            high = cur.fetchone()[0]
+        conn.commit()
+        watermarks = worker.advance_stage_watermarks(conn)
+        assert watermarks[STAGE_GEOCODE] == watermarks[STAGE_WEATHER] == first_waiting - 1
+        assert watermarks[STAGE_ROLLUP] == high
+        assert pending_window(conn, STAGE_ROLLUP) == (high, high)
+
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO location (loc) VALUES (%s)", (waiting,))
+        conn.commit()
+        assert set(worker.advance_stage_watermarks(conn).values()) == {high}
+    finally:
+        terminate_connection(conn)
+        stubs.stop()
@@ -0,0 +1,109 @@
+"""
+Tests for change-detecting incident upserts, src.db.incidents, and directory replay, src.pipeline.replay.
+Run from repo root: python -m pytest tests/test_replay.py -v
+"""
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+# Require project deps so src.pdf (fitz) can be imported
+pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+
+
+# --- Replay upserts (mocked DB) ---
+
+def test_upsert_incidents_dedupes_and_applies_emsstat_before_compare():
+    """One row per incident number is sent, EMSSTAT is shared by same time/place rows, and counts come from RETURNING."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.db.incidents import upsert_incidents
+
+    incidents = [
+        [["1/2/2026 0:03", "1/2/2026 0:03", "1/2/2026 1:10"]],
+        [["2026-00000001", "2026-00000002", "2026-00000001"]],
+        [["1200 W MAIN ST", "1200 W MAIN ST", "101 E GRAY ST"]],
+        [["Alarm", "Medical", "Larceny"]],
+        [["OK0140200", "EMSSTAT", "OK0140200"]],
+    ]
+    db = MagicMock()
+    db.cursor.return_value.__enter__.return_value.fetchall.return_value = []
+    with patch("src.db.incidents.execute_values") as mock_execute_values, \
+         patch("src.db.incidents.notify_batch"), \
+         patch("src.db.incidents.log_changes") as mock_log_changes, \
+         patch("src.db.incidents.refresh_sketch_days"), \
+         patch("src.db.incidents.add_to_sketches") as mock_add_to_sketches:
+        mock_execute_values.return_value = [("2026-00000002", 1)]
+        counts = upsert_incidents(db, incidents, parser_version=7)
+
+    values = mock_execute_values.call_args[0][2]
+    assert [v[0] for v in values] == ["2026-00000001", "2026-00000002"]
+    assert values[0][4] == "101 E GRAY ST" and values[0][6] == 0  # last occurrence wins
+    assert values[1][6] == 1 and values[1][7] == 7
+    assert counts == {"new": 1, "updated": 0, "unchanged": 1}
+    assert [c[0][1:] for c in mock_log_changes.call_args_list] == [("new", ["2026-00000002"]), ("updated", [])]
+    assert [row[1:] for row in mock_add_to_sketches.call_args[0][1]] == [("1200 W MAIN ST", "Medical")]
+    db.commit.assert_called_once()
+
+
+# --- Parser version bumps (embedded DuckDB) ---
+
+def test_parser_version_bump_restamps_unchanged_rows_without_a_new_change_seq(duckdb_conn):
+    """Rows a newer parser reads identically take its version but keep their change_seq; changed rows get both."""
+    from src.db.changes import read_changes
+    from src.db.incidents import upsert_incidents
+
+    def report(nature):
+        return [[["1/2/2026 0:03", "1/2/2026 1:10"]], [["2026-00000001", "2026-00000002"]],
+                [["101 E GRAY ST", "1200 W MAIN ST"]], [["Alarm", nature]], [["OK0140200", "OK0140200"]]]
+
+    def stored():
+        with conn.cursor() as cur:
+            cur.execute("SELECT incident_num, parser_version, change_seq FROM incidents ORDER BY incident_num")
+            return [tuple(row) for row in cur.fetchall()]
+
+    conn = duckdb_conn("incident", "location", "enrichment", "rollup")
+    assert upsert_incidents(conn, report("Larceny"), parser_version=1) == {"new": 2, "updated": 0, "unchanged": 0}
+    assert stored() == [("2026-00000001", 1, 1), ("2026-00000002", 1, 2)]
+    logged = len(read_changes(conn))
+
+    assert upsert_incidents(conn, report("Larceny"), parser_version=2) == {"new": 0, "updated": 0, "unchanged": 2}
+    assert stored() == [("2026-00000001", 2, 1), ("2026-00000002", 2, 2)]
+    assert len(read_changes(conn)) == logged
+
+    assert upsert_incidents(conn, report("Burglary"), parser_version=3) == {"new": 0, "updated": 1, "unchanged": 1}
+    (_, _, kept), (_, _, rewritten) = stored()
+    assert [row[:2] for row in stored()] == [("2026-00000001", 3), ("2026-00000002", 3)] and kept == 1 and rewritten > 2
+    assert [(c.kind, c.incident_num) for c in read_changes(conn)[logged:]] == [("updated", "2026-00000002")]
+
+
+# --- Directory replay (PDF archive from the stub site, embedded DuckDB) ---
+
+def test_replay_applies_current_archive_objects_in_report_date_order(tmp_path, duckdb_conn):
+    """A republished report's superseded object is skipped; the corrected rows are the ones loaded."""
+    from src.http_client import build_session
+    from src.pdf.archive import archive_report
+    from src.pipeline.replay import replay_directory, replay_sources
+    from src.sim.stubs import ReportSite, start_stubs
+
+    site = ReportSite(days=3, incidents_per_day=5, addresses=10)
+    stubs = start_stubs(site)
+    try:
+        session = build_session(retries=0)
+        urls = [f"{stubs.site.url}/sites/default/files/documents/{day:%Y-%m}/{day:%Y-%m-%d}_daily_incident_summary.pdf"
+                for day in site.days]
+        for url in reversed(urls):
+            archive_report(url, archive_dir=tmp_path, session=session)
+        site.republish(site.days[1])
+        archive_report(urls[1], refresh=True, archive_dir=tmp_path, session=session)
+    finally:
+        stubs.stop()
+
+    assert len(list((tmp_path / "objects").rglob("*.pdf"))) == 4
+    assert [url for _, url in replay_sources(tmp_path)] == urls
+
+    conn = duckdb_conn("incident", "location", "enrichment", "rollup", "report_pages")
+    totals = replay_directory(conn, tmp_path, workers=2)
+    assert totals["new"] == sum(len(site.rows(day)) for day in site.days) and totals["failed_reports"] == 0
+    corrected = site.rows(site.days[1])[-1]
+    with conn.cursor() as cur:
+        cur.execute("SELECT nature FROM incidents WHERE incident_num = %s", (corrected[1],))
+        assert cur.fetchone()[0] == f"{corrected[3] or 'Follow Up'} (Corrected 1)"
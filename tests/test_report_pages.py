@@ -0,0 +1,37 @@
+"""
+Tests for page fingerprints of republished reports, src.db.report_pages (generated PDF, no DB).
+Run from repo root: python -m pytest tests/test_report_pages.py -v
+"""
+import pytest
+
+# Require project deps so src.pdf (fitz) can be imported
+pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+
+
+# --- Page fingerprints (generated PDF, no DB) ---
+
+def test_republished_report_parses_only_pages_whose_fingerprint_changed(tmp_path):
+    """Known fingerprints skip identical pages; a corrected page is the only one parsed again."""
+    import fitz
+    from src.pdf.parse_cases import extract_case_pages
+
+    def summary(path, pages):
+        doc = fitz.open()
+        for rows in pages:
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(20, 20, 580, 40), "Date / Time Case Number Location Offense")
+            for i, row in enumerate(rows):
+                page.insert_textbox(fitz.Rect(20, 60 + i * 70, 580, 120 + i * 70), "\n".join(row), fontsize=8)
+        doc.save(path)
+        return path
+
+    first = [["1/2/2026 0:03", "2026-00000101", "1200 W MAIN ST", "LARCENY"]]
+    second = [["1/2/2026 1:10", "2026-00000102", "101 E GRAY ST", "BURGLARY"]]
+    fingerprints, rows = extract_case_pages(summary(tmp_path / "a.pdf", [first, second]))
+    assert len(fingerprints) == 2 and [row[1] for row in rows] == ["2026-00000101", "2026-00000102"]
+
+    assert extract_case_pages(summary(tmp_path / "b.pdf", [first, second]), fingerprints) == (fingerprints, [])
+    corrected = [["1/2/2026 1:10", "2026-00000102", "101 E GRAY ST", "FRAUD"]]
+    new_fingerprints, rows = extract_case_pages(summary(tmp_path / "c.pdf", [first, corrected]), fingerprints)
+    assert new_fingerprints[0] == fingerprints[0] and new_fingerprints[1] != fingerprints[1]
+    assert rows == [["1/2/2026 1:10", "2026-00000102", "101 E GRAY ST", "FRAUD"]]
@@ -0,0 +1,40 @@
+"""
+Tests for the case and arrest summary parsers, src.pdf.parse_cases and src.pdf.parse_arrests (no network, no DB).
+Run from repo root: python -m pytest tests/test_reports.py -v
+"""
+import pytest
+
+# Require project deps so src.pdf (fitz) can be imported
+pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+
+
+# --- Case and arrest reports (no network, no DB) ---
+
+def test_case_and_arrest_rows_fit_wrapped_and_blank_cells():
+    """Wrapped cells are joined into the wrap column, blank cells padded at the optional columns; URLs name the report type."""
+    pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.pdf.parse_arrests import ARREST_COLUMNS, ARREST_OPTIONAL_COLUMNS, ARREST_WRAP_COLUMN, ARREST_WRAP_JOINER
+    from src.pdf.parse_cases import CASE_COLUMNS, CASE_OPTIONAL_COLUMNS, CASE_WRAP_COLUMN
+    from src.pdf.tables import split_row
+    from src.pipeline.ingest import report_kind
+
+    def case(*lines):
+        return split_row(lines, len(CASE_COLUMNS), CASE_WRAP_COLUMN, CASE_OPTIONAL_COLUMNS)
+
+    assert case("1/2/2026 1:10", "2026-00000102", "36TH AVE NW / W ROBINSON", "ST", "BURGLARY") == [
+        "1/2/2026 1:10", "2026-00000102", "36TH AVE NW / W ROBINSONST", "BURGLARY"]
+    assert case("1/2/2026 2:20", "2026-00000103", "101 E GRAY ST") == ["1/2/2026 2:20", "2026-00000103", "101 E GRAY ST", ""]
+
+    def arrest(*lines):
+        return split_row(lines, len(ARREST_COLUMNS), ARREST_WRAP_COLUMN, ARREST_OPTIONAL_COLUMNS, ARREST_WRAP_JOINER)
+
+    full = arrest("1/2/2026 3:00", "2026-00000101", "1200 W MAIN ST", "LARCENY", "DOE, JOHN", "4/5/1990",
+                  "12 ELM ST", "NORMAN, OK 73069", "FDBDC", "1234 - SMITH")
+    assert full[5:8] == ["4/5/1990", "12 ELM ST NORMAN, OK 73069", "FDBDC"]
+    no_address = arrest("1/2/2026 4:00", "2026-00000102", "101 E GRAY ST", "DUI", "ROE, JANE", "1/1/1980", "Arrested", "5678 - JONES")
+    assert no_address[5:] == ["1/1/1980", "", "Arrested", "5678 - JONES"]
+
+    base = "https://www.normanok.gov/sites/default/files/documents/2026-01/2026-01-02_daily_"
+    assert [report_kind(base + f"{kind}_summary.pdf") for kind in ("incident", "case", "arrest")] == ["incident", "case", "arrest"]
+    assert report_kind("/archive/objects/ab/abcdef.pdf") == "incident"
@@ -0,0 +1,96 @@
+"""
+Tests for the incrementally maintained rollups, src.db.rollups, and the rollup query API (embedded DuckDB or mocked DB).
+Tests marked postgres run in a scratch schema (see conftest.py).
+Run from repo root: python -m pytest tests/test_rollups.py -v
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+
+# --- Rollups rebuilt by enrichment writes (embedded DuckDB, no network) ---
+
+def test_weather_and_side_of_town_writes_rebuild_the_rollups_of_their_days(monkeypatch, duckdb_conn):
+    """Rollups of an already-rolled-up day follow enrichment that lands later, without a new change_seq."""
+    from src.db.incidents import populate_incidents
+    from src.db.rollups import refresh_rollups
+    from src.enrich import weather
+    from src.enrich.geography import side_of_town
+
+    def rollup():
+        with conn.cursor() as cur:
+            cur.execute("SELECT day, side_of_town, weather, SUM(incidents) FROM incident_rollup GROUP BY 1, 2, 3 ORDER BY 1, 2, 3")
+            return [(str(day), side, code, int(n)) for day, side, code, n in cur.fetchall()]
+
+    monkeypatch.setattr(weather, "fetch_hourly_weather_codes", lambda latitude, longitude, date_str: list(range(24)))
+    conn = duckdb_conn("incident", "location", "enrichment", "enrichment_state", "rollup")
+    populate_incidents(conn, [[["1/2/2026 3:00", "1/3/2026 4:00"]], [["2026-00000001", "2026-00000002"]],
+                              [["101 E GRAY ST", "101 E GRAY ST"]], [["Alarm", "Alarm"]], [["OK0140200", "OK0140200"]]])
+    refresh_rollups(conn)
+    assert rollup() == [("2026-01-02", None, None, 1), ("2026-01-03", None, None, 1)]
+
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES (%s, %s, %s)", ("101 E GRAY ST", 35.30, -97.44))
+    conn.commit()
+    weather.get_weather(conn)
+    side_of_town(conn)
+    assert rollup() == [("2026-01-02", "N", 3, 1), ("2026-01-03", "N", 4, 1)]
+
+
+# --- Rollup query API ---
+
+def test_rollup_counts_rejects_unknown_dimension():
+    """Only rollup columns can be grouped or filtered on (they are interpolated into SQL)."""
+    pytest.importorskip("psycopg2", reason="psycopg2 required; install from requirements.txt")
+    from src.db.rollups import rollup_counts
+
+    db = MagicMock()
+    with pytest.raises(ValueError):
+        rollup_counts(db, ["nature; DROP TABLE incidents"])
+    with pytest.raises(ValueError):
+        rollup_counts(db, ["nature"], filters={"location": "x"})
+    db.cursor.assert_not_called()
+
+
+# --- Concurrent rebuilds (Postgres, scratch schema) ---
+
+@pytest.mark.postgres
+def test_concurrent_rebuilds_of_a_day_wait_for_each_other_and_count_once(postgres_url):
+    """A second rebuild of a day waits for the first to commit, then replaces its rows instead of adding to them."""
+    import threading
+    from datetime import date
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.incidents import populate_incidents
+    from src.db.rollups import refresh_rollup_days, refresh_rollups
+    from src.db.schema import (
+        create_enrichment_state_table, create_enrichment_tables, create_incident_table, create_location_table, create_rollup_table,
+    )
+
+    first, second = create_connection(), create_connection()
+    try:
+        for create in (create_incident_table, create_location_table, create_enrichment_tables, create_enrichment_state_table, create_rollup_table):
+            create(first)
+        populate_incidents(first, [[[f"1/2/2026 {h}:00" for h in range(3)]], [[f"2026-0000000{i}" for i in range(3)]],
+                                   [["101 E GRAY ST"] * 3], [["Alarm"] * 3], [["OK0140200"] * 3]])
+        refresh_rollups(first)
+        day = date(2026, 1, 2)
+
+        def other_rebuild():
+            refresh_rollup_days(second, [day])
+            second.commit()
+
+        refresh_rollup_days(first, [day])  # left uncommitted: holds the day's lock
+        other = threading.Thread(target=other_rebuild)
+        other.start()
+        other.join(0.3)
+        assert other.is_alive()
+        first.commit()
+        other.join(5)
+        assert not other.is_alive()
+        with first.cursor() as cur:
+            cur.execute("SELECT SUM(incidents) FROM incident_rollup WHERE day = %s", (day,))
+            assert cur.fetchone()[0] == 3
+        first.rollback()
+    finally:
+        terminate_connection(first)
+        terminate_connection(second)
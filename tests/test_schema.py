@@ -0,0 +1,96 @@
+"""
+Tests for the enrichment side tables and query API indexes, src.db.schema (embedded DuckDB; Postgres tests run in
+a scratch schema, see conftest.py).
+Run from repo root: python -m pytest tests/test_schema.py -v
+"""
+import pytest
+
+
+# --- Enrichment side tables (embedded DuckDB, no server) ---
+
+def test_enrichment_side_tables_migrate_legacy_columns_and_follow_upserts(duckdb_conn):
+    """Old incidents columns move to the side tables; ranks and weather are written there and read via the view."""
+    from src.db.incidents import populate_incidents, update_ranks_incidents, upsert_incidents
+    from src.db.schema import create_enrichment_tables
+
+    incidents = [
+        [["1/2/2026 0:03", "1/2/2026 1:10", "1/2/2026 2:20"]],
+        [["2026-00000001", "2026-00000002", "2026-00000003"]],
+        [["1200 W MAIN ST", "1200 W MAIN ST", "101 E GRAY ST"]],
+        [["Alarm", "Alarm", "Larceny"]],
+        [["OK0140200", "OK0140200", "OK0140200"]],
+    ]
+    conn = duckdb_conn("incident", "location", "rollup")
+    populate_incidents(conn, incidents)
+    with conn.cursor() as cur:
+        # A database from before the side tables
+        cur.execute("ALTER TABLE incidents ADD COLUMN weather INTEGER")
+        cur.execute("ALTER TABLE incidents ADD COLUMN side_of_town TEXT")
+        cur.execute("UPDATE incidents SET weather = 3, side_of_town = 'NE' WHERE location = '1200 W MAIN ST'")
+        cur.execute("INSERT INTO location (loc, latitude, longitude) VALUES ('1200 W MAIN ST', 35.22, -97.45)")
+    conn.commit()
+
+    create_enrichment_tables(conn)
+    update_ranks_incidents(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'incidents'")
+        assert not {"weather", "side_of_town"} & {row[0] for row in cur.fetchall()}
+        cur.execute("SELECT incident_num, weather, side_of_town, location_rank, incident_rank FROM incidents_enriched ORDER BY 1")
+        assert cur.fetchall() == [
+            ("2026-00000001", 3, "NE", 1, 1), ("2026-00000002", 3, "NE", 1, 1), ("2026-00000003", None, None, 2, 2),
+        ]
+
+    # Moving an incident clears its weather and re-ranks; unchanged ranks are not rewritten
+    incidents[2][0][1] = "101 E GRAY ST"
+    assert upsert_incidents(conn, incidents)["updated"] == 1
+    update_ranks_incidents(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT incident_num, weather, side_of_town, location_rank FROM incidents_enriched ORDER BY 1")
+        assert cur.fetchall() == [
+            ("2026-00000001", 3, "NE", 2), ("2026-00000002", None, None, 1), ("2026-00000003", None, None, 1),
+        ]
+
+
+# --- Query API indexes on Postgres (marked postgres; scratch schema) ---
+
+@pytest.mark.postgres
+def test_side_of_town_and_rank_filters_start_from_the_side_table_indexes(postgres_url):
+    """The side of town / location rank filters read the location and location_ranks indexes, then incidents by location."""
+    from src.api.queries import list_incidents
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.incidents import populate_incidents, update_ranks_incidents
+    from src.db.schema import create_enrichment_tables, create_incident_table, create_location_table, create_query_indexes
+
+    incidents = [
+        [["1/2/2026 0:03", "1/2/2026 1:10", "1/2/2026 2:20", "1/2/2026 3:30"]],
+        [["2026-00000001", "2026-00000002", "2026-00000003", "2026-00000004"]],
+        [["1200 W MAIN ST", "1200 W MAIN ST", "101 E GRAY ST", "900 N PORTER AVE"]],
+        [["Alarm", "Alarm", "Larceny", "Alarm"]],
+        [["OK0140200", "OK0140200", "OK0140200", "OK0140200"]],
+    ]
+    conn = create_connection()
+    try:
+        create_incident_table(conn)
+        create_location_table(conn)
+        create_enrichment_tables(conn)
+        populate_incidents(conn, incidents)
+        update_ranks_incidents(conn)
+        with conn.cursor() as cur:
+            cur.execute("""INSERT INTO location (loc, latitude, longitude, side_of_town) VALUES
+                           ('1200 W MAIN ST', 35.22, -97.45, 'W'), ('101 E GRAY ST', 35.22, -97.44, 'E'),
+                           ('900 N PORTER AVE', 35.23, -97.44, 'W')""")
+        conn.commit()
+        create_query_indexes(conn)
+
+        page, _ = list_incidents(conn, side_of_town="W", max_location_rank=1)
+        assert [row["incident_num"] for row in page] == ["2026-00000002", "2026-00000001"]
+
+        with conn.cursor() as cur:
+            cur.execute("SET enable_seqscan = off")
+            cur.execute("""EXPLAIN SELECT incidents.incident_num FROM incidents_enriched incidents
+                           WHERE incidents.side_of_town = 'W' AND incidents.location_rank <= 1""")
+            plan = "\n".join(row[0] for row in cur.fetchall())
+        conn.rollback()
+        assert "idx_location_api_side" in plan and "idx_location_ranks_api" in plan
+    finally:
+        terminate_connection(conn)
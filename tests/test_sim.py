@@ -0,0 +1,63 @@
+"""
+Tests for the network-stage stub servers, src.sim.stubs (local servers, no live network).
+Run from repo root: python -m pytest tests/test_sim.py -v
+"""
+import pytest
+
+# Require project deps so src.pdf (fitz) can be imported
+pytest.importorskip("fitz", reason="PyMuPDF required; install from requirements.txt")
+
+
+# --- Network-stage stubs (local servers, no live network) ---
+
+def test_stub_site_serves_parseable_reports_and_answers_conditional_gets(tmp_path):
+    """The stub reports page links PDFs the parser reads back row for row; re-checks get 304 until a day is republished."""
+    from src.http_client import build_session
+    from src.pdf.archive import archive_report
+    from src.pdf.parse_incidents import extract_incidents
+    from src.sim.stubs import ReportSite, start_stubs
+
+    site = ReportSite(days=3, incidents_per_day=40, addresses=20)
+    stubs = start_stubs(site)
+    try:
+        session = build_session(retries=0)
+        page = session.get(stubs.reports_url).text
+        day = site.days[-1]
+        url = f"{stubs.site.url}/sites/default/files/documents/{day:%Y-%m}/{day:%Y-%m-%d}_daily_incident_summary.pdf"
+        assert page.count("_daily_incident_summary.pdf") == 3 and url[len(stubs.site.url):] in page
+
+        path = archive_report(url, archive_dir=tmp_path, session=session)
+        columns = [[cell for page_cells in column for cell in page_cells] for column in extract_incidents(path)]
+        assert [list(row) for row in zip(*columns)] == [[cell or " " for cell in row] for row in site.rows(day)]
+
+        archive_report(url, refresh=True, archive_dir=tmp_path, session=session)
+        site.republish(day)
+        assert archive_report(url, refresh=True, archive_dir=tmp_path, session=session) != path
+    finally:
+        stubs.stop()
+    assert stubs.site.snapshot() == {200: 3, 304: 1}
+
+
+def test_stub_geocoder_and_weather_speak_the_client_protocols():
+    """Nominatim and Open-Meteo stubs answer geopy and openmeteo_requests; a rate-limited stub returns 429."""
+    import openmeteo_requests
+    import requests
+    from src.config import TOWN_CENTER
+    from src.enrich.geocoders import GeocoderPool, build_backend
+    from src.sim.stubs import ReportSite, StubBehavior, parse_behavior, start_stubs
+
+    assert parse_behavior("latency=0.1,rate=2,errors=0.5,conditional=0") == StubBehavior(0.1, 0.0, 2.0, 0.5, False)
+    stubs = start_stubs(ReportSite(days=1, incidents_per_day=1), nominatim_behavior=StubBehavior(rate_limit=1))
+    try:
+        pool = GeocoderPool([build_backend("nominatim", stubs.nominatim.url, rate=50)])
+        location = pool.geocode("101 E GRAY ST, Norman, OK")
+        assert abs(location.latitude - TOWN_CENTER[0]) < 0.1 and abs(location.longitude - TOWN_CENTER[1]) < 0.1
+        assert requests.get(f"{stubs.nominatim.url}/search?q=x&format=json").status_code == 429
+
+        client = openmeteo_requests.Client(session=requests.Session())
+        params = {"latitude": 35.22, "longitude": -97.44, "start_date": "2026-01-02", "end_date": "2026-01-02", "hourly": "weather_code"}
+        codes = client.weather_api(stubs.openmeteo_url, params=params)[0].Hourly().Variables(0).ValuesAsNumpy()
+        again = client.weather_api(stubs.openmeteo_url, params=params)[0].Hourly().Variables(0).ValuesAsNumpy()
+    finally:
+        stubs.stop()
+    assert len(codes) == 24 and list(codes) == list(again)
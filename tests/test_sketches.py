@@ -0,0 +1,74 @@
+"""
+Tests for streaming sketches, src.stats.sketches and src.db.sketches (HyperLogLog, Count-Min top-K).
+Run from repo root: python -m pytest tests/test_sketches.py -v
+"""
+import pytest
+
+
+# --- Streaming sketches (HyperLogLog, Count-Min top-K; embedded DuckDB) ---
+
+def test_sketches_estimate_merge_and_round_trip():
+    """HLL counts distincts within a few percent, merges as a union; top-K finds heavy hitters; bytes round-trip."""
+    from src.stats.sketches import HyperLogLog, TopK
+
+    first, second = HyperLogLog(), HyperLogLog()
+    first.update(f"loc-{i}" for i in range(6000))
+    second.update(f"loc-{i}" for i in range(4000, 10000))
+    assert abs(first.estimate() - 6000) < 6000 * 0.05
+    first.merge(HyperLogLog.from_bytes(second.to_bytes()))
+    assert abs(first.estimate() - 10000) < 10000 * 0.05
+    small = HyperLogLog()
+    small.update(["A", "B", "C", "A"])
+    assert small.estimate() == 3
+
+    days = []
+    for day in range(3):
+        top = TopK()
+        for i in range(2000):
+            top.add(f"rare-{day}-{i}")
+        for n, nature in enumerate(["Alarm", "Traffic Stop", "Larceny"]):
+            top.add(nature, 300 - 50 * n + day)
+        days.append(TopK.from_bytes(top.to_bytes()))
+    merged = TopK()
+    for top in days:
+        merged.merge(top)
+    assert merged.total == sum(top.total for top in days)
+    assert [item for item, _ in merged.top(3)] == ["Alarm", "Traffic Stop", "Larceny"]
+    assert all(count >= exact for (_, count), exact in zip(merged.top(3), [903, 753, 603]))
+
+
+def test_loader_maintains_day_sketches_queryable_over_date_ranges(duckdb_conn):
+    """populate_incidents adds to the day sketches, upserts rebuild touched days; range queries merge them."""
+    from datetime import date
+    from src.db.incidents import populate_incidents, upsert_incidents
+    from src.db.sketches import distinct_count, rebuild_sketches, top_values
+
+    def report(day, locations, natures, first):
+        n = len(locations)
+        return [
+            [[f"1/{day}/2026 {h % 24}:00" for h in range(n)]], [[f"2026-{first + i:08d}" for i in range(n)]],
+            [locations], [natures], [["OK0140200"] * n],
+        ]
+
+    conn = duckdb_conn("incident", "location", "enrichment", "rollup")
+    populate_incidents(conn, report(2, ["A ST", "B ST", "A ST"], ["Alarm", "Alarm", "Larceny"], 1))
+    populate_incidents(conn, report(3, ["C ST", "A ST"], ["Alarm", "Traffic Stop"], 10))
+    populate_incidents(conn, report(3, ["D ST"], ["Alarm"], 20))  # second batch for the same day merges
+
+    assert distinct_count(conn, "location") == 4
+    assert distinct_count(conn, "location", start=date(2026, 1, 3)) == 3
+    assert distinct_count(conn, "nature", end=date(2026, 1, 3)) == 2
+    assert top_values(conn, "nature", k=2) == [("Alarm", 4), ("Larceny", 1)]
+
+    # A republished day 3 report moves C ST's incident to E ST: the day is rebuilt, C ST is forgotten
+    assert upsert_incidents(conn, report(3, ["E ST", "A ST"], ["Alarm", "Traffic Stop"], 10))["updated"] == 1
+    assert distinct_count(conn, "location", start=date(2026, 1, 3)) == 3
+    assert sorted(top_values(conn, "location", k=10, start=date(2026, 1, 3))) == [("A ST", 1), ("D ST", 1), ("E ST", 1)]
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM incident_sketches")
+    conn.commit()
+    assert rebuild_sketches(conn) == 2
+    assert top_values(conn, "location", k=1) == [("A ST", 3)]
+    with pytest.raises(ValueError):
+        distinct_count(conn, "incident_num")
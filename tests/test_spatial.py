@@ -0,0 +1,83 @@
+"""
+Tests for geohash encoding and cell covers, src.geo.geohash, and spatial queries, src.db.spatial.
+Tests marked postgres run in a scratch schema (see conftest.py).
+Run from repo root: python -m pytest tests/test_spatial.py -v
+"""
+import pytest
+
+
+# --- Geohash (pure functions) ---
+
+def test_geohash_encode_decode_known_value():
+    """Encode matches the reference geohash and decodes back to the same point."""
+    from src.geo.geohash import decode, encode
+
+    assert encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat, lon = decode("u4pruydqqvj")
+    assert abs(lat - 57.64911) < 1e-5 and abs(lon - 10.40744) < 1e-5
+
+
+def test_geohash_cover_circle_contains_every_point_in_radius():
+    """Every point within the radius falls in one of the covering prefixes."""
+    import random
+    from src.geo.geohash import cover_circle, encode, haversine_m
+
+    center = (35.2226, -97.4395)
+    prefixes = cover_circle(*center, 500)
+    assert 0 < len(prefixes) <= 16
+    rnd = random.Random(0)
+    for _ in range(2000):
+        lat = center[0] + rnd.uniform(-0.006, 0.006)
+        lon = center[1] + rnd.uniform(-0.006, 0.006)
+        if haversine_m(*center, lat, lon) <= 500:
+            assert any(encode(lat, lon, 9).startswith(p) for p in prefixes)
+
+
+# --- Spatial queries (hotspots; postgres-marked tests run in a scratch schema) ---
+
+def test_hotspots_requires_a_time_range():
+    """Without a [start, end) range hotspots refuses to count the whole history."""
+    from datetime import datetime
+    from src.db.spatial import hotspots
+
+    with pytest.raises(ValueError, match="time range"):
+        hotspots(None, None, datetime(2026, 1, 1))
+    with pytest.raises(ValueError, match="time range"):
+        hotspots(None, datetime(2026, 1, 2), datetime(2026, 1, 1))
+
+
+@pytest.mark.postgres
+def test_hotspots_count_only_the_incidents_of_the_range_per_cell(postgres_url):
+    """Incidents inside [start, end) are rolled up into the geohash cells of their locations, busiest first."""
+    from datetime import datetime
+    from src.db.connection import create_connection, terminate_connection
+    from src.db.incidents import populate_incidents
+    from src.db.schema import create_incident_table, create_location_table
+    from src.db.spatial import hotspots
+    from src.geo.geohash import encode
+
+    incidents = [
+        [["1/2/2026 0:03", "1/2/2026 1:10", "1/3/2026 2:20", "1/3/2026 3:30", "1/4/2026 4:40"]],
+        [["2026-00000001", "2026-00000002", "2026-00000003", "2026-00000004", "2026-00000005"]],
+        [["1200 W MAIN ST", "1200 W MAIN ST", "101 E GRAY ST", "1200 W MAIN ST", "101 E GRAY ST"]],
+        [["Alarm", "Alarm", "Larceny", "Alarm", "Larceny"]],
+        [["OK0140200"] * 5],
+    ]
+    conn = create_connection()
+    try:
+        create_incident_table(conn)
+        create_location_table(conn)
+        populate_incidents(conn, incidents)
+        with conn.cursor() as cur:
+            for loc, lat, lon in (("1200 W MAIN ST", 35.2206, -97.4572), ("101 E GRAY ST", 35.2219, -97.4425)):
+                cur.execute("INSERT INTO location (loc, latitude, longitude, geohash) VALUES (%s, %s, %s, %s)",
+                            (loc, lat, lon, encode(lat, lon, 9)))
+        conn.commit()
+
+        cells = hotspots(conn, datetime(2026, 1, 2), datetime(2026, 1, 4))
+        assert [(cell, n) for cell, n, _, _ in cells] == [
+            (encode(35.2206, -97.4572, 7), 3), (encode(35.2219, -97.4425, 7), 1),
+        ]
+        assert hotspots(conn, datetime(2026, 1, 4), datetime(2026, 1, 5), precision=5)[0][:2] == (encode(35.2219, -97.4425, 5), 1)
+    finally:
+        terminate_connection(conn)